@@ -0,0 +1,89 @@
+"""
+Benchmark the line diff against difflib.
+
+Builds synthetic source files of increasing size, edits a fixed share of
+their lines, and times create_unified_diff with each algorithm next to
+difflib.unified_diff. The script exits with a non-zero status if the
+default algorithm is slower than difflib on the largest file.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_diff.py [sizes...]
+"""
+import difflib
+import random
+import sys
+import time
+
+from gitelle.utils.diff import DEFAULT_DIFF_ALGORITHM, DIFF_ALGORITHMS, create_unified_diff
+
+
+DEFAULT_SIZES = [5_000, 20_000, 50_000]
+
+# Share of the lines that are inserted, deleted or replaced
+EDIT_RATE = 0.05
+
+
+def make_file(count, rng):
+    """Create `count` lines that look like source code, with repeats."""
+    lines = []
+    for i in range(count):
+        if i % 20 == 0:
+            lines.append(f"def function_{i}(value):")
+        elif i % 20 == 19:
+            lines.append("")
+        elif rng.random() < 0.3:
+            lines.append("    return value")
+        else:
+            lines.append(f"    value = value + {rng.randrange(count)}")
+    return lines
+
+
+def edit_file(lines, rng):
+    """Insert, delete and replace EDIT_RATE of the lines."""
+    edited = list(lines)
+    for _ in range(int(len(lines) * EDIT_RATE)):
+        position = rng.randrange(len(edited))
+        choice = rng.random()
+        if choice < 0.4:
+            edited.insert(position, f"    inserted = {rng.randrange(1000)}")
+        elif choice < 0.7:
+            del edited[position]
+        else:
+            edited[position] = f"    replaced = {rng.randrange(1000)}"
+    return edited
+
+
+def best_of(repeat, func):
+    """Run `func` `repeat` times and return the fastest time."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes):
+    rng = random.Random(0)
+    columns = list(DIFF_ALGORITHMS) + ["difflib"]
+    print(f"{'lines':>10} " + " ".join(f"{name + ' (s)':>15}" for name in columns))
+
+    for size in sizes:
+        old = make_file(size, rng)
+        new = edit_file(old, rng)
+
+        times = {}
+        for algorithm in DIFF_ALGORITHMS:
+            times[algorithm] = best_of(3, lambda: create_unified_diff(old, new, algorithm=algorithm))
+        times["difflib"] = best_of(3, lambda: list(difflib.unified_diff(old, new, lineterm="")))
+
+        print(f"{size:>10} " + " ".join(f"{times[name]:>15.3f}" for name in columns))
+
+    speedup = times["difflib"] / times[DEFAULT_DIFF_ALGORITHM]
+    print(f"{DEFAULT_DIFF_ALGORITHM} is {speedup:.1f}x as fast as difflib on {sizes[-1]} lines")
+    return 0 if speedup >= 1 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES))
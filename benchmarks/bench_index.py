@@ -0,0 +1,84 @@
+"""
+Benchmark reading and writing the index.
+
+Builds synthetic indexes of increasing size, times Index.write and
+Index.read for each, and reports the cost per entry. The per-entry cost
+should stay roughly flat as the index grows; the script exits with a
+non-zero status if the largest index costs more than MAX_GROWTH times
+as much per entry as the smallest one.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_index.py [sizes...]
+
+Set TMPDIR to a tmpfs (e.g. /dev/shm) to keep disk latency out of the
+numbers.
+"""
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from gitelle.core.index import Index, IndexEntry
+from gitelle.core.repository import Repository
+
+
+DEFAULT_SIZES = [25_000, 50_000, 100_000, 200_000]
+
+# Largest acceptable ratio between the per-entry costs of the biggest
+# and the smallest index
+MAX_GROWTH = 2.0
+
+
+def make_entries(count):
+    """Create `count` index entries spread over nested directories."""
+    entries = {}
+    for i in range(count):
+        entry = IndexEntry()
+        entry.mode = 0o100644
+        entry.size = i
+        entry.object_id = f"{i:040x}"
+        entry.path = f"dir{i % 100:02d}/sub{i % 37:02d}/file{i:07d}.txt"
+        entry.flags = len(entry.path)
+        entries[entry.path] = entry
+    return entries
+
+
+def best_of(repeat, func):
+    """Run `func` `repeat` times and return the fastest time."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes):
+    temp_dir = tempfile.mkdtemp()
+    try:
+        repo = Repository.init(Path(temp_dir))
+        per_entry = []
+
+        print(f"{'entries':>10} {'write (s)':>10} {'read (s)':>10} {'us/entry':>10}")
+        for size in sizes:
+            index = Index(repo)
+            index.entries.update(make_entries(size))
+
+            write_time = best_of(3, index.write)
+            read_time = best_of(3, lambda: Index(repo))
+
+            cost = (write_time + read_time) / size * 1e6
+            per_entry.append(cost)
+            print(f"{size:>10} {write_time:>10.3f} {read_time:>10.3f} {cost:>10.2f}")
+
+        growth = per_entry[-1] / per_entry[0]
+        print(f"per-entry cost growth: {growth:.2f}x over a {sizes[-1] // sizes[0]}x larger index")
+        return 0 if growth <= MAX_GROWTH else 1
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    sys.exit(main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES))
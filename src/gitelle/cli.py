@@ -9,14 +9,19 @@ import click
 
 from gitelle.commands.add import add
 from gitelle.commands.branch import branch
+from gitelle.commands.cat_file import cat_file
 from gitelle.commands.checkout import checkout
 from gitelle.commands.clone import clone
 from gitelle.commands.commit import commit
 from gitelle.commands.diff import diff
+from gitelle.commands.fsmonitor_daemon import fsmonitor_daemon
+from gitelle.commands.gc import gc
 from gitelle.commands.init import init
 from gitelle.commands.log import log
+from gitelle.commands.repack import repack
 from gitelle.commands.reset import reset
 from gitelle.commands.status import status
+from gitelle.commands.update_index import update_index
 
 
 @click.group()
@@ -43,6 +48,11 @@ main.add_command(checkout)
 main.add_command(log)
 main.add_command(diff)
 main.add_command(reset)
+main.add_command(repack)
+main.add_command(gc)
+main.add_command(cat_file)
+main.add_command(update_index)
+main.add_command(fsmonitor_daemon)
 
 
 if __name__ == "__main__":
@@ -4,7 +4,7 @@ Implementation of the 'add' command for GitEllE.
 import os
 import sys
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 import click
 
@@ -13,7 +13,9 @@ from gitelle.core.repository import Repository
 
 @click.command()
 @click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
-def add(paths: List[str]) -> None:
+@click.option("-j", "--jobs", type=click.IntRange(min=1), default=None,
+              help="Number of files to hash in parallel (default: add.workers or the number of CPUs)")
+def add(paths: List[str], jobs: Optional[int]) -> None:
     """
     Add file contents to the index.
     
@@ -39,7 +41,7 @@ def add(paths: List[str]) -> None:
         
         # Add the files to the index
         if relative_paths:
-            repo.index.add(relative_paths)
+            repo.index.add(relative_paths, workers=jobs)
             repo.index.write()
             
             # Print a summary
@@ -0,0 +1,95 @@
+"""
+Implementation of the 'cat-file' command for GitEllE.
+"""
+import shutil
+import sys
+from typing import Optional
+
+import click
+
+from gitelle.core.repository import Repository
+from gitelle.utils.filesystem import COPY_BUFFER_SIZE
+
+
+def resolve_object(repo: Repository, name: str) -> Optional[str]:
+    """
+    Resolve HEAD, a branch, a tag or a full object ID to an object ID.
+
+    Args:
+        repo: The repository
+        name: The name to resolve
+
+    Returns:
+        The object ID, or None if the name does not resolve
+    """
+    if name == "HEAD":
+        return repo.head.get_resolved_target()
+
+    for ref in (repo.get_branch(name), repo.get_tag(name)):
+        if ref.target:
+            return ref.get_resolved_target()
+
+    if len(name) == 40 and repo.object_store.contains(name):
+        return name
+
+    return None
+
+
+@click.command(name="cat-file")
+@click.option("-t", "show_type", is_flag=True, help="Show the object type")
+@click.option("-s", "show_size", is_flag=True, help="Show the object size")
+@click.option("-e", "check_exists", is_flag=True, help="Exit with zero status if the object exists")
+@click.option("-p", "pretty", is_flag=True, help="Pretty-print the object's content")
+@click.argument("object_name", required=True)
+def cat_file(object_name: str, show_type: bool = False, show_size: bool = False,
+             check_exists: bool = False, pretty: bool = False) -> None:
+    """
+    Provide content, type or size information for repository objects.
+
+    -t and -s only read the object header, so they are cheap even for
+    very large objects. -p streams blob content to standard output.
+    """
+    # Find the repository
+    repo = Repository.find()
+    if repo is None:
+        click.echo("fatal: not a git repository (or any of the parent directories)", err=True)
+        sys.exit(1)
+
+    if sum((show_type, show_size, check_exists, pretty)) != 1:
+        click.echo("error: exactly one of -t, -s, -e or -p is required", err=True)
+        sys.exit(129)
+
+    object_id = resolve_object(repo, object_name)
+    if object_id is None:
+        if check_exists:
+            sys.exit(1)
+        click.echo(f"fatal: Not a valid object name {object_name}", err=True)
+        sys.exit(128)
+
+    try:
+        if check_exists:
+            return
+
+        if show_type or show_size:
+            obj_type, size = repo.object_store.info(object_id)
+            click.echo(obj_type if show_type else size)
+            return
+
+        obj_type, _ = repo.object_store.info(object_id)
+
+        if obj_type == "tree":
+            tree = repo.get_object(object_id)
+            for entry in sorted(tree.entries, key=lambda e: e.name):
+                entry_type = "tree" if entry.mode.startswith("40") else "blob"
+                click.echo(f"{entry.mode.zfill(6)} {entry_type} {entry.id}\t{entry.name}")
+            return
+
+        # Blobs and commits are copied through with a bounded buffer
+        output = click.get_binary_stream("stdout")
+        with repo.object_store.open_stream(object_id) as stream:
+            shutil.copyfileobj(stream, output, COPY_BUFFER_SIZE)
+        output.flush()
+
+    except Exception as e:
+        click.echo(f"error: {e}", err=True)
+        sys.exit(1)
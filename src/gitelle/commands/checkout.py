@@ -11,7 +11,7 @@ import click
 from gitelle.core.objects import Commit, Tree
 from gitelle.core.refs import BranchReference, Reference
 from gitelle.core.repository import Repository
-from gitelle.utils.filesystem import write_file
+from gitelle.utils.filesystem import write_file_stream
 
 
 def checkout_tree(repo: Repository, tree_id: str, prefix: str = "") -> None:
@@ -29,12 +29,10 @@ def checkout_tree(repo: Repository, tree_id: str, prefix: str = "") -> None:
         path = os.path.join(prefix, entry.name)
         
         if entry.mode.startswith("10"):  # Regular file
-            # Get the blob object
-            blob = repo.get_object(entry.id)
-            
-            # Write the file
+            # Stream the blob straight into the file
             abs_path = repo.path / path
-            write_file(abs_path, blob.data)
+            with repo.object_store.open_stream(entry.id) as stream:
+                write_file_stream(abs_path, stream)
             
             # Set the file mode
             if entry.mode == "100755":  # Executable
@@ -98,7 +96,7 @@ def checkout_ref(repo: Repository, ref_name: str) -> None:
     # Update the index
     # In a real implementation, this would update the index to match the tree
     # For simplicity, we'll just clear the index
-    repo.index.entries.clear()
+    repo.index.clear()
     repo.index.write()
 
 
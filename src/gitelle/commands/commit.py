@@ -11,6 +11,7 @@ from typing import Optional
 import click
 
 from gitelle.core.objects import Commit, Tree
+from gitelle.core.refs import Reference
 from gitelle.core.repository import Repository
 
 
@@ -54,6 +55,9 @@ def create_commit(repo: Repository, message: str, author: Optional[str] = None)
     if tree_id is None:
         raise ValueError("Nothing to commit (empty index)")
     
+    # Persist the updated cache-tree
+    repo.index.write()
+    
     # Get author and committer information
     author_info = author or get_author_info()
     committer_info = author_info  # Use the same info for committer
@@ -78,7 +82,7 @@ def create_commit(repo: Repository, message: str, author: Optional[str] = None)
     # Update HEAD
     if repo.head.is_symbolic:
         # Update the branch that HEAD points to
-        branch_ref = Repository.from_path(repo, repo.head.target)
+        branch_ref = Reference.from_path(repo, repo.head.target)
         branch_ref.set_target(commit_id)
         branch_ref.save()
     else:
@@ -4,13 +4,23 @@ Implementation of the 'diff' command for GitEllE.
 import os
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import click
 
-from gitelle.core.objects import Blob
+from gitelle.commands.cat_file import resolve_object
+from gitelle.core.renames import DEFAULT_RENAME_LIMIT, RenameDetector
 from gitelle.core.repository import Repository
-from gitelle.utils.diff import create_unified_diff, get_diff_stats
+from gitelle.core.tree_diff import TreeChange, iter_tree_changes
+from gitelle.utils.diff import (
+    BIG_FILE_THRESHOLD,
+    BINARY_PROBE_SIZE,
+    DEFAULT_DIFF_ALGORITHM,
+    DIFF_ALGORITHMS,
+    create_unified_diff,
+    get_diff_stats,
+    is_binary_data,
+)
 from gitelle.utils.filesystem import read_file
 
 
@@ -50,34 +60,139 @@ def get_file_content(path: Path) -> List[str]:
         return []
 
 
-def diff_index_to_worktree(repo: Repository, paths: List[Path] = None) -> str:
+def get_diff_algorithm(repo: Repository, algorithm: Optional[str] = None) -> str:
+    """
+    Get the line diff algorithm to use.
+    
+    Args:
+        repo: The repository
+        algorithm: The algorithm given on the command line, if any
+    
+    Returns:
+        The algorithm, falling back to diff.algorithm and then to the default
+    
+    Raises:
+        ValueError: If diff.algorithm names an unknown algorithm
+    """
+    if algorithm:
+        return algorithm
+    
+    algorithm = repo.config.get("diff", "algorithm", DEFAULT_DIFF_ALGORITHM).lower()
+    if algorithm == "default":
+        return DEFAULT_DIFF_ALGORITHM
+    if algorithm not in DIFF_ALGORITHMS:
+        raise ValueError(f"unknown diff.algorithm '{algorithm}'")
+    return algorithm
+
+
+def get_rename_detector(repo: Repository, find_renames: Optional[bool] = None,
+                        find_copies: bool = False,
+                        rename_limit: Optional[int] = None) -> Optional[RenameDetector]:
+    """
+    Get the rename detector to use.
+    
+    Renames are detected unless diff.renames is false; setting it to
+    "copies" detects copies too. The limit on inexact detection comes
+    from diff.renameLimit.
+    
+    Args:
+        repo: The repository
+        find_renames: Whether to detect renames, or None for diff.renames
+        find_copies: Whether to detect copies (implies find_renames)
+        rename_limit: The rename limit, or None for diff.renameLimit
+    
+    Returns:
+        A RenameDetector, or None if renames aren't detected
+    
+    Raises:
+        ValueError: If diff.renameLimit is not a number
+    """
+    setting = repo.config.get("diff", "renames", "true").strip().lower()
+    if find_renames is None:
+        find_renames = setting not in ("false", "no", "off", "0")
+        find_copies = find_copies or setting in ("copies", "copy")
+    if not find_renames and not find_copies:
+        return None
+    
+    if rename_limit is None:
+        rename_limit = repo.config.get_int("diff", "renamelimit", DEFAULT_RENAME_LIMIT)
+    return RenameDetector(repo, rename_limit=rename_limit, find_copies=find_copies)
+
+
+def warn_rename_limit(detector: Optional[RenameDetector]) -> None:
+    """
+    Warn if inexact rename detection was skipped because of the limit.
+    
+    Args:
+        detector: The rename detector used, if any
+    """
+    if detector is not None and detector.needed_limit:
+        click.echo("warning: exhaustive rename detection was skipped due to too many files.",
+                   err=True)
+        click.echo("warning: you may want to set your diff.renameLimit variable to at least "
+                   f"{detector.needed_limit} and retry the command.", err=True)
+
+
+def is_path_selected(path: str, paths: List[Path]) -> bool:
+    """
+    Check whether a file is one of the given paths or below one of them.
+    
+    Args:
+        path: The path of the file, relative to the repository root
+        paths: The selected files and directories
+    
+    Returns:
+        True if the file is selected, False otherwise
+    """
+    for selected in paths:
+        selected = selected.as_posix()
+        if selected == "." or path == selected or path.startswith(selected + "/"):
+            return True
+    return False
+
+
+def diff_index_to_worktree(repo: Repository, paths: List[Path] = None,
+                           algorithm: str = DEFAULT_DIFF_ALGORITHM) -> str:
     """
     Show changes between index and working tree.
     
     Args:
         repo: The repository
         paths: The paths to show changes for (default: all)
+        algorithm: The line diff algorithm, one of DIFF_ALGORITHMS
     
     Returns:
         A string containing the unified diff
     """
     result = []
     
-    # Get all the files in the index
-    index_files = list(repo.index.entries.keys())
+    # Only files whose stat data changed are hashed, and with a file
+    # system monitor only the paths it reports are even stat()ed
+    index_files = [path for status, path in repo.index.diff_files() if status == "M"]
     
     # Filter by paths if specified
     if paths:
-        path_strs = [str(p) for p in paths]
-        index_files = [f for f in index_files if f in path_strs]
+        index_files = [f for f in index_files if is_path_selected(f, paths)]
     
-    # Compare each file in the index with the working tree
-    for index_file in sorted(index_files):
+    # Show each modified file; files missing from the working tree are skipped
+    for index_file in index_files:
         index_entry = repo.index.entries[index_file]
         file_path = repo.path / index_file
         
-        # Skip files that don't exist in the working tree
-        if not file_path.exists():
+        # Very large files are reported as binary from their sizes alone
+        _, index_size = repo.object_store.info(index_entry.object_id)
+        if max(index_size, file_path.stat().st_size) > BIG_FILE_THRESHOLD:
+            result.append(f"Binary files a/{index_file} and b/{index_file} differ")
+            continue
+        
+        # Probe the start of both sides before loading them for a text diff
+        with repo.object_store.open_stream(index_entry.object_id) as stream:
+            index_probe = stream.read(BINARY_PROBE_SIZE)
+        with open(file_path, "rb") as f:
+            worktree_probe = f.read(BINARY_PROBE_SIZE)
+        
+        if is_binary_data(index_probe) or is_binary_data(worktree_probe):
+            result.append(f"Binary files a/{index_file} and b/{index_file} differ")
             continue
         
         # Get the content of the blob in the index
@@ -89,7 +204,8 @@ def diff_index_to_worktree(repo: Repository, paths: List[Path] = None) -> str:
         # Create a diff
         diff = create_unified_diff(
             index_content, worktree_content,
-            f"a/{index_file}", f"b/{index_file}"
+            f"a/{index_file}", f"b/{index_file}",
+            algorithm=algorithm
         )
         
         if diff:
@@ -98,36 +214,217 @@ def diff_index_to_worktree(repo: Repository, paths: List[Path] = None) -> str:
     return "\n\n".join(result)
 
 
-def diff_commits(repo: Repository, commit1_id: str, commit2_id: str, paths: List[Path] = None) -> str:
+def is_binary_blob(repo: Repository, blob_id: str) -> bool:
+    """
+    Check whether a blob should be shown as binary.
+    
+    Very large blobs count as binary from their size alone; otherwise
+    only the start of the blob is read.
+    
+    Args:
+        repo: The repository
+        blob_id: The ID of the blob
+    
+    Returns:
+        True if the blob is binary, False otherwise
+    """
+    _, size = repo.object_store.info(blob_id)
+    if size > BIG_FILE_THRESHOLD:
+        return True
+    with repo.object_store.open_stream(blob_id) as stream:
+        return is_binary_data(stream.read(BINARY_PROBE_SIZE))
+
+
+def diff_blobs(repo: Repository, path: str, old_id: Optional[str], new_id: Optional[str],
+               algorithm: str = DEFAULT_DIFF_ALGORITHM, old_path: Optional[str] = None) -> str:
+    """
+    Show changes between two versions of a file.
+    
+    Args:
+        repo: The repository
+        path: The path of the file
+        old_id: The blob ID of the old version, or None if the file was added
+        new_id: The blob ID of the new version, or None if the file was deleted
+        algorithm: The line diff algorithm, one of DIFF_ALGORITHMS
+        old_path: The old path of a renamed or copied file
+    
+    Returns:
+        A string containing the unified diff, or "" if the contents are equal
+    """
+    if old_id == new_id:
+        return ""
+    
+    a_name = f"a/{old_path or path}" if old_id is not None else "/dev/null"
+    b_name = f"b/{path}" if new_id is not None else "/dev/null"
+    
+    if any(is_binary_blob(repo, blob_id) for blob_id in (old_id, new_id) if blob_id is not None):
+        return f"Binary files {a_name} and {b_name} differ"
+    
+    old_content = get_blob_content(repo, old_id) if old_id is not None else []
+    new_content = get_blob_content(repo, new_id) if new_id is not None else []
+    return create_unified_diff(old_content, new_content, a_name, b_name, algorithm=algorithm)
+
+
+def diff_tree_changes(repo: Repository, changes: Iterable[TreeChange],
+                      algorithm: str = DEFAULT_DIFF_ALGORITHM) -> str:
+    """
+    Show the content changes of a list of changed files.
+    
+    Renamed and copied files are introduced by their similarity and old
+    path, like Git does.
+    
+    Args:
+        repo: The repository
+        changes: The changed files
+        algorithm: The line diff algorithm, one of DIFF_ALGORITHMS
+    
+    Returns:
+        A string containing the unified diff
+    """
+    result = []
+    
+    for change in changes:
+        lines = []
+        if change.status in ("R", "C"):
+            kind = "rename" if change.status == "R" else "copy"
+            lines = [f"similarity index {change.similarity}%",
+                     f"{kind} from {change.old_path}", f"{kind} to {change.path}"]
+        
+        diff = diff_blobs(repo, change.path, change.old_id, change.new_id, algorithm,
+                          change.old_path)
+        if diff:
+            lines.append(diff)
+        if lines:
+            result.append("\n".join(lines))
+    
+    return "\n\n".join(result)
+
+
+def diff_trees(repo: Repository, old_tree_id: Optional[str], new_tree_id: Optional[str],
+               paths: List[Path] = None, algorithm: str = DEFAULT_DIFF_ALGORITHM,
+               detector: Optional[RenameDetector] = None) -> str:
+    """
+    Show changes between two trees.
+    
+    Args:
+        repo: The repository
+        old_tree_id: The ID of the old tree, or None for an empty tree
+        new_tree_id: The ID of the new tree, or None for an empty tree
+        paths: The paths to show changes for (default: all)
+        algorithm: The line diff algorithm, one of DIFF_ALGORITHMS
+        detector: The rename detector, or None to show renames as a
+                  deletion and an addition
+    
+    Returns:
+        A string containing the unified diff
+    """
+    path_strs = [p.as_posix() for p in paths] if paths else None
+    changes = iter_tree_changes(repo, old_tree_id, new_tree_id, path_strs)
+    if detector is not None:
+        changes = detector.detect(list(changes))
+    return diff_tree_changes(repo, changes, algorithm)
+
+
+def diff_commits(repo: Repository, commit1_id: str, commit2_id: str, paths: List[Path] = None,
+                 algorithm: str = DEFAULT_DIFF_ALGORITHM,
+                 detector: Optional[RenameDetector] = None) -> str:
     """
     Show changes between two commits.
     
+    Only the directories that differ between the commits are read, so
+    the cost depends on the size of the change, not of the repository.
+    
     Args:
         repo: The repository
         commit1_id: The ID of the first commit
         commit2_id: The ID of the second commit
         paths: The paths to show changes for (default: all)
+        algorithm: The line diff algorithm, one of DIFF_ALGORITHMS
+        detector: The rename detector, if any
     
     Returns:
         A string containing the unified diff
     """
-    # In a real implementation, this would:
-    # 1. Get the tree for each commit
-    # 2. Compare the trees to find changed files
-    # 3. Generate diffs for the changed files
+    return diff_trees(
+        repo, repo.get_object(commit1_id).tree_id, repo.get_object(commit2_id).tree_id,
+        paths, algorithm, detector
+    )
+
+
+def diff_tree_to_index(repo: Repository, tree_id: Optional[str], paths: List[Path] = None,
+                       algorithm: str = DEFAULT_DIFF_ALGORITHM,
+                       detector: Optional[RenameDetector] = None) -> str:
+    """
+    Show changes between a tree (usually HEAD's) and the index.
+    
+    Args:
+        repo: The repository
+        tree_id: The ID of the tree, or None for an empty tree
+        paths: The paths to show changes for (default: all)
+        algorithm: The line diff algorithm, one of DIFF_ALGORITHMS
+        detector: The rename detector, if any
+    
+    Returns:
+        A string containing the unified diff
+    """
+    entries = repo.index.entries
+    changes = []
+    
+    for status, path, tree_mode, tree_id in repo.index.diff_tree(tree_id, detailed=True):
+        if paths and not is_path_selected(path, paths):
+            continue
+        entry = entries.get(path) if status != "D" else None
+        changes.append(TreeChange(
+            status, path, tree_mode, tree_id,
+            entry.mode if entry is not None else 0, entry.object_id if entry is not None else None
+        ))
+    
+    if detector is not None:
+        changes = detector.detect(changes)
+    return diff_tree_changes(repo, changes, algorithm)
+
+
+def resolve_commit(repo: Repository, name: str) -> Optional[str]:
+    """
+    Resolve a name to a commit ID.
+    
+    Args:
+        repo: The repository
+        name: HEAD, a branch, a tag or a full commit ID
     
-    return "Diff between commits not implemented in this educational version."
+    Returns:
+        The commit ID, or None if the name doesn't name a commit
+    """
+    try:
+        object_id = resolve_object(repo, name)
+        if object_id is None or repo.get_object(object_id).type != "commit":
+            return None
+    except (OSError, ValueError):
+        # Not a valid ref name, e.g. a path like "." or "src/main.py"
+        return None
+    return object_id
 
 
 @click.command()
 @click.option("--cached", is_flag=True, help="Show changes in the index")
-@click.argument("paths", nargs=-1, type=click.Path(exists=True))
-def diff(cached: bool = False, paths: List[str] = None) -> None:
+@click.option("--diff-algorithm", "algorithm", type=click.Choice(DIFF_ALGORITHMS),
+              help="Line diff algorithm (default: diff.algorithm or myers)")
+@click.option("-M", "--find-renames/--no-renames", default=None,
+              help="Detect renames (default: diff.renames or on)")
+@click.option("-C", "--find-copies", is_flag=True, help="Detect copies as well as renames")
+@click.option("-l", "--rename-limit", type=int, default=None,
+              help="Skip inexact rename detection above this many files (default: diff.renameLimit)")
+@click.argument("args", nargs=-1)
+def diff(cached: bool = False, algorithm: Optional[str] = None, find_renames: Optional[bool] = None,
+         find_copies: bool = False, rename_limit: Optional[int] = None,
+         args: Tuple[str, ...] = ()) -> None:
     """
     Show changes between commits, commit and working tree, etc.
     
     By default, shows changes between the working tree and the index.
-    With --cached, shows changes between the index and the current HEAD.
+    With --cached, shows changes between the index and the current HEAD
+    (or a given commit). With two commits, shows changes between them.
+    Any further arguments limit the changes to those paths.
     """
     # Find the repository
     repo = Repository.find()
@@ -136,29 +433,54 @@ def diff(cached: bool = False, paths: List[str] = None) -> None:
         sys.exit(1)
     
     try:
+        # Leading arguments naming commits are revisions, the rest paths
+        commit_ids = []
+        for arg in args[:2]:
+            commit_id = resolve_commit(repo, arg)
+            if commit_id is None:
+                break
+            commit_ids.append(commit_id)
+        path_args = args[len(commit_ids):]
+        
+        # Without revisions, paths must exist in the working tree
+        for path in path_args:
+            if not commit_ids and not os.path.lexists(path):
+                click.echo(f"fatal: ambiguous argument '{path}': unknown revision or path "
+                           "not in the working tree.", err=True)
+                sys.exit(128)
+        
         # Convert paths to Path objects
         path_objs = None
-        if paths:
-            path_objs = [Path(p).relative_to(repo.path) for p in paths]
+        if path_args:
+            root = repo.path.resolve()
+            path_objs = [Path(os.path.abspath(p)).relative_to(root) for p in path_args]
+        
+        algorithm = get_diff_algorithm(repo, algorithm)
+        detector = get_rename_detector(repo, find_renames, find_copies, rename_limit)
         
-        if cached:
-            # Show diff between HEAD and index
-            head_target = repo.head.get_resolved_target()
-            if not head_target:
-                click.echo("error: HEAD is not a valid reference", err=True)
-                sys.exit(1)
-            
-            # In a real implementation, this would generate a diff
-            # between the HEAD commit and the index
-            click.echo("Diff between HEAD and index not implemented in this educational version.")
+        if len(commit_ids) == 2:
+            # Show diff between two commits
+            diff_output = diff_commits(repo, commit_ids[0], commit_ids[1], path_objs, algorithm,
+                                       detector)
+        elif cached:
+            # Show diff between HEAD (or the given commit) and index
+            commit_id = commit_ids[0] if commit_ids else repo.head.get_resolved_target()
+            tree_id = repo.get_object(commit_id).tree_id if commit_id else None
+            diff_output = diff_tree_to_index(repo, tree_id, path_objs, algorithm, detector)
+        elif commit_ids:
+            click.echo("error: comparing a commit with the working tree is not supported; "
+                       "use --cached or a second commit", err=True)
+            sys.exit(1)
         else:
             # Show diff between index and working tree
-            diff_output = diff_index_to_worktree(repo, path_objs)
-            if diff_output:
-                click.echo(diff_output)
-            else:
-                click.echo("No changes.")
+            diff_output = diff_index_to_worktree(repo, path_objs, algorithm)
+        
+        warn_rename_limit(detector)
+        if diff_output:
+            click.echo(diff_output)
+        else:
+            click.echo("No changes.")
     
     except Exception as e:
         click.echo(f"error: {e}", err=True)
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,91 @@
+"""
+Implementation of the 'fsmonitor--daemon' command for GitEllE.
+"""
+import subprocess
+import sys
+import time
+
+import click
+
+from gitelle.core.fsmonitor import send_request
+from gitelle.core.fsmonitor_daemon import FSMonitorDaemon
+from gitelle.core.repository import Repository
+
+
+# Seconds to wait for a started daemon to answer
+START_TIMEOUT = 10.0
+
+# Seconds between checks while waiting for the daemon
+POLL_INTERVAL = 0.05
+
+
+def is_running(repo: Repository) -> bool:
+    """
+    Check whether the fsmonitor daemon of a repository is running.
+
+    Args:
+        repo: The repository
+
+    Returns:
+        True if the daemon answers, False otherwise
+    """
+    return send_request(repo, b"ping") == b"ok"
+
+
+@click.command("fsmonitor--daemon")
+@click.argument("action", type=click.Choice(["start", "stop", "run", "status"]))
+def fsmonitor_daemon(action: str) -> None:
+    """
+    Run the built-in file system monitor.
+
+    The daemon watches the working tree (with inotify on Linux, by
+    polling elsewhere) and tells status, add and diff which paths changed
+    since they last asked, so they only examine those. Enable it with
+    core.fsmonitor = true.
+
+    ACTION is "start" (in the background), "run" (in the foreground),
+    "stop" or "status".
+    """
+    # Find the repository
+    repo = Repository.find()
+    if repo is None:
+        click.echo("fatal: not a git repository (or any of the parent directories)", err=True)
+        sys.exit(1)
+
+    try:
+        if action == "status":
+            if is_running(repo):
+                click.echo(f"fsmonitor-daemon is watching '{repo.path}'")
+            else:
+                click.echo(f"fsmonitor-daemon is not watching '{repo.path}'")
+                sys.exit(1)
+
+        elif action == "stop":
+            if send_request(repo, b"quit") is None:
+                click.echo("error: fsmonitor-daemon is not running", err=True)
+                sys.exit(1)
+
+        elif is_running(repo):
+            click.echo("error: fsmonitor-daemon is already running", err=True)
+            sys.exit(1)
+
+        elif action == "run":
+            FSMonitorDaemon(repo.path).serve_forever()
+
+        else:
+            subprocess.Popen(
+                [sys.executable, "-m", "gitelle.cli", "fsmonitor--daemon", "run"],
+                cwd=repo.path, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL, start_new_session=True
+            )
+
+            deadline = time.monotonic() + START_TIMEOUT
+            while not is_running(repo):
+                if time.monotonic() > deadline:
+                    click.echo("error: fsmonitor-daemon did not start", err=True)
+                    sys.exit(1)
+                time.sleep(POLL_INTERVAL)
+
+    except Exception as e:
+        click.echo(f"error: {e}", err=True)
+        sys.exit(1)
@@ -0,0 +1,44 @@
+"""
+Implementation of the 'gc' command for GitEllE.
+"""
+import sys
+
+import click
+
+from gitelle.commands.repack import repack_repository
+from gitelle.core.pack import DEFAULT_DEPTH, DEFAULT_WINDOW
+from gitelle.core.repository import Repository
+
+
+@click.command()
+@click.option("--aggressive", is_flag=True,
+              help="Search a much larger window for delta bases (slower, smaller pack)")
+def gc(aggressive: bool = False) -> None:
+    """
+    Cleanup unnecessary files and optimize the local repository.
+
+    Packs every reachable object into a single pack and removes the
+    loose objects and old packs made redundant by it (equivalent to
+    `gitelle repack -d`).
+    """
+    # Find the repository
+    repo = Repository.find()
+    if repo is None:
+        click.echo("fatal: not a git repository (or any of the parent directories)", err=True)
+        sys.exit(1)
+
+    try:
+        window = 250 if aggressive else DEFAULT_WINDOW
+        stats = repack_repository(repo, delete_redundant=True, window=window, depth=DEFAULT_DEPTH)
+
+        if stats["objects"] == 0:
+            click.echo("Nothing to pack.")
+        else:
+            click.echo(
+                f"Packed {stats['objects']} objects, removed {stats['pruned']} "
+                f"loose objects and {stats['packs_removed']} old packs"
+            )
+
+    except Exception as e:
+        click.echo(f"error: {e}", err=True)
+        sys.exit(1)
@@ -8,7 +8,9 @@ from typing import List, Optional
 
 import click
 
+from gitelle.commands.diff import diff_trees, get_diff_algorithm, get_rename_detector, warn_rename_limit
 from gitelle.core.objects import Commit
+from gitelle.core.renames import RenameDetector
 from gitelle.core.repository import Repository
 
 
@@ -96,10 +98,32 @@ def get_commit_history(repo: Repository, start_commit_id: str, max_count: Option
     return commits
 
 
+def get_commit_patch(repo: Repository, commit: Commit, algorithm: str,
+                     detector: Optional[RenameDetector] = None) -> str:
+    """
+    Get the changes a commit made to its first parent.
+    
+    Args:
+        repo: The repository
+        commit: The commit
+        algorithm: The line diff algorithm
+        detector: The rename detector, if any
+    
+    Returns:
+        A string containing the unified diff (against an empty tree for
+        a root commit)
+    """
+    parent_tree_id = None
+    if commit.parent_ids:
+        parent_tree_id = repo.get_object(commit.parent_ids[0]).tree_id
+    return diff_trees(repo, parent_tree_id, commit.tree_id, algorithm=algorithm, detector=detector)
+
+
 @click.command()
 @click.option("-n", "--max-count", type=int, help="Limit the number of commits to show")
 @click.option("--oneline", is_flag=True, help="Show each commit on a single line")
-def log(max_count: Optional[int] = None, oneline: bool = False) -> None:
+@click.option("-p", "--patch", is_flag=True, help="Show the changes each commit made")
+def log(max_count: Optional[int] = None, oneline: bool = False, patch: bool = False) -> None:
     """
     Show commit logs.
     
@@ -121,9 +145,17 @@ def log(max_count: Optional[int] = None, oneline: bool = False) -> None:
         # Get the commit history
         commits = get_commit_history(repo, head_target, max_count)
         
+        algorithm = get_diff_algorithm(repo) if patch else None
+        detector = get_rename_detector(repo) if patch else None
+        
         # Display the commits
         for commit in commits:
             click.echo(format_commit(commit, oneline))
+            if patch:
+                commit_patch = get_commit_patch(repo, commit, algorithm, detector)
+                warn_rename_limit(detector)
+                if commit_patch:
+                    click.echo(commit_patch)
             if not oneline and commit != commits[-1]:
                 click.echo("")
     
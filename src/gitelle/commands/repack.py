@@ -0,0 +1,284 @@
+"""
+Implementation of the 'repack' command for GitEllE.
+"""
+import heapq
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+import click
+
+from gitelle.core.objects import Commit, Tree
+from gitelle.core.pack import DEFAULT_DEPTH, DEFAULT_WINDOW, write_pack
+from gitelle.core.repository import Repository
+
+
+def get_ref_targets(repo: Repository) -> List[str]:
+    """
+    Get the object IDs pointed to by all references.
+
+    This includes every file under refs/ and HEAD (which matters when
+    HEAD is detached).
+
+    Args:
+        repo: The repository
+
+    Returns:
+        A list of object IDs, without duplicates
+    """
+    targets = []
+
+    head_target = repo.head.get_resolved_target()
+    if head_target:
+        targets.append(head_target)
+
+    for ref_path in sorted(repo.refs_dir.glob("**/*")):
+        if not ref_path.is_file():
+            continue
+        content = ref_path.read_text().strip()
+        if content and not content.startswith("ref: ") and content not in targets:
+            targets.append(content)
+
+    return targets
+
+
+def get_commit_time(commit: Commit) -> int:
+    """
+    Get the committer timestamp of a commit.
+
+    Args:
+        commit: The commit
+
+    Returns:
+        The commit timestamp, or 0 if it cannot be parsed
+    """
+    try:
+        return int((commit.committer or commit.author).split(" ")[-2])
+    except (AttributeError, IndexError, ValueError):
+        return 0
+
+
+def collect_reachable_objects(repo: Repository,
+                              paths: Optional[Dict[str, str]] = None) -> List[Tuple[str, str, bytes]]:
+    """
+    Collect every object reachable from the references, in pack order.
+
+    Commits come first, newest first (so `log` reads a contiguous region
+    of the pack), followed by the trees and blobs in the order they are
+    first reached from those commits (so checking out a recent commit
+    reads a contiguous region too). Blobs staged in the index and the
+    trees cached in its cache-tree are included last so that pending
+    changes are never lost and cached tree IDs stay valid.
+
+    Args:
+        repo: The repository
+        paths: An optional dictionary that is filled with the path at
+               which each tree and blob was first reached
+
+    Returns:
+        A list of (object ID, object type, object data) tuples
+    """
+    if paths is None:
+        paths = {}
+
+    store = repo.object_store
+    seen: Set[str] = set()
+    commits = []
+    commit_order = []
+
+    # Walk commits by committer date, newest first
+    queue = []
+    queued: Set[str] = set()
+    for object_id in get_ref_targets(repo):
+        obj_type, data = store.read_raw(object_id)
+        if obj_type != "commit":
+            # References to non-commits (e.g. a tagged blob) are kept as-is
+            if object_id not in seen:
+                seen.add(object_id)
+                commits.append((object_id, obj_type, data))
+            continue
+        if object_id not in queued:
+            queued.add(object_id)
+            commit = Commit.deserialize(repo, data)
+            heapq.heappush(queue, (-get_commit_time(commit), object_id, commit, data))
+
+    while queue:
+        _, commit_id, commit, data = heapq.heappop(queue)
+        seen.add(commit_id)
+        commits.append((commit_id, "commit", data))
+        commit_order.append(commit)
+
+        for parent_id in commit.parent_ids:
+            if parent_id in queued:
+                continue
+            queued.add(parent_id)
+            obj_type, parent_data = store.read_raw(parent_id)
+            parent = Commit.deserialize(repo, parent_data)
+            heapq.heappush(queue, (-get_commit_time(parent), parent_id, parent, parent_data))
+
+    contents = []
+
+    def walk_tree(tree_id: str, tree_path: str) -> None:
+        """Add a tree and everything below it that wasn't seen yet."""
+        stack = [(tree_id, tree_path)]
+        while stack:
+            object_id, path = stack.pop()
+            if object_id in seen:
+                continue
+            seen.add(object_id)
+            paths[object_id] = path
+
+            obj_type, data = store.read_raw(object_id)
+            contents.append((object_id, obj_type, data))
+
+            if obj_type == "tree":
+                tree = Tree.deserialize(repo, data)
+                # Push in reverse so entries are visited in tree order
+                for entry in reversed(tree.entries):
+                    if entry.mode == "160000":
+                        continue  # Submodule commits live in another repository
+                    stack.append((entry.id, f"{path}/{entry.name}" if path else entry.name))
+
+    # Walk the trees of each commit in the same order
+    for commit in commit_order:
+        walk_tree(commit.tree_id, "")
+
+    # Keep blobs that are staged but not yet committed
+    for entry in repo.index.entries.values():
+        if entry.object_id not in seen and store.contains(entry.object_id):
+            seen.add(entry.object_id)
+            paths[entry.object_id] = entry.path
+            obj_type, data = store.read_raw(entry.object_id)
+            contents.append((entry.object_id, obj_type, data))
+
+    # Keep the trees of the cache-tree, which a later commit reuses by ID
+    nodes = [(repo.index.cache_tree, "")]
+    while nodes:
+        node, path = nodes.pop()
+        if node.is_valid and store.contains(node.object_id):
+            walk_tree(node.object_id, path)
+        for name, child in node.children.items():
+            nodes.append((child, f"{path}/{name}" if path else name))
+
+    return commits + contents
+
+
+def prune_packed_objects(repo: Repository, object_ids: Set[str]) -> int:
+    """
+    Remove loose objects that are now stored in a pack.
+
+    Args:
+        repo: The repository
+        object_ids: The IDs of the objects stored in the pack
+
+    Returns:
+        The number of loose objects removed
+    """
+    removed = 0
+
+    for fanout_dir in repo.objects_dir.iterdir():
+        if len(fanout_dir.name) != 2 or not fanout_dir.is_dir():
+            continue
+
+        for object_path in fanout_dir.iterdir():
+            if fanout_dir.name + object_path.name in object_ids:
+                object_path.unlink()
+                removed += 1
+
+        # Remove the fanout directory once it is empty
+        if not any(fanout_dir.iterdir()):
+            fanout_dir.rmdir()
+
+    return removed
+
+
+def repack_repository(repo: Repository, delete_redundant: bool = False,
+                      window: int = DEFAULT_WINDOW, depth: int = DEFAULT_DEPTH,
+                      workers: int = 1) -> Dict[str, int]:
+    """
+    Write all reachable objects into a single new pack.
+
+    Args:
+        repo: The repository
+        delete_redundant: Whether to delete the old packs and the loose
+                          objects that are now stored in the new pack
+        window: The delta search window (0 disables delta compression)
+        depth: The maximum delta chain length
+        workers: The number of delta search workers (processes when > 1,
+                 since the search is CPU-bound Python code)
+
+    Returns:
+        A dictionary with the number of packed objects, removed loose
+        objects and removed packs
+    """
+    store = repo.object_store
+    paths: Dict[str, str] = {}
+    objects = collect_reachable_objects(repo, paths)
+
+    stats = {"objects": len(objects), "pruned": 0, "packs_removed": 0}
+    if not objects:
+        return stats
+
+    old_packs = [pack.path for pack in store.packs]
+    new_pack = write_pack(
+        store.pack_dir, objects, paths,
+        window=window, depth=depth, workers=workers, use_processes=workers > 1
+    )
+
+    if delete_redundant:
+        # Old packs must be unmapped before their files can be removed
+        store.close()
+
+        for pack_path in old_packs:
+            if pack_path == new_pack:
+                continue
+            pack_path.with_suffix(".idx").unlink()
+            pack_path.unlink()
+            stats["packs_removed"] += 1
+
+        packed_ids = set(object_id for object_id, _, _ in objects)
+        stats["pruned"] = prune_packed_objects(repo, packed_ids)
+
+    store.refresh()
+    return stats
+
+
+@click.command()
+@click.option("-d", "--delete", "delete_redundant", is_flag=True,
+              help="Remove redundant packs and loose objects after packing")
+@click.option("--window", type=int, default=DEFAULT_WINDOW, show_default=True,
+              help="Number of objects to consider as delta bases (0 disables deltas)")
+@click.option("--depth", type=int, default=DEFAULT_DEPTH, show_default=True,
+              help="Maximum delta chain length")
+@click.option("--threads", type=int, default=1, show_default=True,
+              help="Number of parallel delta search workers")
+def repack(delete_redundant: bool = False, window: int = DEFAULT_WINDOW,
+           depth: int = DEFAULT_DEPTH, threads: int = 1) -> None:
+    """
+    Pack reachable objects into a single pack.
+
+    Walks every reference and writes all reachable objects into a new
+    packfile with an index. With -d, old packs and loose objects that
+    are now packed are removed.
+    """
+    # Find the repository
+    repo = Repository.find()
+    if repo is None:
+        click.echo("fatal: not a git repository (or any of the parent directories)", err=True)
+        sys.exit(1)
+
+    try:
+        stats = repack_repository(repo, delete_redundant, window, depth, threads)
+
+        if stats["objects"] == 0:
+            click.echo("Nothing new to pack.")
+        else:
+            click.echo(f"Packed {stats['objects']} objects")
+            if delete_redundant:
+                click.echo(
+                    f"Removed {stats['pruned']} loose objects and "
+                    f"{stats['packs_removed']} old packs"
+                )
+
+    except Exception as e:
+        click.echo(f"error: {e}", err=True)
+        sys.exit(1)
@@ -24,7 +24,7 @@ def reset_hard(repo: Repository, commit_id: str) -> None:
     commit = repo.get_object(commit_id)
     
     # Update the index
-    repo.index.entries.clear()
+    repo.index.clear()
     
     # In a real implementation, we would populate the index from the tree
     # and update the working directory
@@ -47,7 +47,7 @@ def reset_mixed(repo: Repository, commit_id: str) -> None:
     commit = repo.get_object(commit_id)
     
     # Update the index
-    repo.index.entries.clear()
+    repo.index.clear()
     
     # In a real implementation, we would populate the index from the tree
     tree = repo.get_object(commit.tree_id)
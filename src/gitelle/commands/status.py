@@ -4,12 +4,68 @@ Implementation of the 'status' command for GitEllE.
 import os
 import sys
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 import click
 
+from gitelle.core.index import mode_from_stat
 from gitelle.core.repository import Repository
-from gitelle.utils.filesystem import walk_files
+
+
+# Labels of the change statuses in the long format
+STATUS_LABELS = {"A": "new file", "M": "modified", "D": "deleted"}
+
+# Object ID shown for a side of a change where the path doesn't exist
+NULL_ID = "0" * 40
+
+# Escapes used when quoting paths in porcelain output
+QUOTE_ESCAPES = {
+    0x07: "\\a", 0x08: "\\b", 0x09: "\\t", 0x0A: "\\n", 0x0B: "\\v",
+    0x0C: "\\f", 0x0D: "\\r", 0x22: '\\"', 0x5C: "\\\\",
+}
+
+
+def get_head_tree_id(repo: Repository) -> Optional[str]:
+    """
+    Get the ID of the tree of the HEAD commit.
+    
+    Args:
+        repo: The repository
+    
+    Returns:
+        The tree ID, or None if there are no commits yet
+    """
+    head_target = repo.head.get_resolved_target()
+    if not head_target:
+        return None
+    return repo.get_object(head_target).tree_id
+
+
+def get_changes(repo: Repository) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]], List[str]]:
+    """
+    Get the changes in the index and the working directory.
+    
+    Args:
+        repo: The repository
+    
+    Returns:
+        A tuple of (staged changes, unstaged changes, untracked files), where
+        changes are (status, path) tuples with status "A", "M" or "D"
+    """
+    # Compare HEAD's tree with the index, skipping unchanged subtrees
+    staged_changes = repo.index.diff_tree(get_head_tree_id(repo))
+    
+    # Compare the index with the working tree, refreshing stale stat data
+    unstaged_changes = repo.index.refresh()
+    
+    # Get the untracked files, reading only directories that changed
+    untracked_files = repo.index.list_untracked()
+    
+    # Keep the refreshed entries and listings for the next run
+    if repo.index.dirty or repo.index.untracked_cache.dirty:
+        repo.index.write()
+    
+    return staged_changes, unstaged_changes, untracked_files
 
 
 def get_status(repo: Repository) -> Tuple[List[str], List[str], List[str]]:
@@ -22,66 +78,132 @@ def get_status(repo: Repository) -> Tuple[List[str], List[str], List[str]]:
     Returns:
         A tuple of (staged_files, unstaged_files, untracked_files)
     """
-    # Get all files in the working directory
-    working_files = set(str(f) for f in walk_files(repo.path))
+    staged_changes, unstaged_changes, untracked_files = get_changes(repo)
+    return (
+        [path for _, path in staged_changes],
+        [path for _, path in unstaged_changes],
+        untracked_files,
+    )
+
+
+def iter_porcelain(repo: Repository, version: str = "v2", quote: bool = True) -> Iterator[str]:
+    """
+    Generate the status in a machine-readable format.
     
-    # Get all files in the index
-    index_files = set(repo.index.entries.keys())
+    Records are generated as soon as they are known: the staged changes
+    come from the cache-tree assisted HEAD comparison, which only reads
+    the trees of changed directories, and are merged in path order with
+    the unstaged changes as the index refresh checks each batch of
+    entries. Untracked files follow. The refreshed index is written once
+    every record has been generated.
     
-    # Get all files in the current commit (if any)
-    head_tree_id = None
-    head_target = repo.head.get_resolved_target()
-    if head_target:
-        head_commit = repo.get_object(head_target)
-        head_tree_id = head_commit.tree_id
-    
-    head_files = set()
-    if head_tree_id:
-        # In a real implementation, this would traverse the tree
-        # For simplicity, we'll assume it's empty
-        pass
-    
-    # Calculate the status
-    staged_files = []
-    unstaged_files = []
-    untracked_files = []
-    
-    # Files staged for commit (in index but not in HEAD)
-    for file in sorted(index_files - head_files):
-        if file in working_files:
-            # Check if the file has been modified since it was staged
-            abs_path = repo.path / file
-            if abs_path.exists():
-                index_entry = repo.index.entries[file]
-                file_stat = abs_path.stat()
-                
-                # Compare size and modification time
-                if (index_entry.size != file_stat.st_size or
-                    index_entry.mtime != int(file_stat.st_mtime)):
-                    unstaged_files.append(file)
-            
-            staged_files.append(file)
+    Version "v2" records are Git's:
+    
+    - "1 <XY> N... <mH> <mI> <mW> <hH> <hI> <path>" for a changed tracked
+      path, with the modes and object IDs in HEAD, the index and the
+      working tree
+    - "? <path>" for an untracked file
+    
+    Version "v1" records are "<XY> <path>" and "?? <path>". In XY, X is
+    the staged status and Y the unstaged one ("A", "M", "D", or "." in v2
+    and " " in v1 for no change).
+    
+    Args:
+        repo: The repository
+        version: The format version ("v1" or "v2")
+        quote: Whether to quote paths with special characters (off for
+               NUL-terminated output)
+    
+    Yields:
+        The records, without terminators
+    """
+    index = repo.index
+    unchanged = "." if version == "v2" else " "
+    staged = index.diff_tree(get_head_tree_id(repo), detailed=True)
+    position = 0
+    
+    def tracked_record(path: str, staged_change: Optional[tuple], unstaged_status: Optional[str]) -> str:
+        x = staged_change[0] if staged_change is not None else unchanged
+        y = unstaged_status or unchanged
+        display_path = quote_path(path) if quote else path
+        if version != "v2":
+            return f"{x}{y} {display_path}"
+        
+        entry = index.entries.get(path)
+        index_mode, index_id = (entry.mode, entry.object_id) if entry is not None else (0, NULL_ID)
+        if staged_change is None:
+            head_mode, head_id = index_mode, index_id
         else:
-            # File was staged for removal
-            staged_files.append(file)
+            head_mode, head_id = staged_change[2], staged_change[3] or NULL_ID
+        
+        worktree_mode = index_mode
+        if entry is None or unstaged_status == "D":
+            worktree_mode = 0
+        elif unstaged_status == "M":
+            try:
+                worktree_mode = mode_from_stat(os.stat(repo.path / path))
+            except OSError:
+                worktree_mode = 0
+        
+        return (f"1 {x}{y} N... {head_mode:06o} {index_mode:06o} {worktree_mode:06o} "
+                f"{head_id} {index_id} {display_path}")
+    
+    for unstaged_status, path in index.iter_refresh():
+        while position < len(staged) and staged[position][1] < path:
+            yield tracked_record(staged[position][1], staged[position], None)
+            position += 1
+        
+        staged_change = None
+        if position < len(staged) and staged[position][1] == path:
+            staged_change = staged[position]
+            position += 1
+        yield tracked_record(path, staged_change, unstaged_status)
+    
+    for staged_change in staged[position:]:
+        yield tracked_record(staged_change[1], staged_change, None)
+    
+    untracked_prefix = "?" if version == "v2" else "??"
+    for path in index.list_untracked():
+        yield f"{untracked_prefix} {quote_path(path) if quote else path}"
+    
+    # Keep the refreshed entries and listings for the next run
+    if index.dirty or index.untracked_cache.dirty:
+        index.write()
+
+
+def quote_path(path: str) -> str:
+    """
+    Quote a path the way Git does if it contains special characters.
     
-    # Files modified but not staged (in working dir and HEAD, but different from index)
-    for file in sorted(head_files & working_files):
-        if file not in index_files:
-            unstaged_files.append(file)
+    Args:
+        path: The path
     
-    # Untracked files (in working dir but not in index or HEAD)
-    for file in sorted(working_files - index_files - head_files):
-        # Skip files in .gitelle directory
-        if not file.startswith(".gitelle/"):
-            untracked_files.append(file)
+    Returns:
+        The path, or a double-quoted C-style string if it contains control
+        characters, double quotes, backslashes or non-ASCII characters
+    """
+    data = path.encode("utf-8", "surrogateescape")
+    if not any(byte < 0x20 or byte >= 0x7F or byte in (0x22, 0x5C) for byte in data):
+        return path
     
-    return staged_files, unstaged_files, untracked_files
+    quoted = []
+    for byte in data:
+        if byte in QUOTE_ESCAPES:
+            quoted.append(QUOTE_ESCAPES[byte])
+        elif byte < 0x20 or byte >= 0x7F:
+            quoted.append(f"\\{byte:03o}")
+        else:
+            quoted.append(chr(byte))
+    return '"' + "".join(quoted) + '"'
 
 
 @click.command()
 @click.option("-s", "--short", is_flag=True, help="Give the output in the short format")
-def status(short: bool = False) -> None:
+@click.option("--porcelain", type=click.Choice(["v1", "v2"]), is_flag=False, flag_value="v1",
+              default=None, help="Give the output in a machine-readable format (default: v1)")
+@click.option("-z", "null_terminated", is_flag=True,
+              help="Terminate records with NUL instead of LF (implies --porcelain)")
+def status(short: bool = False, porcelain: Optional[str] = None, null_terminated: bool = False) -> None:
     """
     Show the working tree status.
     
@@ -97,6 +219,13 @@ def status(short: bool = False) -> None:
         sys.exit(1)
     
     try:
+        # Stream machine-readable records as they are determined
+        if porcelain or null_terminated:
+            terminator = "\0" if null_terminated else "\n"
+            for record in iter_porcelain(repo, porcelain or "v1", quote=not null_terminated):
+                click.echo(record + terminator, nl=False)
+            return
+        
         # Get the current branch name
         branch_name = "detached HEAD"
         if repo.head.is_symbolic:
@@ -105,36 +234,36 @@ def status(short: bool = False) -> None:
                 branch_name = ref_name[11:]
         
         # Get the status
-        staged_files, unstaged_files, untracked_files = get_status(repo)
+        staged_changes, unstaged_changes, untracked_files = get_changes(repo)
         
         # Display the status
         if short:
             # Display in short format
-            for file in staged_files:
-                click.echo(f"A {file}")
-            for file in unstaged_files:
-                click.echo(f"M {file}")
+            for status_code, file in staged_changes:
+                click.echo(f"{status_code} {file}")
+            for status_code, file in unstaged_changes:
+                click.echo(f"{status_code} {file}")
             for file in untracked_files:
                 click.echo(f"? {file}")
         else:
             # Display in long format
             click.echo(f"On branch {branch_name}")
             
-            if not staged_files and not unstaged_files and not untracked_files:
+            if not staged_changes and not unstaged_changes and not untracked_files:
                 click.echo("nothing to commit, working tree clean")
             else:
-                if staged_files:
+                if staged_changes:
                     click.echo("\nChanges to be committed:")
                     click.echo("  (use \"gitelle reset HEAD <file>...\" to unstage)")
-                    for file in staged_files:
-                        click.echo(f"        new file:   {file}")
+                    for status_code, file in staged_changes:
+                        click.echo(f"        {STATUS_LABELS[status_code] + ':':<12}{file}")
                 
-                if unstaged_files:
+                if unstaged_changes:
                     click.echo("\nChanges not staged for commit:")
                     click.echo("  (use \"gitelle add <file>...\" to update what will be committed)")
                     click.echo("  (use \"gitelle checkout -- <file>...\" to discard changes in working directory)")
-                    for file in unstaged_files:
-                        click.echo(f"        modified:   {file}")
+                    for status_code, file in unstaged_changes:
+                        click.echo(f"        {STATUS_LABELS[status_code] + ':':<12}{file}")
                 
                 if untracked_files:
                     click.echo("\nUntracked files:")
@@ -0,0 +1,49 @@
+"""
+Implementation of the 'update-index' command for GitEllE.
+"""
+import sys
+from typing import Optional
+
+import click
+
+from gitelle.core.repository import Repository
+
+
+@click.command("update-index")
+@click.option("--refresh", is_flag=True,
+              help="Refresh the stat data of entries whose content is unchanged")
+@click.option("-q", "--quiet", is_flag=True, help="Don't report files that need updating")
+@click.option("-j", "--jobs", type=click.IntRange(min=1), default=None,
+              help="Number of threads (default: the number of CPUs)")
+def update_index(refresh: bool = False, quiet: bool = False, jobs: Optional[int] = None) -> None:
+    """
+    Register file contents in the working tree to the index.
+
+    With --refresh, the working tree files are compared with their
+    entries: entries whose files were touched but not changed get the
+    files' current stat data, so later commands don't hash them again.
+    Files whose content changed are reported as needing an update.
+    """
+    # Find the repository
+    repo = Repository.find()
+    if repo is None:
+        click.echo("fatal: not a git repository (or any of the parent directories)", err=True)
+        sys.exit(1)
+
+    try:
+        if not refresh:
+            return
+
+        changes = repo.index.refresh(workers=jobs)
+        if repo.index.dirty:
+            repo.index.write()
+
+        if changes:
+            if not quiet:
+                for _, path in changes:
+                    click.echo(f"{path}: needs update")
+            sys.exit(1)
+
+    except Exception as e:
+        click.echo(f"error: {e}", err=True)
+        sys.exit(1)
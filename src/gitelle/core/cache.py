@@ -0,0 +1,193 @@
+"""
+Implementation of the in-process object cache.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+# Default budget for trees and commits
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# Default budget for blobs
+DEFAULT_MAX_BLOB_BYTES = 16 * 1024 * 1024
+
+# Blobs larger than this are never cached
+DEFAULT_MAX_BLOB_SIZE = 1024 * 1024
+
+
+class _LRUSegment:
+    """
+    A least-recently-used mapping with a budget in bytes.
+
+    Attributes:
+        max_bytes: The byte budget of the segment
+        current_bytes: The number of bytes currently cached
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, value: Any, size: int) -> None:
+        if size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old[1]
+
+        self._entries[key] = (value, size)
+        self.current_bytes += size
+        self.evict()
+
+    def evict(self) -> None:
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.current_bytes = 0
+
+
+class ObjectCache:
+    """
+    A byte-budgeted LRU cache of parsed objects, keyed by object ID.
+
+    Trees and commits are small, hot and expensive to re-parse, so they
+    live in their own segment. Blobs use a separate, smaller segment and
+    blobs above `max_blob_size` are never cached, so reading one large
+    file can't flush every tree and commit out of the cache.
+
+    Cached objects are shared between callers and must be treated as
+    read-only.
+
+    Attributes:
+        hits: The number of lookups served from the cache
+        misses: The number of lookups that missed
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_blob_bytes: int = DEFAULT_MAX_BLOB_BYTES,
+                 max_blob_size: int = DEFAULT_MAX_BLOB_SIZE):
+        """
+        Initialize an object cache.
+
+        Args:
+            max_bytes: The budget for trees and commits, in bytes
+            max_blob_bytes: The budget for blobs, in bytes
+            max_blob_size: The size above which blobs are not cached
+        """
+        self._objects = _LRUSegment(max_bytes)
+        self._blobs = _LRUSegment(max_blob_bytes)
+        self.max_blob_size = max_blob_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._objects) + len(self._blobs)
+
+    @property
+    def current_bytes(self) -> int:
+        """Get the number of bytes currently cached."""
+        return self._objects.current_bytes + self._blobs.current_bytes
+
+    def get(self, object_id: str) -> Optional[Any]:
+        """
+        Look up an object.
+
+        Args:
+            object_id: The object ID
+
+        Returns:
+            The cached object, or None
+        """
+        with self._lock:
+            obj = self._objects.get(object_id)
+            if obj is None:
+                obj = self._blobs.get(object_id)
+
+            if obj is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            return obj
+
+    def put(self, object_id: str, obj: Any, size: int) -> None:
+        """
+        Add an object to the cache.
+
+        Args:
+            object_id: The object ID
+            obj: The parsed object
+            size: The size of the object's data, in bytes
+        """
+        with self._lock:
+            if obj.type == "blob":
+                if size <= self.max_blob_size:
+                    self._blobs.put(object_id, obj, size)
+            else:
+                self._objects.put(object_id, obj, size)
+
+    def clear(self) -> None:
+        """Remove every object from the cache and reset the counters."""
+        with self._lock:
+            self._objects.clear()
+            self._blobs.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def resize(self, max_bytes: Optional[int] = None, max_blob_bytes: Optional[int] = None,
+               max_blob_size: Optional[int] = None) -> None:
+        """
+        Change the cache budgets, evicting objects as needed.
+
+        Args:
+            max_bytes: The new budget for trees and commits (default: unchanged)
+            max_blob_bytes: The new budget for blobs (default: unchanged)
+            max_blob_size: The new blob size limit (default: unchanged)
+        """
+        with self._lock:
+            if max_bytes is not None:
+                self._objects.max_bytes = max_bytes
+                self._objects.evict()
+            if max_blob_bytes is not None:
+                self._blobs.max_bytes = max_blob_bytes
+                self._blobs.evict()
+            if max_blob_size is not None:
+                self.max_blob_size = max_blob_size
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache statistics.
+
+        Returns:
+            A dictionary with hit/miss counters, entry count and sizes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._objects) + len(self._blobs),
+                "bytes": self._objects.current_bytes + self._blobs.current_bytes,
+                "max_bytes": self._objects.max_bytes,
+                "max_blob_bytes": self._blobs.max_bytes,
+                "max_blob_size": self.max_blob_size,
+            }
+
+    def __repr__(self) -> str:
+        return f"ObjectCache(entries={len(self)}, bytes={self.current_bytes})"
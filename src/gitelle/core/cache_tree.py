@@ -0,0 +1,155 @@
+"""
+Implementation of the cache-tree index extension.
+"""
+from typing import Dict, Optional, Tuple
+
+
+# Signature of the cache-tree extension in the index file
+SIGNATURE = b"TREE"
+
+
+class CacheTree:
+    """
+    Represents a node of the cache-tree (Git's TREE index extension).
+
+    Each node caches the ID of the tree object built for a directory and
+    the number of index entries under it. Changing an index entry
+    invalidates only the nodes along its path, so building the root tree
+    again only rebuilds the directories that changed.
+
+    Attributes:
+        entry_count: The number of index entries under the directory,
+                     or -1 if the node is invalid
+        object_id: The ID of the tree object (meaningless when invalid)
+        children: The nodes of the subdirectories, keyed by name
+    """
+
+    def __init__(self):
+        """Initialize an invalid cache-tree node."""
+        self.entry_count = -1
+        self.object_id = None
+        self.children: Dict[str, "CacheTree"] = {}
+
+    @property
+    def is_valid(self) -> bool:
+        """Check whether the cached tree ID can be used."""
+        return self.entry_count >= 0
+
+    def invalidate(self, path: str) -> None:
+        """
+        Invalidate the nodes of every directory containing a path.
+
+        Args:
+            path: The path of the changed index entry
+        """
+        node = self
+        for name in path.split("/")[:-1]:
+            node.entry_count = -1
+            node = node.children.get(name)
+            if node is None:
+                return
+        node.entry_count = -1
+
+    def find(self, path: str) -> Optional["CacheTree"]:
+        """
+        Find the node of a directory.
+
+        Args:
+            path: The directory path ("" for the root)
+
+        Returns:
+            The node, or None if the directory is not cached
+        """
+        node = self
+        for name in path.split("/") if path else []:
+            node = node.children.get(name)
+            if node is None:
+                return None
+        return node
+
+    def serialize(self) -> bytes:
+        """
+        Serialize the cache-tree in Git's TREE extension format.
+
+        Returns:
+            The extension data
+        """
+        output = []
+        self._serialize_into(output, b"")
+        return b"".join(output)
+
+    def _serialize_into(self, output: list, name: bytes) -> None:
+        """
+        Serialize a node and its children.
+
+        Each node is "<name>\\0<entry count> <subtree count>\\n" followed
+        by the raw tree ID if the node is valid, then its children.
+
+        Args:
+            output: The list the serialized chunks are appended to
+            name: The directory name of the node
+        """
+        output.append(name + b"\x00" + f"{self.entry_count} {len(self.children)}\n".encode())
+        if self.is_valid:
+            output.append(bytes.fromhex(self.object_id))
+        for child_name in sorted(self.children):
+            self.children[child_name]._serialize_into(output, child_name.encode())
+
+    @classmethod
+    def deserialize(cls, data: bytes) -> "CacheTree":
+        """
+        Deserialize a cache-tree from TREE extension data.
+
+        Args:
+            data: The extension data
+
+        Returns:
+            The root node
+
+        Raises:
+            ValueError: If the data is invalid
+        """
+        try:
+            _, root, offset = cls._parse(data, 0)
+        except (IndexError, ValueError) as e:
+            raise ValueError(f"Invalid cache-tree extension: {e}")
+
+        if offset != len(data):
+            raise ValueError("Invalid cache-tree extension: trailing data")
+        return root
+
+    @classmethod
+    def _parse(cls, data: bytes, offset: int) -> Tuple[str, "CacheTree", int]:
+        """
+        Parse a node and its children.
+
+        Args:
+            data: The extension data
+            offset: The offset of the node
+
+        Returns:
+            A tuple of (directory name, node, offset after the node)
+        """
+        node = cls()
+
+        name_end = data.index(b"\x00", offset)
+        line_end = data.index(b"\n", name_end)
+        name = data[offset:name_end].decode()
+        entry_count, subtree_count = data[name_end + 1:line_end].split(b" ")
+        node.entry_count = int(entry_count)
+        offset = line_end + 1
+
+        if node.is_valid:
+            if offset + 20 > len(data):
+                raise ValueError("truncated tree ID")
+            node.object_id = data[offset:offset + 20].hex()
+            offset += 20
+
+        for _ in range(int(subtree_count)):
+            child_name, child, offset = cls._parse(data, offset)
+            node.children[child_name] = child
+
+        return name, node, offset
+
+    def __repr__(self) -> str:
+        return f"CacheTree({self.entry_count}, {self.object_id}, {len(self.children)} subtrees)"
@@ -0,0 +1,322 @@
+"""
+Implementation of the file system monitor protocol and index extension.
+"""
+import shlex
+import socket
+import struct
+import subprocess
+from typing import List, Optional, Set, Tuple
+
+
+# Signature of the fsmonitor extension in the index file
+SIGNATURE = b"FSMN"
+
+# Version of the extension and of the hook protocol
+VERSION = 2
+
+# A changed path that means "assume everything changed"
+TRIVIAL_RESPONSE = "/"
+
+# Name of the daemon's socket in the .gitelle directory
+DAEMON_SOCKET = "fsmonitor--daemon.ipc"
+
+# Seconds to wait for the daemon or the hook to answer
+QUERY_TIMEOUT = 10.0
+
+# Bits per EWAH word
+EWAH_WORD_BITS = 64
+
+# Largest number of literal words one EWAH marker word can announce
+EWAH_MAX_LITERALS = (1 << 31) - 1
+
+
+class FSMonitorResult:
+    """
+    Represents the answer of a file system monitor.
+
+    Attributes:
+        token: The token to ask for the changes after this answer
+        paths: The paths changed since the token that was asked about
+               (directories end with "/"), or None if every path has to
+               be assumed changed
+    """
+
+    __slots__ = ("token", "paths")
+
+    def __init__(self, token: str, paths: Optional[List[str]]):
+        self.token = token
+        self.paths = paths
+
+    @classmethod
+    def parse(cls, data: bytes) -> "FSMonitorResult":
+        """
+        Parse a "<token>\\0<path>\\0<path>\\0..." response.
+
+        Args:
+            data: The response
+
+        Returns:
+            A new FSMonitorResult instance
+
+        Raises:
+            ValueError: If the response has no token
+        """
+        fields = data.split(b"\x00")
+        token = fields[0].decode(errors="surrogateescape")
+        if not token:
+            raise ValueError("fsmonitor response has no token")
+
+        paths = [field.decode(errors="surrogateescape") for field in fields[1:] if field]
+        if TRIVIAL_RESPONSE in paths:
+            return cls(token, None)
+        return cls(token, paths)
+
+    def __repr__(self) -> str:
+        count = "all" if self.paths is None else len(self.paths)
+        return f"FSMonitorResult({self.token!r}, {count} paths)"
+
+
+def get_monitor(repo) -> Optional[str]:
+    """
+    Get the configured file system monitor.
+
+    Set with core.fsmonitor: true for the built-in daemon, or the command
+    of a hook speaking the version 2 hook protocol.
+
+    Args:
+        repo: The repository
+
+    Returns:
+        "daemon", the hook command, or None if no monitor is configured
+    """
+    value = repo.config.get("core", "fsmonitor", "").strip()
+    if value.lower() in ("", "false", "no", "off", "0"):
+        return None
+    if value.lower() in ("true", "yes", "on", "1"):
+        return "daemon"
+    return value
+
+
+def query(repo, token: Optional[str]) -> Optional[FSMonitorResult]:
+    """
+    Ask the configured monitor which paths changed since a token.
+
+    Args:
+        repo: The repository
+        token: The token of the previous answer, or None
+
+    Returns:
+        The answer, or None if no monitor is configured or it failed
+    """
+    monitor = get_monitor(repo)
+    if monitor is None:
+        return None
+
+    try:
+        if monitor == "daemon":
+            data = query_daemon(repo, token)
+        else:
+            data = query_hook(repo, monitor, token)
+        if data is None:
+            return None
+        return FSMonitorResult.parse(data)
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+def query_hook(repo, command: str, token: Optional[str]) -> Optional[bytes]:
+    """
+    Run a monitor hook as "<command> 2 <token>".
+
+    Args:
+        repo: The repository
+        command: The hook command
+        token: The token of the previous answer, or None
+
+    Returns:
+        The hook's output, or None if it failed
+    """
+    result = subprocess.run(
+        shlex.split(command) + [str(VERSION), token or ""],
+        cwd=repo.path, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, timeout=QUERY_TIMEOUT
+    )
+    if result.returncode != 0:
+        return None
+    return result.stdout
+
+
+def query_daemon(repo, token: Optional[str]) -> Optional[bytes]:
+    """
+    Ask the fsmonitor daemon of a repository for the changes since a token.
+
+    Args:
+        repo: The repository
+        token: The token of the previous answer, or None
+
+    Returns:
+        The daemon's answer, or None if it isn't running
+    """
+    return send_request(repo, b"query " + (token or "").encode(errors="surrogateescape"))
+
+
+def send_request(repo, request: bytes) -> Optional[bytes]:
+    """
+    Send one request to the fsmonitor daemon of a repository.
+
+    Args:
+        repo: The repository
+        request: The request line, without the newline
+
+    Returns:
+        The daemon's answer, or None if it isn't running
+    """
+    socket_path = str(repo.gitelle_dir / DAEMON_SOCKET)
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(QUERY_TIMEOUT)
+            sock.connect(socket_path)
+            sock.sendall(request + b"\n")
+            sock.shutdown(socket.SHUT_WR)
+
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+    except OSError:
+        return None
+
+    return b"".join(chunks)
+
+
+def serialize_extension(token: str, dirty: Set[int], count: int) -> bytes:
+    """
+    Serialize the fsmonitor extension in Git's format.
+
+    The extension is the version, the NUL-terminated token and an EWAH
+    bitmap of the entries (by position) that must be checked even if the
+    monitor doesn't report them.
+
+    Args:
+        token: The token of the last answer
+        dirty: The positions of the entries that aren't known to be unchanged
+        count: The number of entries
+
+    Returns:
+        The extension data
+    """
+    bitmap = encode_ewah(dirty, count)
+    return (struct.pack(">L", VERSION) + token.encode(errors="surrogateescape") + b"\x00" +
+            struct.pack(">L", len(bitmap)) + bitmap)
+
+
+def parse_extension(data: bytes) -> Tuple[str, Set[int], int]:
+    """
+    Parse the fsmonitor extension.
+
+    Args:
+        data: The extension data
+
+    Returns:
+        A tuple of (token, positions of the dirty entries, number of
+        entries the bitmap covers)
+
+    Raises:
+        ValueError: If the data is invalid
+    """
+    try:
+        version, = struct.unpack_from(">L", data, 0)
+        if version != VERSION:
+            raise ValueError(f"unsupported version {version}")
+        token_end = data.index(b"\x00", 4)
+        token = data[4:token_end].decode(errors="surrogateescape")
+        bitmap_size, = struct.unpack_from(">L", data, token_end + 1)
+        bitmap_start = token_end + 5
+        if bitmap_start + bitmap_size > len(data):
+            raise ValueError("truncated bitmap")
+        dirty, count = decode_ewah(data[bitmap_start:bitmap_start + bitmap_size])
+    except (struct.error, ValueError) as e:
+        raise ValueError(f"Invalid fsmonitor extension: {e}")
+    return token, dirty, count
+
+
+def encode_ewah(bits: Set[int], size: int) -> bytes:
+    """
+    Encode a bitmap in Git's EWAH format.
+
+    The words are stored as literals behind marker words, which Git's
+    reader accepts; bitmaps of index entries are small enough that run
+    compression isn't worth it.
+
+    Args:
+        bits: The positions of the set bits
+        size: The number of bits
+
+    Returns:
+        The encoded bitmap
+    """
+    words = [0] * -(-size // EWAH_WORD_BITS)
+    for bit in bits:
+        words[bit // EWAH_WORD_BITS] |= 1 << (bit % EWAH_WORD_BITS)
+
+    buffer = []
+    last_marker = 0
+    for start in range(0, len(words), EWAH_MAX_LITERALS):
+        literals = words[start:start + EWAH_MAX_LITERALS]
+        last_marker = len(buffer)
+        buffer.append(len(literals) << 33)
+        buffer.extend(literals)
+    if not buffer:
+        buffer.append(0)
+
+    return (struct.pack(">LL", size, len(buffer)) +
+            struct.pack(f">{len(buffer)}Q", *buffer) +
+            struct.pack(">L", last_marker))
+
+
+def decode_ewah(data: bytes) -> Tuple[Set[int], int]:
+    """
+    Decode a bitmap in Git's EWAH format.
+
+    Args:
+        data: The encoded bitmap
+
+    Returns:
+        A tuple of (positions of the set bits, number of bits)
+
+    Raises:
+        ValueError: If the data is invalid
+    """
+    size, word_count = struct.unpack_from(">LL", data, 0)
+    if 8 + word_count * 8 + 4 > len(data):
+        raise ValueError("truncated EWAH bitmap")
+    buffer = struct.unpack_from(f">{word_count}Q", data, 8)
+
+    bits = set()
+    position = 0
+    i = 0
+    while i < word_count:
+        marker = buffer[i]
+        running_bit = marker & 1
+        running_length = (marker >> 1) & 0xFFFFFFFF
+        literal_count = marker >> 33
+        i += 1
+
+        if running_bit:
+            bits.update(range(position, position + running_length * EWAH_WORD_BITS))
+        position += running_length * EWAH_WORD_BITS
+
+        for word in buffer[i:i + literal_count]:
+            while word:
+                low = word & -word
+                bits.add(position + low.bit_length() - 1)
+                word ^= low
+            position += EWAH_WORD_BITS
+        i += literal_count
+
+    return {bit for bit in bits if bit < size}, size
@@ -0,0 +1,456 @@
+"""
+Implementation of the built-in file system monitor daemon.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import socket
+import struct
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple, Union
+
+from gitelle.core.fsmonitor import DAEMON_SOCKET, TRIVIAL_RESPONSE
+
+
+# Directory that is never watched
+GITELLE_DIR = ".gitelle"
+
+# Prefix of the files created in .gitelle to flush pending events
+COOKIE_PREFIX = "fsmonitor--daemon.cookie."
+
+# Seconds to wait for a cookie file's event before assuming events were lost
+COOKIE_TIMEOUT = 2.0
+
+# Seconds between checks for a stop request when idle
+IDLE_INTERVAL = 1.0
+
+# inotify event masks (from <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# Events that change a path
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+# Fixed-length part of an inotify event (wd, mask, cookie, name length)
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class FSMonitorDaemon:
+    """
+    Records the changes of a working tree and answers queries about them.
+
+    Every batch of changes gets a sequence number; tokens name the daemon
+    instance and a sequence number, so a query returns the paths changed
+    after that number. Tokens from another instance, or from before
+    events were lost, get the trivial "everything changed" answer.
+
+    Queries are answered over a Unix domain socket in the .gitelle
+    directory, one request per connection:
+
+    - "query <token>": answer "<new token>\\0<path>\\0<path>\\0..."
+    - "ping": answer "ok"
+    - "quit": answer "ok" and stop
+
+    Attributes:
+        root: The root of the working tree
+        socket_path: The path of the socket
+        backend: The source of change events
+    """
+
+    def __init__(self, root: Union[str, Path], backend=None):
+        """
+        Initialize a daemon.
+
+        Args:
+            root: The root of the working tree
+            backend: The source of change events (default: inotify on
+                     Linux, polling elsewhere)
+        """
+        self.root = str(root)
+        self.socket_path = os.path.join(self.root, GITELLE_DIR, DAEMON_SOCKET)
+        self.backend = backend if backend is not None else create_backend(self.root)
+
+        self._instance = uuid.uuid4().hex[:12]
+        self._sequence = 0
+        self._first_valid = 0
+        self._changes: Dict[str, int] = {}
+
+    @property
+    def token(self) -> str:
+        """Get the token naming the current state."""
+        return f"gitelle:{self._instance}:{self._sequence}"
+
+    def record(self, paths: Iterable[str]) -> None:
+        """
+        Record a batch of changed paths.
+
+        Args:
+            paths: The changed paths (directories end with "/")
+        """
+        paths = list(paths)
+        if paths:
+            self._sequence += 1
+            for path in paths:
+                self._changes[path] = self._sequence
+
+    def record_everything(self) -> None:
+        """Record that events were lost, so every older token is invalid."""
+        self._sequence += 1
+        self._first_valid = self._sequence
+        self._changes.clear()
+
+    def answer(self, token: str) -> bytes:
+        """
+        Answer a query.
+
+        Args:
+            token: The token of the client's previous answer
+
+        Returns:
+            The response
+        """
+        self.backend.sync(self)
+
+        name, _, sequence = token.rpartition(":")
+        if name != f"gitelle:{self._instance}" or not sequence.isdigit() or int(sequence) < self._first_valid:
+            paths = [TRIVIAL_RESPONSE]
+        else:
+            since = int(sequence)
+            paths = sorted(path for path, changed in self._changes.items() if changed > since)
+
+        return self.token.encode() + b"\x00" + b"".join(
+            path.encode(errors="surrogateescape") + b"\x00" for path in paths
+        )
+
+    def serve_forever(self) -> None:
+        """Answer queries until asked to quit."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(self.socket_path)
+            server.listen(16)
+
+            while True:
+                watched = [server]
+                if self.backend.fileno() is not None:
+                    watched.append(self.backend.fileno())
+
+                readable, _, _ = select.select(watched, [], [], IDLE_INTERVAL)
+                if self.backend.fileno() in readable:
+                    self.backend.read_events(self)
+                if server in readable and not self._handle(server):
+                    break
+        finally:
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.backend.close()
+
+    def _handle(self, server: socket.socket) -> bool:
+        """
+        Handle one connection.
+
+        Args:
+            server: The listening socket
+
+        Returns:
+            False if the daemon was asked to quit, True otherwise
+        """
+        connection, _ = server.accept()
+        with connection:
+            connection.settimeout(IDLE_INTERVAL * 5)
+            request = b""
+            try:
+                while not request.endswith(b"\n"):
+                    chunk = connection.recv(4096)
+                    if not chunk:
+                        break
+                    request += chunk
+            except OSError:
+                return True
+
+            command, _, argument = request.rstrip(b"\n").partition(b" ")
+            try:
+                if command == b"query":
+                    connection.sendall(self.answer(argument.decode(errors="surrogateescape")))
+                elif command in (b"ping", b"quit"):
+                    connection.sendall(b"ok")
+                    return command != b"quit"
+            except OSError:
+                pass
+        return True
+
+
+class PollingBackend:
+    """
+    Finds changes by comparing stat snapshots of the working tree.
+
+    Used where inotify isn't available. Every query rescans the tree, so
+    it costs a stat sweep in the daemon, but none in the client.
+    """
+
+    def __init__(self, root: str):
+        """
+        Take the first snapshot of a working tree.
+
+        Args:
+            root: The root of the working tree
+        """
+        self.root = root
+        self._snapshot = self._scan()
+
+    def fileno(self) -> Optional[int]:
+        """Polling has no file descriptor to wait on."""
+        return None
+
+    def read_events(self, daemon: FSMonitorDaemon) -> None:
+        """Polling has no events to read."""
+
+    def sync(self, daemon: FSMonitorDaemon) -> None:
+        """
+        Record every change since the previous snapshot.
+
+        Args:
+            daemon: The daemon recording the changes
+        """
+        snapshot = self._scan()
+        old = self._snapshot
+        daemon.record(
+            path for path in snapshot.keys() | old.keys() if snapshot.get(path) != old.get(path)
+        )
+        self._snapshot = snapshot
+
+    def _scan(self) -> Dict[str, Tuple[int, int, int, int]]:
+        """Stat every file and directory (directories end with "/")."""
+        snapshot = {}
+        pending = [""]
+
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(os.path.join(self.root, directory)) as it:
+                    for entry in it:
+                        if entry.name == GITELLE_DIR and not directory:
+                            continue
+                        path = directory + entry.name
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            path += "/"
+                            pending.append(path)
+                        snapshot[path] = (st.st_mtime_ns, st.st_size, st.st_ino, st.st_mode)
+            except OSError:
+                continue
+
+        return snapshot
+
+    def close(self) -> None:
+        """Nothing to release."""
+
+
+class InotifyBackend:
+    """
+    Finds changes with Linux's inotify, called through ctypes.
+
+    Every directory of the working tree except .gitelle gets a watch.
+    To make sure every event that happened before a query has been read,
+    the query creates a cookie file in .gitelle (which is watched for
+    that alone) and events are read until the cookie's shows up.
+    """
+
+    def __init__(self, root: str):
+        """
+        Watch a working tree.
+
+        Args:
+            root: The root of the working tree
+
+        Raises:
+            OSError: If inotify isn't available
+        """
+        self.root = root
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        self._watches: Dict[int, str] = {}
+        self._cookie_count = 0
+        self._cookies_seen: Set[str] = set()
+        self._cookie_watch = self._add_watch(os.path.join(root, GITELLE_DIR), IN_CREATE)
+        self._watch_tree("")
+
+    def fileno(self) -> Optional[int]:
+        """Get the inotify file descriptor."""
+        return self._fd
+
+    def _add_watch(self, path: str, mask: int) -> int:
+        """Add a watch; returns its descriptor, or -1 if the path is gone."""
+        return self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+
+    def _watch_tree(self, directory: str) -> Set[str]:
+        """
+        Watch a directory and every directory below it.
+
+        Args:
+            directory: The directory, relative to the root, ending with "/"
+                       ("" for the root)
+
+        Returns:
+            The paths found below the directory, which may have been
+            created before their watch existed
+        """
+        found = set()
+        pending = [directory]
+
+        while pending:
+            current = pending.pop()
+            wd = self._add_watch(os.path.join(self.root, current), WATCH_MASK)
+            if wd < 0:
+                continue
+            self._watches[wd] = current
+
+            try:
+                with os.scandir(os.path.join(self.root, current)) as it:
+                    for entry in it:
+                        if entry.name == GITELLE_DIR and not current:
+                            continue
+                        path = current + entry.name
+                        if entry.is_dir(follow_symlinks=False):
+                            path += "/"
+                            pending.append(path)
+                        found.add(path)
+            except OSError:
+                continue
+
+        return found
+
+    def read_events(self, daemon: FSMonitorDaemon) -> None:
+        """
+        Read the pending events and record the changed paths.
+
+        Args:
+            daemon: The daemon recording the changes
+        """
+        changed = set()
+
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\x00"))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    daemon.record_everything()
+                    changed.clear()
+                    continue
+
+                if wd == self._cookie_watch:
+                    if name.startswith(COOKIE_PREFIX):
+                        self._cookies_seen.add(name)
+                    continue
+
+                directory = self._watches.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    del self._watches[wd]
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    changed.add(directory if directory else TRIVIAL_RESPONSE)
+                    continue
+
+                path = directory + name
+                if mask & IN_ISDIR:
+                    path += "/"
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        changed.update(self._watch_tree(path))
+                changed.add(path)
+
+        daemon.record(changed)
+
+    def sync(self, daemon: FSMonitorDaemon) -> None:
+        """
+        Read every event that happened before now.
+
+        Args:
+            daemon: The daemon recording the changes
+        """
+        self._cookie_count += 1
+        name = f"{COOKIE_PREFIX}{os.getpid()}.{self._cookie_count}"
+        path = os.path.join(self.root, GITELLE_DIR, name)
+
+        with open(path, "wb"):
+            pass
+        try:
+            deadline = time.monotonic() + COOKIE_TIMEOUT
+            while name not in self._cookies_seen:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # The cookie's event was lost, so others may have been too
+                    daemon.record_everything()
+                    break
+                readable, _, _ = select.select([self._fd], [], [], remaining)
+                if readable:
+                    self.read_events(daemon)
+        finally:
+            self._cookies_seen.discard(name)
+            os.unlink(path)
+
+    def close(self) -> None:
+        """Close the inotify file descriptor."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_backend(root: str):
+    """
+    Create the best available source of change events.
+
+    Args:
+        root: The root of the working tree
+
+    Returns:
+        An InotifyBackend on Linux, or a PollingBackend
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyBackend(root)
+        except (OSError, AttributeError):
+            pass
+    return PollingBackend(root)
@@ -1,16 +1,144 @@
 """
 Implementation of the Git index (staging area).
 """
+import bisect
+import copy
 import hashlib
 import os
+import stat
 import struct
+import tempfile
 import time
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple, Union
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set, Tuple, Union
 
-from gitelle.core.objects import Blob
-from gitelle.utils.filesystem import is_executable
+from gitelle.core import cache_tree, fsmonitor, untracked_cache
+from gitelle.core.cache_tree import CacheTree
+from gitelle.core.objects import Blob, Tree
+from gitelle.core.tree_diff import iter_tree_changes
+from gitelle.core.untracked_cache import UntrackedCache
+from gitelle.utils.filesystem import scan_tree
+
+
+# Fixed-length part of an index entry (everything up to the path)
+ENTRY_HEADER = struct.Struct(">LLLLLLLLLL20sH")
+
+# Index file header: signature, version and entry count
+INDEX_HEADER = struct.Struct(">4sLL")
+
+# Extension header: signature and size
+EXTENSION_HEADER = struct.Struct(">4sL")
+
+# Name length stored in the flags when the path is too long to fit
+NAME_MASK = 0xFFF
+
+# Amount of serialized data buffered before it is hashed and written
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Stat fields are stored as 32-bit values
+STAT_MASK = 0xFFFFFFFF
+
+# ID of the empty blob, the only content an entry with size 0 can match
+EMPTY_BLOB_ID = "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+
+# Signature of the split-index link extension
+LINK_SIGNATURE = b"link"
+
+# Signatures of the end-of-index-entries and index-entry-offset-table extensions
+EOIE_SIGNATURE = b"EOIE"
+IEOT_SIGNATURE = b"IEOT"
+
+# Offset of the first extension, followed by a hash of the extension headers
+EOIE_DATA = struct.Struct(">L20s")
+
+# Offset and entry count of an IEOT block
+IEOT_BLOCK = struct.Struct(">LL")
+
+# Version of the IEOT extension format
+IEOT_VERSION = 1
+
+# Number of entries per IEOT block; indexes with more than one block get
+# an offset table so their entries can be decoded in parallel
+IEOT_BLOCK_SIZE = 10_000
+
+# Files queued per add worker; bounds the work in flight
+ADD_QUEUE_FACTOR = 4
+
+# Minimum number of paths each thread stats when refreshing the index
+REFRESH_CHUNK_SIZE = 500
+
+# Paths checked per thread before the changes found so far are reported
+REFRESH_BATCH_SIZE = 8 * REFRESH_CHUNK_SIZE
+
+# Shared indexes are stored as .gitelle/sharedindex.<checksum>
+SHARED_INDEX_PREFIX = "sharedindex."
+
+# Default share of changed entries above which the shared index is rewritten
+DEFAULT_MAX_PERCENT_CHANGE = 20
+
+# Unused shared indexes older than this are deleted
+SHARED_INDEX_EXPIRY = 14 * 24 * 60 * 60
+
+
+def encode_varint(value: int) -> bytes:
+    """
+    Encode a number in Git's offset varint format (as used by index v4).
+    
+    Args:
+        value: The number to encode
+    
+    Returns:
+        The encoded number, most significant group first
+    """
+    encoded = [value & 0x7F]
+    value >>= 7
+    
+    while value:
+        value -= 1
+        encoded.append(0x80 | (value & 0x7F))
+        value >>= 7
+    
+    return bytes(reversed(encoded))
+
+
+def decode_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """
+    Decode a number in Git's offset varint format.
+    
+    Args:
+        data: The buffer containing the number
+        offset: The offset of the number
+    
+    Returns:
+        A tuple of (number, offset after it)
+    """
+    byte = data[offset]
+    value = byte & 0x7F
+    offset += 1
+    
+    while byte & 0x80:
+        byte = data[offset]
+        value = ((value + 1) << 7) | (byte & 0x7F)
+        offset += 1
+    
+    return value, offset
+
+
+def mode_from_stat(file_stat: os.stat_result) -> int:
+    """
+    Get the index mode for a file.
+    
+    Args:
+        file_stat: The result of stat() on the file
+    
+    Returns:
+        0o100755 for executable files, 0o100644 otherwise
+    """
+    if file_stat.st_mode & stat.S_IXUSR:
+        return 0o100755  # Executable file
+    return 0o100644  # Regular file
 
 
 class IndexEntry:
@@ -31,6 +159,9 @@ class IndexEntry:
         object_id: The object ID (SHA-1 hash)
         flags: The entry flags
         path: The file path
+        fsmonitor_valid: Whether the file is known to be unchanged since
+                         the file system monitor token (not stored in the
+                         entry; see the FSMN extension)
     """
     
     def __init__(self):
@@ -48,9 +179,16 @@ class IndexEntry:
         self.object_id = None
         self.flags = 0
         self.path = None
+        self.fsmonitor_valid = False
+    
+    @property
+    def mtime_ns(self) -> int:
+        """Get the modification time in nanoseconds."""
+        return self.mtime * 1_000_000_000 + self.mtime_nsec
     
     @classmethod
-    def from_file(cls, repo, path: Path, object_id: Optional[str] = None) -> 'IndexEntry':
+    def from_file(cls, repo, path: Path, object_id: Optional[str] = None,
+                  file_stat: Optional[os.stat_result] = None) -> 'IndexEntry':
         """
         Create an index entry from a file.
         
@@ -58,6 +196,8 @@ class IndexEntry:
             repo: The repository
             path: The path to the file (relative to the repository root)
             object_id: The object ID (if None, a new blob will be created)
+            file_stat: The result of stat() on the file (if None, the
+                       file is stat'ed)
         
         Returns:
             A new IndexEntry instance
@@ -68,24 +208,11 @@ class IndexEntry:
         abs_path = repo.path / path
         
         # Get file stats
-        stat = abs_path.stat()
+        if file_stat is None:
+            file_stat = abs_path.stat()
         
         # Set the file metadata
-        entry.ctime = int(stat.st_ctime)
-        entry.ctime_nsec = int((stat.st_ctime - entry.ctime) * 1_000_000_000)
-        entry.mtime = int(stat.st_mtime)
-        entry.mtime_nsec = int((stat.st_mtime - entry.mtime) * 1_000_000_000)
-        entry.dev = stat.st_dev
-        entry.ino = stat.st_ino
-        entry.uid = stat.st_uid
-        entry.gid = stat.st_gid
-        entry.size = stat.st_size
-        
-        # Set the file mode
-        if is_executable(abs_path):
-            entry.mode = 0o100755  # Executable file
-        else:
-            entry.mode = 0o100644  # Regular file
+        entry.update_stat(file_stat)
         
         # Set the object ID
         if object_id is None:
@@ -97,11 +224,63 @@ class IndexEntry:
         # Set the path
         entry.path = str(path)
         
-        # Set the flags (assume path length is less than 0xFFF)
-        entry.flags = min(0xFFF, len(entry.path))
+        # Set the flags (the path length, saturated at 0xFFF)
+        entry.flags = min(NAME_MASK, len(entry.path.encode()))
         
         return entry
     
+    def update_stat(self, file_stat: os.stat_result) -> None:
+        """
+        Record a file's stat data in the entry.
+        
+        Times are taken from the integer nanosecond fields, so no
+        precision is lost, and every field is truncated to the 32 bits
+        the index stores.
+        
+        Args:
+            file_stat: The result of stat() on the file
+        """
+        ctime, self.ctime_nsec = divmod(file_stat.st_ctime_ns, 1_000_000_000)
+        mtime, self.mtime_nsec = divmod(file_stat.st_mtime_ns, 1_000_000_000)
+        self.ctime = ctime & STAT_MASK
+        self.mtime = mtime & STAT_MASK
+        self.dev = file_stat.st_dev & STAT_MASK
+        self.ino = file_stat.st_ino & STAT_MASK
+        self.mode = mode_from_stat(file_stat)
+        self.uid = file_stat.st_uid & STAT_MASK
+        self.gid = file_stat.st_gid & STAT_MASK
+        self.size = file_stat.st_size & STAT_MASK
+    
+    def matches_stat(self, file_stat: os.stat_result) -> bool:
+        """
+        Check whether a file's stat data matches the entry.
+        
+        Compares the modification and change times, size, inode, device
+        and mode. A match means the file is unchanged unless the entry
+        is racily clean (see Index.is_racy).
+        
+        Args:
+            file_stat: The result of stat() on the file
+        
+        Returns:
+            True if the stat data matches, False otherwise
+        """
+        ctime, ctime_nsec = divmod(file_stat.st_ctime_ns, 1_000_000_000)
+        mtime, mtime_nsec = divmod(file_stat.st_mtime_ns, 1_000_000_000)
+        
+        # A smudged entry (see Index.write) only matches the empty blob
+        if self.size == 0 and self.object_id != EMPTY_BLOB_ID:
+            return False
+        
+        return (
+            self.mtime == mtime & STAT_MASK and self.mtime_nsec == mtime_nsec and
+            self.ctime == ctime & STAT_MASK and self.ctime_nsec == ctime_nsec and
+            self.size == file_stat.st_size & STAT_MASK and
+            self.ino == file_stat.st_ino & STAT_MASK and
+            self.dev == file_stat.st_dev & STAT_MASK and
+            self.mode == mode_from_stat(file_stat)
+        )
+    
     def serialize(self) -> bytes:
         """
         Serialize the index entry to bytes.
@@ -110,8 +289,8 @@ class IndexEntry:
             The serialized index entry
         """
         # The entry format follows Git's index v2 format
-        data = struct.pack(
-            ">LLLLLLLLLL20sH",
+        path_bytes = self.path.encode()
+        data = ENTRY_HEADER.pack(
             self.ctime, self.ctime_nsec,
             self.mtime, self.mtime_nsec,
             self.dev, self.ino,
@@ -120,14 +299,52 @@ class IndexEntry:
             self.flags
         )
         
-        # Add the path and padding
-        path_bytes = self.path.encode()
-        padding_length = 8 - ((len(data) + len(path_bytes)) % 8)
-        if padding_length == 8:
-            padding_length = 0
+        # The path is followed by 1-8 NUL bytes so the entry length is a multiple of 8
+        padding_length = 8 - (ENTRY_HEADER.size + len(path_bytes)) % 8
         
         return data + path_bytes + b'\x00' * padding_length
     
+    @classmethod
+    def parse(cls, data: bytes, offset: int) -> Tuple['IndexEntry', int]:
+        """
+        Parse an index entry at an offset of a buffer.
+        
+        Nothing is copied except the path, so parsing a whole index
+        takes time proportional to its size.
+        
+        Args:
+            data: The buffer containing the entry
+            offset: The offset of the entry
+        
+        Returns:
+            A tuple of (IndexEntry, offset of the next entry)
+        """
+        entry = cls()
+        
+        # Parse the fixed-length part
+        (
+            entry.ctime, entry.ctime_nsec,
+            entry.mtime, entry.mtime_nsec,
+            entry.dev, entry.ino,
+            entry.mode, entry.uid, entry.gid,
+            entry.size, object_id, entry.flags
+        ) = ENTRY_HEADER.unpack_from(data, offset)
+        
+        entry.object_id = object_id.hex()
+        
+        # The flags hold the path length unless the path is too long
+        path_start = offset + ENTRY_HEADER.size
+        path_length = entry.flags & NAME_MASK
+        if path_length == NAME_MASK:
+            path_end = data.index(b'\x00', path_start)
+        else:
+            path_end = path_start + path_length
+        entry.path = data[path_start:path_end].decode()
+        
+        # Skip the 1-8 NUL bytes of padding
+        entry_length = path_end - offset
+        return entry, offset + entry_length + 8 - entry_length % 8
+    
     @classmethod
     def deserialize(cls, data: bytes) -> Tuple['IndexEntry', bytes]:
         """
@@ -139,31 +356,81 @@ class IndexEntry:
         Returns:
             A tuple of (IndexEntry, remaining_data)
         """
+        entry, offset = cls.parse(data, 0)
+        return entry, data[offset:]
+    
+    def serialize_v4(self, previous_path: bytes) -> bytes:
+        """
+        Serialize the index entry in index v4 format.
+        
+        The path is stored as the number of bytes to drop from the end
+        of the previous entry's path, followed by the NUL-terminated
+        suffix to append; the entry is not padded.
+        
+        Args:
+            previous_path: The encoded path of the previous entry (b"" for
+                           the first entry)
+        
+        Returns:
+            The serialized index entry
+        """
+        path_bytes = self.path.encode()
+        
+        # Length of the prefix shared with the previous path
+        common = 0
+        limit = min(len(path_bytes), len(previous_path))
+        while common < limit and path_bytes[common] == previous_path[common]:
+            common += 1
+        
+        return ENTRY_HEADER.pack(
+            self.ctime, self.ctime_nsec,
+            self.mtime, self.mtime_nsec,
+            self.dev, self.ino,
+            self.mode, self.uid, self.gid,
+            self.size, bytes.fromhex(self.object_id),
+            self.flags
+        ) + encode_varint(len(previous_path) - common) + path_bytes[common:] + b'\x00'
+    
+    @classmethod
+    def parse_v4(cls, data: bytes, offset: int,
+                 previous_path: Optional[bytes]) -> Tuple['IndexEntry', int, bytes]:
+        """
+        Parse an index v4 entry at an offset of a buffer.
+        
+        Args:
+            data: The buffer containing the entry
+            offset: The offset of the entry
+            previous_path: The encoded path of the previous entry, or None
+                           at the start of a block, where the whole path
+                           is stored
+        
+        Returns:
+            A tuple of (IndexEntry, offset of the next entry, encoded path)
+        """
         entry = cls()
         
-        # Parse the fixed-length part
         (
             entry.ctime, entry.ctime_nsec,
             entry.mtime, entry.mtime_nsec,
             entry.dev, entry.ino,
             entry.mode, entry.uid, entry.gid,
             entry.size, object_id, entry.flags
-        ) = struct.unpack(">LLLLLLLLLL20sH", data[:62])
+        ) = ENTRY_HEADER.unpack_from(data, offset)
         
         entry.object_id = object_id.hex()
         
-        # Find the end of the path (null byte)
-        path_end = data.find(b'\x00', 62)
-        entry.path = data[62:path_end].decode()
+        strip, suffix_start = decode_varint(data, offset + ENTRY_HEADER.size)
+        suffix_end = data.index(b'\x00', suffix_start)
         
-        # Calculate padding
-        entry_length = path_end + 1
-        padding_length = 8 - (entry_length % 8)
-        if padding_length == 8:
-            padding_length = 0
+        if previous_path is None:
+            path = data[suffix_start:suffix_end]
+        elif strip > len(previous_path):
+            raise ValueError("Invalid index v4 path compression")
+        else:
+            path = previous_path[:len(previous_path) - strip] + data[suffix_start:suffix_end]
+        entry.path = path.decode()
         
-        # Return the entry and remaining data
-        return entry, data[entry_length + padding_length:]
+        return entry, suffix_end + 1, path
 
 
 class Index:
@@ -176,10 +443,20 @@ class Index:
     Attributes:
         repo: The repository this index belongs to
         entries: A dictionary of index entries, keyed by path
+        timestamp_ns: The modification time of the index file when it
+                      was last read or written, or None
+        cache_tree: The cached tree IDs of the directories (TREE extension)
+        untracked_cache: The cached untracked files of the working tree
+                         directories (UNTR extension)
+        dirty: Whether the entries changed since the index was last read
+               or written
+        fsmonitor_token: The token of the file system monitor's last
+                         answer (FSMN extension), or None
     """
     
     SIGNATURE = b"DIRC"
     VERSION = 2
+    SUPPORTED_VERSIONS = (2, 4)
     
     def __init__(self, repo):
         """
@@ -190,30 +467,408 @@ class Index:
         """
         self.repo = repo
         self.entries = OrderedDict()
+        self.timestamp_ns = None
+        self.cache_tree = CacheTree()
+        self.untracked_cache = UntrackedCache()
+        self.dirty = False
+        self.fsmonitor_token = None
+        
+        # Whether the monitor was asked about the changes since the token,
+        # and whether its answer can replace stat() calls (see refresh_fsmonitor)
+        self._fsmonitor_ran = False
+        self._fsmonitor_trusted = False
+        
+        # The shared index a split index is based on (see _split_entries)
+        self._shared_id = None
+        self._shared_entries = None
         
         # Load the index if it exists
         if self.repo.index_file.exists():
             self.read()
     
-    def add(self, paths: List[Union[str, Path]]) -> None:
+    def add(self, paths: List[Union[str, Path]], workers: Optional[int] = None) -> None:
         """
         Add files to the index.
         
+        Files whose stat data still matches their index entry are
+        skipped without being read, unless the entry is racily clean.
+        
+        The remaining files go through a bounded pipeline: the calling
+        thread enumerates them, a pool of workers reads, hashes,
+        compresses and stores each one (hashlib, zlib and file I/O
+        release the GIL), and the calling thread collects the entries in
+        enumeration order, so the resulting index doesn't depend on the
+        number of workers.
+        
         Args:
             paths: A list of file paths to add (relative to the repository root)
+            workers: The number of workers (default: add.workers from the
+                     config, or one per CPU)
+        """
+        if workers is None:
+            workers = self.get_add_workers()
+        
+        self.refresh_fsmonitor()
+        changed = (
+            (path, file_stat) for path, file_stat in self._enumerate_files(paths, workers)
+            if not self._is_unchanged(path, file_stat)
+        )
+        
+        if workers <= 1:
+            for path, file_stat in changed:
+                self._set_entry(IndexEntry.from_file(self.repo, Path(path), file_stat=file_stat))
+            return
+        
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, file_stat in changed:
+                pending.append(pool.submit(IndexEntry.from_file, self.repo, Path(path), None, file_stat))
+                
+                # Bound the work in flight
+                if len(pending) >= workers * ADD_QUEUE_FACTOR:
+                    self._set_entry(pending.popleft().result())
+            
+            while pending:
+                self._set_entry(pending.popleft().result())
+    
+    def get_add_workers(self) -> int:
+        """
+        Get the number of workers used to add files.
+        
+        Returns:
+            add.workers from the config, or the number of CPUs
+        """
+        workers = self.repo.config.get_int("add", "workers", 0)
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        return workers
+    
+    def _enumerate_files(self, paths: List[Union[str, Path]],
+                         workers: int = 1) -> Iterator[Tuple[str, os.stat_result]]:
         """
+        List the files to add, expanding directories.
+        
+        Untracked files matched by the ignore rules are skipped when
+        expanding a directory, and ignored subdirectories are not entered.
+        Files named explicitly are always listed.
+        
+        Args:
+            paths: The file and directory paths (relative to the repository root)
+            workers: The number of threads reading directories
+        
+        Yields:
+            Tuples of (path relative to the repository root, stat result)
+        """
+        ignore = None
+        
         for path in paths:
             path = Path(path)
+            abs_path = self.repo.path / path
             
             # If the path is a directory, add all files in it recursively
-            if (self.repo.path / path).is_dir():
-                all_files = [p.relative_to(self.repo.path) for p in (self.repo.path / path).glob("**/*") if p.is_file()]
-                self.add(all_files)
+            if abs_path.is_dir():
+                if ignore is None:
+                    ignore = self.repo.get_ignore_matcher()
+                
+                directory = path.as_posix()
+                yield from scan_tree(
+                    self.repo.path, "" if directory == "." else directory,
+                    ignore=ignore, tracked=self.entries, workers=workers
+                )
                 continue
             
-            # Create an index entry for the file
-            entry = IndexEntry.from_file(self.repo, path)
-            self.entries[entry.path] = entry
+            yield str(path), abs_path.stat()
+    
+    def _is_unchanged(self, path: str, file_stat: os.stat_result) -> bool:
+        """Check whether a file's existing entry is known to be up to date."""
+        entry = self.entries.get(path)
+        return entry is not None and (entry.fsmonitor_valid or self.is_up_to_date(entry, file_stat))
+    
+    def _set_entry(self, entry: IndexEntry) -> None:
+        """
+        Add or replace an entry, invalidating the caches it affects.
+        
+        Args:
+            entry: The new entry
+        """
+        old_entry = self.entries.get(entry.path)
+        self.entries[entry.path] = entry
+        self.dirty = True
+        
+        # The file was just read, so any later change is reported by the
+        # monitor's next answer
+        entry.fsmonitor_valid = self.fsmonitor_token is not None
+        
+        if (old_entry is None or old_entry.object_id != entry.object_id or
+                old_entry.mode != entry.mode):
+            self.cache_tree.invalidate(entry.path)
+        if old_entry is None:
+            self.untracked_cache.invalidate(entry.path)
+    
+    def is_racy(self, entry: IndexEntry) -> bool:
+        """
+        Check whether an entry is racily clean.
+        
+        A file modified in the same timestamp tick as the index was
+        written can still have stat data matching its entry, so entries
+        that are not older than the index file can't be trusted to be
+        clean from their stat data alone.
+        
+        Args:
+            entry: The index entry
+        
+        Returns:
+            True if the entry's content must be checked, False otherwise
+        """
+        return self.timestamp_ns is not None and entry.mtime_ns >= self.timestamp_ns
+    
+    def is_up_to_date(self, entry: IndexEntry, file_stat: os.stat_result) -> bool:
+        """
+        Check from stat data alone whether a file matches its entry.
+        
+        Args:
+            entry: The index entry
+            file_stat: The result of stat() on the file
+        
+        Returns:
+            True if the file is known to be unchanged, False if its
+            content has to be hashed to tell
+        """
+        return entry.matches_stat(file_stat) and not self.is_racy(entry)
+    
+    def diff_files(self) -> List[Tuple[str, str]]:
+        """
+        Compare the index with the working tree without updating it.
+        
+        Returns:
+            A list of (status, path) tuples sorted by path, where status is
+            "M" (content or mode differs) or "D" (missing from the working tree)
+        """
+        return list(self._check_files(update=False))
+    
+    def refresh(self, workers: Optional[int] = None) -> List[Tuple[str, str]]:
+        """
+        Compare the index with the working tree, refreshing stale stat data.
+        
+        Every entry is stat()ed, in parallel chunks, except those the file
+        system monitor vouches for; only the entries whose stat data
+        doesn't prove them unchanged are hashed, also in parallel. Entries
+        whose content turns out to be unchanged get the file's current stat
+        data, so the next comparison doesn't hash them again once the index
+        is written.
+        
+        Args:
+            workers: The number of threads (default: one per CPU, or 1 if
+                     core.preloadIndex is false)
+        
+        Returns:
+            A list of (status, path) tuples sorted by path, where status is
+            "M" (content or mode differs) or "D" (missing from the working tree)
+        """
+        return list(self.iter_refresh(workers))
+    
+    def iter_refresh(self, workers: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Refresh the index like refresh(), yielding changes as they are found.
+        
+        Entries are checked in batches in path order, so the first changes
+        are available after the first batch rather than after the whole
+        index has been checked.
+        
+        Args:
+            workers: The number of threads (default: one per CPU, or 1 if
+                     core.preloadIndex is false)
+        
+        Yields:
+            (status, path) tuples in path order, as returned by refresh()
+        """
+        return self._check_files(update=True, workers=workers)
+    
+    def get_refresh_workers(self) -> int:
+        """
+        Get the number of threads used to compare the index with the working tree.
+        
+        Returns:
+            The number of CPUs, or 1 if core.preloadIndex is false
+        """
+        if not self.repo.config.get_bool("core", "preloadindex", True):
+            return 1
+        return os.cpu_count() or 1
+    
+    def refresh_fsmonitor(self) -> None:
+        """
+        Ask the file system monitor which paths changed since the token.
+        
+        Entries whose paths were reported lose their fsmonitor_valid flag,
+        as do the untracked cache listings of the directories involved;
+        everything else is then known to be unchanged without a stat().
+        If the monitor fails, has no token to compare with or says every
+        path may have changed, every entry is checked. The monitor is
+        asked once per read of the index.
+        
+        Does nothing unless core.fsmonitor is set.
+        """
+        if self._fsmonitor_ran:
+            return
+        self._fsmonitor_ran = True
+        self._fsmonitor_trusted = False
+        
+        if fsmonitor.get_monitor(self.repo) is None:
+            if self.fsmonitor_token is not None:
+                self.fsmonitor_token = None
+                self.dirty = True
+            return
+        
+        result = fsmonitor.query(self.repo, self.fsmonitor_token)
+        if result is None or result.paths is None or self.fsmonitor_token is None:
+            # fsmonitor_valid isn't part of the entry data, so entries
+            # shared with a split index's base can be modified in place
+            for entry in self.entries.values():
+                entry.fsmonitor_valid = False
+        else:
+            self._invalidate_fsmonitor_paths(result.paths)
+            self.untracked_cache.invalidate_changed(result.paths)
+            self._fsmonitor_trusted = True
+        
+        token = result.token if result is not None else None
+        if token != self.fsmonitor_token:
+            self.fsmonitor_token = token
+            self.dirty = True
+    
+    def _invalidate_fsmonitor_paths(self, paths: List[str]) -> None:
+        """
+        Clear the fsmonitor_valid flag of the entries at or below some paths.
+        
+        Args:
+            paths: The changed paths; those ending with "/", or that aren't
+                   entries, are treated as directories
+        """
+        prefixes = []
+        for path in paths:
+            entry = self.entries.get(path)
+            if entry is not None:
+                entry.fsmonitor_valid = False
+            else:
+                prefixes.append(path.rstrip("/") + "/")
+        
+        if prefixes:
+            sorted_paths = sorted(self.entries)
+            for prefix in prefixes:
+                start = bisect.bisect_left(sorted_paths, prefix)
+                for path in sorted_paths[start:]:
+                    if not path.startswith(prefix):
+                        break
+                    self.entries[path].fsmonitor_valid = False
+    
+    def _check_files(self, update: bool, workers: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Compare the index with the working tree, in batches of paths.
+        
+        Args:
+            update: Whether to refresh the stat data of unchanged entries
+            workers: The number of threads (default: get_refresh_workers())
+        
+        Yields:
+            (status, path) tuples in path order
+        """
+        if workers is None:
+            workers = self.get_refresh_workers()
+        
+        self.refresh_fsmonitor()
+        paths = sorted(path for path, entry in self.entries.items() if not entry.fsmonitor_valid)
+        track_valid = self.fsmonitor_token is not None
+        batch_size = REFRESH_BATCH_SIZE * max(workers, 1)
+        
+        for start in range(0, len(paths), batch_size):
+            batch = paths[start:start + batch_size]
+            changes = []
+            suspicious = []
+            
+            # Stat phase: most entries are settled by their stat data alone
+            for path, file_stat in zip(batch, self._stat_files(batch, workers)):
+                entry = self.entries[path]
+                if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
+                    changes.append(("D", path))
+                elif not self.is_up_to_date(entry, file_stat):
+                    suspicious.append((entry, file_stat))
+                elif track_valid:
+                    entry.fsmonitor_valid = True
+            
+            # Verify phase: hash the files whose stat data changed
+            if workers > 1 and len(suspicious) > 1:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    unchanged = list(pool.map(lambda item: self._matches_content(*item), suspicious))
+            else:
+                unchanged = [self._matches_content(entry, file_stat) for entry, file_stat in suspicious]
+            
+            for (entry, file_stat), same in zip(suspicious, unchanged):
+                if not same:
+                    changes.append(("M", entry.path))
+                elif update and not entry.matches_stat(file_stat):
+                    # Entries may be shared with a split index's base, so
+                    # replace rather than modify them
+                    refreshed = copy.copy(entry)
+                    refreshed.update_stat(file_stat)
+                    refreshed.fsmonitor_valid = track_valid
+                    self.entries[entry.path] = refreshed
+                    self.dirty = True
+            
+            changes.sort(key=lambda change: change[1])
+            yield from changes
+    
+    def _stat_files(self, paths: List[str], workers: int) -> List[Optional[os.stat_result]]:
+        """
+        Stat working tree files, in parallel chunks for large indexes.
+        
+        Args:
+            paths: The paths, relative to the repository root
+            workers: The number of threads
+        
+        Returns:
+            The stat results in the order of the paths (None for missing files)
+        """
+        root = str(self.repo.path)
+        
+        def stat_chunk(chunk: List[str]) -> List[Optional[os.stat_result]]:
+            result = []
+            for path in chunk:
+                try:
+                    result.append(os.stat(os.path.join(root, path)))
+                except OSError:
+                    result.append(None)
+            return result
+        
+        # Each thread gets at least REFRESH_CHUNK_SIZE paths, or the
+        # thread overhead outweighs the stat() calls
+        chunk_size = max(REFRESH_CHUNK_SIZE, -(-len(paths) // workers))
+        if workers <= 1 or len(paths) <= chunk_size:
+            return stat_chunk(paths)
+        
+        chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return [file_stat for result in pool.map(stat_chunk, chunks) for file_stat in result]
+    
+    def _matches_content(self, entry: IndexEntry, file_stat: os.stat_result) -> bool:
+        """
+        Check by hashing whether a file has its entry's content and mode.
+        
+        Args:
+            entry: The index entry
+            file_stat: The result of stat() on the file
+        
+        Returns:
+            True if the file is unchanged, False otherwise
+        """
+        if mode_from_stat(file_stat) != entry.mode:
+            return False
+        
+        try:
+            with open(self.repo.path / entry.path, "rb") as f:
+                object_id = self.repo.object_store.hash_stream("blob", file_stat.st_size, f)
+        except (OSError, ValueError):
+            # Unreadable, or changed while being read
+            return False
+        return object_id == entry.object_id
     
     def remove(self, paths: List[Union[str, Path]]) -> None:
         """
@@ -226,80 +881,803 @@ class Index:
             path = str(path)
             if path in self.entries:
                 del self.entries[path]
+                self.dirty = True
+                self.cache_tree.invalidate(path)
+                self.untracked_cache.invalidate(path)
+    
+    def clear(self) -> None:
+        """Remove every entry from the index."""
+        self.entries.clear()
+        self.dirty = True
+        self.cache_tree = CacheTree()
+        self.untracked_cache.clear()
+    
+    def list_untracked(self) -> List[str]:
+        """
+        Find the untracked files in the working tree.
+        
+        Ignored files are left out, and ignored directories are not read.
+        Only directories that changed since they were last listed are
+        read; call write() afterwards to keep the updated listings.
+        
+        Returns:
+            The paths of the untracked files, sorted
+        """
+        self.refresh_fsmonitor()
+        return self.untracked_cache.list_untracked(
+            self.repo.path, self.entries, self.repo.get_ignore_matcher(),
+            trusted=self._fsmonitor_trusted
+        )
     
     def write(self) -> None:
-        """Write the index to disk."""
-        # Format: signature (4 bytes) + version (4 bytes) + entry count (4 bytes) + entries + checksum (20 bytes)
+        """
+        Write the index to disk.
+        
+        Entries are written in path order. The serialized data is hashed
+        and written in WRITE_BUFFER_SIZE batches to a lock file that
+        replaces the index once complete, so the whole index is never
+        built as one bytes object and readers never see a partial file.
+        
+        Entries that are racily clean with respect to the new index file
+        and whose content actually changed are smudged (their size is
+        set to 0) so later stat comparisons can't mistake them for clean.
+        
+        With core.splitIndex enabled, only the entries that differ from
+        a shared index are written (see _split_entries).
+        """
+        lock_path = self.repo.index_file.with_name(self.repo.index_file.name + ".lock")
+        
+        try:
+            with open(lock_path, 'wb') as f:
+                self._smudge_racy_entries(os.fstat(f.fileno()).st_mtime_ns)
+                
+                extensions = []
+                if self.repo.config.get_bool("core", "splitindex"):
+                    entries, link_data = self._split_entries()
+                    extensions.append((LINK_SIGNATURE, link_data))
+                else:
+                    entries = [self.entries[path] for path in sorted(self.entries)]
+                    self._shared_id = None
+                    self._shared_entries = None
+                
+                extensions.append((cache_tree.SIGNATURE, self.cache_tree.serialize()))
+                if self.untracked_cache.dirs:
+                    extensions.append((untracked_cache.SIGNATURE, self.untracked_cache.serialize()))
+                if self.fsmonitor_token is not None and fsmonitor.get_monitor(self.repo) is not None:
+                    extensions.append((fsmonitor.SIGNATURE, self._serialize_fsmonitor()))
+                
+                self._write_index_file(f, entries, extensions)
+            
+            os.replace(lock_path, self.repo.index_file)
+            self.timestamp_ns = os.stat(self.repo.index_file).st_mtime_ns
+            self.untracked_cache.dirty = False
+            self.dirty = False
+        except BaseException:
+            if lock_path.exists():
+                lock_path.unlink()
+            raise
+    
+    def get_version(self) -> int:
+        """
+        Get the index format version to write.
+        
+        Version 4 compresses each path against the previous one and is
+        selected per repository with index.version in .gitelle/config.
+        
+        Returns:
+            The index format version
+        
+        Raises:
+            ValueError: If the configured version is not supported
+        """
+        version = self.repo.config.get_int("index", "version", self.VERSION)
+        if version not in self.SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported index version: {version}")
+        return version
+    
+    def _write_index_file(self, f: BinaryIO, entries: List[IndexEntry],
+                          extensions: List[Tuple[bytes, bytes]]) -> bytes:
+        """
+        Write an index file.
+        
+        Args:
+            f: The file to write to
+            entries: The entries, in path order
+            extensions: The extensions as (signature, data) tuples
         
-        # Build the header
-        header = struct.pack(">4sLL", self.SIGNATURE, self.VERSION, len(self.entries))
+        Returns:
+            The checksum of the file
+        """
+        # Format: signature (4 bytes) + version (4 bytes) + entry count (4 bytes) + entries + extensions + checksum (20 bytes)
+        version = self.get_version()
+        sha = hashlib.sha1()
+        buffer = bytearray(INDEX_HEADER.pack(self.SIGNATURE, version, len(entries)))
+        written = 0
+        blocks = []
+        previous_path = b""
+        
+        for position, entry in enumerate(entries):
+            # Record where each block starts; the first v4 entry of a
+            # block shares no prefix with the previous path (which is
+            # stripped entirely) so blocks can be decoded independently
+            if position % IEOT_BLOCK_SIZE == 0:
+                blocks.append((written + len(buffer), min(IEOT_BLOCK_SIZE, len(entries) - position)))
+                previous_path = b"\x00" + previous_path[1:]
+            
+            if version == 4:
+                buffer += entry.serialize_v4(previous_path)
+                previous_path = entry.path.encode()
+            else:
+                buffer += entry.serialize()
+            
+            if len(buffer) >= WRITE_BUFFER_SIZE:
+                sha.update(buffer)
+                f.write(buffer)
+                written += len(buffer)
+                buffer.clear()
+        
+        # Only indexes with several blocks benefit from an offset table
+        with_offsets = len(blocks) > 1
+        if with_offsets:
+            ieot_data = struct.pack(">L", IEOT_VERSION) + b"".join(
+                IEOT_BLOCK.pack(offset, count) for offset, count in blocks
+            )
+            extensions = [(IEOT_SIGNATURE, ieot_data)] + extensions
         
-        # Build the entries
-        entries_data = b''
-        for entry in self.entries.values():
-            entries_data += entry.serialize()
+        extensions_offset = written + len(buffer)
+        header_sha = hashlib.sha1()
         
-        # Calculate the checksum
-        data = header + entries_data
-        checksum = hashlib.sha1(data).digest()
+        for signature, data in extensions:
+            header = EXTENSION_HEADER.pack(signature, len(data))
+            header_sha.update(header)
+            buffer += header
+            buffer += data
         
-        # Write to disk
-        with open(self.repo.index_file, 'wb') as f:
-            f.write(data + checksum)
+        # The end-of-index-entries extension comes last so readers can
+        # find the other extensions without parsing the entries
+        if with_offsets:
+            buffer += EXTENSION_HEADER.pack(EOIE_SIGNATURE, EOIE_DATA.size)
+            buffer += EOIE_DATA.pack(extensions_offset, header_sha.digest())
+        
+        sha.update(buffer)
+        f.write(buffer)
+        f.write(sha.digest())
+        return sha.digest()
+    
+    def _split_entries(self) -> Tuple[List[IndexEntry], bytes]:
+        """
+        Split the entries into a shared index and a delta.
+        
+        Entries that are the same objects as the ones read from the
+        shared index are left out of the delta; the link extension
+        records the shared index checksum and the paths deleted from it.
+        When the delta grows past splitIndex.maxPercentChange percent of
+        the shared index, a new shared index holding every entry is
+        written and the delta becomes empty.
+        
+        Returns:
+            A tuple of (delta entries in path order, link extension data)
+        """
+        max_percent = self.repo.config.get_int(
+            "splitindex", "maxpercentchange", DEFAULT_MAX_PERCENT_CHANGE
+        )
+        
+        shared = self._shared_entries
+        if shared is not None:
+            entries = self.entries
+            changed = [path for path, entry in entries.items() if shared.get(path) is not entry]
+            deleted = [path for path in shared if path not in entries]
+            
+            if (len(changed) + len(deleted)) * 100 <= max_percent * len(shared):
+                link_data = bytes.fromhex(self._shared_id) + b"".join(
+                    path.encode() + b"\x00" for path in sorted(deleted)
+                )
+                return [entries[path] for path in sorted(changed)], link_data
+        
+        self._write_shared_index()
+        return [], bytes.fromhex(self._shared_id)
+    
+    def _write_shared_index(self) -> None:
+        """Write every entry to a new shared index and expire old ones."""
+        gitelle_dir = self.repo.gitelle_dir
+        fd, tmp_path = tempfile.mkstemp(prefix=SHARED_INDEX_PREFIX, suffix=".lock", dir=gitelle_dir)
+        
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                checksum = self._write_index_file(
+                    f, [self.entries[path] for path in sorted(self.entries)], []
+                )
+            
+            shared_id = checksum.hex()
+            os.replace(tmp_path, gitelle_dir / (SHARED_INDEX_PREFIX + shared_id))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        
+        self._shared_id = shared_id
+        self._shared_entries = dict(self.entries)
+        
+        # Other processes may still be reading recently replaced shared
+        # indexes, so only old ones are removed
+        expiry = time.time() - SHARED_INDEX_EXPIRY
+        for path in gitelle_dir.glob(SHARED_INDEX_PREFIX + "*"):
+            if path.name != SHARED_INDEX_PREFIX + shared_id and path.stat().st_mtime < expiry:
+                path.unlink()
+    
+    def _smudge_racy_entries(self, timestamp_ns: int) -> None:
+        """
+        Smudge entries that would look clean but whose content changed.
+        
+        Smudged entries are replaced by modified copies, since the
+        originals may be shared with the split index base.
+        
+        Args:
+            timestamp_ns: The modification time of the index being written
+        """
+        smudged = []
+        
+        for path, entry in self.entries.items():
+            if entry.mtime_ns < timestamp_ns or entry.size == 0:
+                continue
+            
+            abs_path = self.repo.path / path
+            try:
+                file_stat = abs_path.stat()
+            except OSError:
+                continue
+            
+            if entry.matches_stat(file_stat) and Blob.from_file(self.repo, abs_path).id != entry.object_id:
+                entry = copy.copy(entry)
+                entry.size = 0
+                entry.fsmonitor_valid = False
+                smudged.append(entry)
+        
+        for entry in smudged:
+            self.entries[entry.path] = entry
     
     def read(self) -> None:
-        """Read the index from disk."""
+        """
+        Read the index from disk.
+        
+        Raises:
+            ValueError: If the index is corrupt or uses an unsupported format
+        """
         with open(self.repo.index_file, 'rb') as f:
-            data = f.read()
+            timestamp_ns = os.fstat(f.fileno()).st_mtime_ns
+            entries, extensions, _ = self._read_index_file(f)
         
-        # Verify the checksum
-        content = data[:-20]
-        expected_checksum = data[-20:]
-        actual_checksum = hashlib.sha1(content).digest()
+        self.entries.clear()
+        self.cache_tree = CacheTree()
+        self.untracked_cache = UntrackedCache()
+        self.fsmonitor_token = None
+        self._fsmonitor_ran = False
+        self._fsmonitor_trusted = False
+        self._shared_id = None
+        self._shared_entries = None
+        fsmonitor_data = None
         
-        if expected_checksum != actual_checksum:
-            raise ValueError("Index checksum mismatch")
+        for signature, data in extensions:
+            if signature == LINK_SIGNATURE:
+                self._read_shared_index(data)
+            elif signature == cache_tree.SIGNATURE:
+                self.cache_tree = CacheTree.deserialize(data)
+            elif signature == untracked_cache.SIGNATURE:
+                self.untracked_cache = UntrackedCache.deserialize(data)
+            elif signature == fsmonitor.SIGNATURE:
+                fsmonitor_data = data
+        
+        for entry in entries:
+            self.entries[entry.path] = entry
+        
+        if fsmonitor_data is not None:
+            self._read_fsmonitor(fsmonitor_data)
+        
+        self.timestamp_ns = timestamp_ns
+        self.dirty = False
+    
+    def _serialize_fsmonitor(self) -> bytes:
+        """
+        Serialize the FSMN extension: the token and the entries, by
+        position, that aren't known to be unchanged.
+        
+        Returns:
+            The extension data
+        """
+        paths = sorted(self.entries)
+        dirty = {i for i, path in enumerate(paths) if not self.entries[path].fsmonitor_valid}
+        return fsmonitor.serialize_extension(self.fsmonitor_token, dirty, len(paths))
+    
+    def _read_fsmonitor(self, data: bytes) -> None:
+        """
+        Restore the token and the fsmonitor_valid flags from the FSMN extension.
+        
+        An extension that doesn't match the entries is dropped, so every
+        entry gets checked.
+        
+        Args:
+            data: The extension data
+        """
+        token, dirty, count = fsmonitor.parse_extension(data)
+        if count != len(self.entries):
+            return
+        
+        self.fsmonitor_token = token
+        for i, path in enumerate(sorted(self.entries)):
+            self.entries[path].fsmonitor_valid = i not in dirty
+    
+    def _read_shared_index(self, link_data: bytes) -> None:
+        """
+        Load the shared index a split index refers to.
+        
+        Args:
+            link_data: The link extension data
+        
+        Raises:
+            ValueError: If the shared index is missing or doesn't match
+        """
+        shared_id = link_data[:20].hex()
+        shared_path = self.repo.gitelle_dir / (SHARED_INDEX_PREFIX + shared_id)
+        
+        try:
+            with open(shared_path, 'rb') as f:
+                entries, _, checksum = self._read_index_file(f)
+        except FileNotFoundError:
+            raise ValueError(f"Shared index {shared_id} is missing")
+        
+        if checksum.hex() != shared_id:
+            raise ValueError(f"Shared index {shared_id} is corrupt")
+        
+        # Keep recently used shared indexes from expiring
+        os.utime(shared_path)
+        
+        self._shared_id = shared_id
+        self._shared_entries = {entry.path: entry for entry in entries}
+        self.entries.update(self._shared_entries)
+        
+        for path in link_data[20:].split(b"\x00")[:-1]:
+            del self.entries[path.decode()]
+    
+    def _read_index_file(self, f: BinaryIO) -> Tuple[List[IndexEntry], List[Tuple[bytes, bytes]], bytes]:
+        """
+        Read and verify an index file.
+        
+        Args:
+            f: The file to read from
+        
+        Returns:
+            A tuple of (entries, extensions as (signature, data) tuples,
+            checksum)
+        
+        Raises:
+            ValueError: If the file is corrupt or uses an unsupported format
+        """
+        data = f.read()
+        
+        if len(data) < INDEX_HEADER.size + 20:
+            raise ValueError("Index file is truncated")
         
         # Parse the header
-        signature, version, entry_count = struct.unpack(">4sLL", content[:12])
+        signature, version, entry_count = INDEX_HEADER.unpack_from(data, 0)
         
         if signature != self.SIGNATURE:
             raise ValueError(f"Invalid index signature: {signature}")
         
-        if version != self.VERSION:
+        if version not in self.SUPPORTED_VERSIONS:
             raise ValueError(f"Unsupported index version: {version}")
         
-        # Parse the entries
-        self.entries.clear()
-        remaining = content[12:]
+        content_length = len(data) - 20
+        threads = self.get_thread_count()
+        extensions_offset = self._find_extensions(data, content_length) if threads > 1 else None
         
-        for _ in range(entry_count):
-            entry, remaining = IndexEntry.deserialize(remaining)
-            self.entries[entry.path] = entry
+        if extensions_offset is not None:
+            extensions = self._parse_extensions(data, extensions_offset, content_length)
+            blocks = self._parse_offset_table(extensions, entry_count)
+            if blocks is not None:
+                entries, checksum = self._parse_entries_parallel(data, version, blocks, threads)
+                return entries, extensions, checksum
+        
+        # Verify the checksum
+        checksum = hashlib.sha1(memoryview(data)[:content_length]).digest()
+        
+        if data[content_length:] != checksum:
+            raise ValueError("Index checksum mismatch")
+        
+        entries, offset = self._parse_entries(data, INDEX_HEADER.size, entry_count, version)
+        extensions = self._parse_extensions(data, offset, content_length)
+        return entries, extensions, checksum
+    
+    def get_thread_count(self) -> int:
+        """
+        Get the number of threads used to decode the index.
+        
+        Set with index.threads: a number, or true (the default) for one
+        thread per CPU; false or 1 decodes on the calling thread only.
+        
+        Returns:
+            The number of threads
+        """
+        value = self.repo.config.get("index", "threads", "true").strip().lower()
+        if value in ("true", "yes", "on", "0"):
+            return os.cpu_count() or 1
+        if value in ("false", "no", "off"):
+            return 1
+        return max(1, int(value))
+    
+    @staticmethod
+    def _parse_entries(data: bytes, offset: int, count: int, version: int) -> Tuple[List[IndexEntry], int]:
+        """
+        Parse a run of consecutive entries.
+        
+        Args:
+            data: The index file data
+            offset: The offset of the first entry
+            count: The number of entries
+            version: The index format version
+        
+        Returns:
+            A tuple of (entries, offset after the last entry)
+        """
+        entries = []
+        
+        if version == 4:
+            parse_v4 = IndexEntry.parse_v4
+            path = None
+            for _ in range(count):
+                entry, offset, path = parse_v4(data, offset, path)
+                entries.append(entry)
+        else:
+            parse = IndexEntry.parse
+            for _ in range(count):
+                entry, offset = parse(data, offset)
+                entries.append(entry)
+        
+        return entries, offset
+    
+    def _parse_entries_parallel(self, data: bytes, version: int, blocks: List[Tuple[int, int]],
+                                threads: int) -> Tuple[List[IndexEntry], bytes]:
+        """
+        Parse the entries in independent blocks on a thread pool.
+        
+        The checksum of the file is computed concurrently (hashlib
+        releases the GIL) and checked before any result is used. The
+        entries are concatenated in block order, so the result is the
+        same as parsing them sequentially.
+        
+        Args:
+            data: The index file data
+            version: The index format version
+            blocks: The (offset, entry count) of every block
+            threads: The number of threads
+        
+        Returns:
+            A tuple of (entries, checksum)
+        
+        Raises:
+            ValueError: If the checksum or the offset table is invalid
+        """
+        content_length = len(data) - 20
+        
+        with ThreadPoolExecutor(max_workers=min(threads, len(blocks) + 1)) as pool:
+            checksum_future = pool.submit(
+                lambda: hashlib.sha1(memoryview(data)[:content_length]).digest()
+            )
+            block_futures = [
+                pool.submit(self._parse_entries, data, offset, count, version)
+                for offset, count in blocks
+            ]
+            
+            checksum = checksum_future.result()
+            if data[content_length:] != checksum:
+                raise ValueError("Index checksum mismatch")
+            
+            entries = []
+            for position, future in enumerate(block_futures):
+                block_entries, end = future.result()
+                next_offset = blocks[position + 1][0] if position + 1 < len(blocks) else None
+                if next_offset is not None and end != next_offset:
+                    raise ValueError("Invalid index entry offset table")
+                entries.extend(block_entries)
+        
+        return entries, checksum
+    
+    @staticmethod
+    def _find_extensions(data: bytes, content_length: int) -> Optional[int]:
+        """
+        Find the extensions using the end-of-index-entries extension.
+        
+        Args:
+            data: The index file data
+            content_length: The length of the data before the checksum
+        
+        Returns:
+            The offset of the first extension, or None if the index has no
+            valid end-of-index-entries extension
+        """
+        eoie_offset = content_length - EXTENSION_HEADER.size - EOIE_DATA.size
+        if eoie_offset < INDEX_HEADER.size:
+            return None
+        
+        signature, size = EXTENSION_HEADER.unpack_from(data, eoie_offset)
+        if signature != EOIE_SIGNATURE or size != EOIE_DATA.size:
+            return None
+        
+        extensions_offset, expected_hash = EOIE_DATA.unpack_from(
+            data, eoie_offset + EXTENSION_HEADER.size
+        )
+        if not INDEX_HEADER.size <= extensions_offset <= eoie_offset:
+            return None
+        
+        # The hash covers the header of every extension before this one
+        header_sha = hashlib.sha1()
+        offset = extensions_offset
+        while offset < eoie_offset:
+            header = data[offset:offset + EXTENSION_HEADER.size]
+            if len(header) < EXTENSION_HEADER.size:
+                return None
+            header_sha.update(header)
+            offset += EXTENSION_HEADER.size + EXTENSION_HEADER.unpack(header)[1]
+        
+        if offset != eoie_offset or header_sha.digest() != expected_hash:
+            return None
+        return extensions_offset
+    
+    @staticmethod
+    def _parse_offset_table(extensions: List[Tuple[bytes, bytes]],
+                            entry_count: int) -> Optional[List[Tuple[int, int]]]:
+        """
+        Get the entry blocks recorded in the index-entry-offset-table.
+        
+        Args:
+            extensions: The extensions as (signature, data) tuples
+            entry_count: The number of entries in the index
+        
+        Returns:
+            The (offset, entry count) of every block, or None if the index
+            has no usable offset table
+        """
+        for signature, data in extensions:
+            if signature != IEOT_SIGNATURE:
+                continue
+            
+            if len(data) < 4 or (len(data) - 4) % IEOT_BLOCK.size:
+                return None
+            if struct.unpack_from(">L", data)[0] != IEOT_VERSION:
+                return None
+            
+            blocks = [
+                IEOT_BLOCK.unpack_from(data, offset)
+                for offset in range(4, len(data), IEOT_BLOCK.size)
+            ]
+            if sum(count for _, count in blocks) != entry_count:
+                return None
+            return blocks
+        
+        return None
+    
+    @staticmethod
+    def _parse_extensions(data: bytes, offset: int, content_length: int) -> List[Tuple[bytes, bytes]]:
+        """
+        Collect the extensions of an index file.
+        
+        Extensions we don't understand are skipped if they are optional
+        (their signature starts with an uppercase letter).
+        
+        Args:
+            data: The index file data
+            offset: The offset of the first extension
+            content_length: The length of the data before the checksum
+        
+        Returns:
+            The extensions as (signature, data) tuples
+        
+        Raises:
+            ValueError: If a required extension is not supported
+        """
+        extensions = []
+        
+        while offset + EXTENSION_HEADER.size <= content_length:
+            signature, size = EXTENSION_HEADER.unpack_from(data, offset)
+            offset += EXTENSION_HEADER.size
+            
+            if signature in (LINK_SIGNATURE, cache_tree.SIGNATURE, untracked_cache.SIGNATURE,
+                             IEOT_SIGNATURE, fsmonitor.SIGNATURE):
+                extensions.append((signature, data[offset:offset + size]))
+            elif not b"A" <= signature[:1] <= b"Z":
+                raise ValueError(f"Unsupported index extension: {signature}")
+            
+            offset += size
+        
+        return extensions
     
     def get_tree_id(self) -> str:
         """
         Create a tree object from the index and return its ID.
         
+        Only directories invalidated in the cache-tree since the last
+        call are rebuilt and written; every other subtree ID is reused.
+        
         Returns:
             The ID of the tree object
         """
         if not self.entries:
             return None
         
-        # Build a dict of directories to entries
-        entries_by_dir = {}
+        # Entries sorted by path keep every directory's entries contiguous
+        entries = sorted(self.entries.items())
         
-        for path, entry in self.entries.items():
-            # Split path into directory and filename
-            directory, filename = os.path.split(path)
+        return self._build_tree_recursive(self.cache_tree, entries, 0, "")[0]
+    
+    def _build_tree_recursive(self, node: CacheTree, entries: List[Tuple[str, IndexEntry]],
+                              start: int, prefix: str) -> Tuple[str, int]:
+        """
+        Build the tree of a directory, reusing its cached ID if valid.
+        
+        Args:
+            node: The cache-tree node of the directory
+            entries: The index entries as (path, entry) tuples, sorted by path
+            start: The position of the directory's first entry
+            prefix: The directory path followed by "/" ("" for the root)
+        
+        Returns:
+            A tuple of (tree ID, position after the directory's entries)
+        """
+        end = start + node.entry_count
+        if node.is_valid and end > start and self._covers(entries, end, prefix):
+            return node.object_id, end
+        
+        tree = Tree(self.repo)
+        seen = set()
+        position = start
+        
+        while position < len(entries) and entries[position][0].startswith(prefix):
+            path, entry = entries[position]
+            name, slash, _ = path[len(prefix):].partition("/")
             
-            # Create the directory's list if it doesn't exist
-            if directory not in entries_by_dir:
-                entries_by_dir[directory] = []
+            if slash:
+                child = node.children.get(name)
+                if child is None:
+                    child = node.children[name] = CacheTree()
+                
+                subtree_id, position = self._build_tree_recursive(
+                    child, entries, position, prefix + name + "/"
+                )
+                tree.add_entry("40000", name, subtree_id)
+                seen.add(name)
+            else:
+                tree.add_entry(f"{entry.mode:o}", name, entry.object_id)
+                position += 1
+        
+        # Forget directories that no longer exist
+        for name in list(node.children):
+            if name not in seen:
+                del node.children[name]
+        
+        node.object_id = tree.write()
+        node.entry_count = position - start
+        return node.object_id, position
+    
+    def diff_tree(self, tree_id: Optional[str], detailed: bool = False) -> List[tuple]:
+        """
+        Compare a tree (e.g. HEAD's) with the index.
+        
+        The tree and the index are walked in lockstep. A directory whose
+        cache-tree node is valid and has the same ID as the tree's entry
+        is skipped without reading it, so after a commit only the
+        directories staged changes are in get compared.
+        
+        Args:
+            tree_id: The ID of the tree, or None for an empty tree
+            detailed: Whether to include the tree side of each change
+        
+        Returns:
+            A list of (status, path) tuples sorted by path, where status is
+            "A" (only in the index), "M" (content or mode differs) or "D"
+            (only in the tree). With detailed, the tuples are (status, path,
+            tree mode, tree object ID), with mode 0 and ID None for "A".
+        """
+        entries = sorted(self.entries.items())
+        changes = []
+        self._diff_tree_recursive(tree_id, self.cache_tree, entries, 0, "", changes)
+        changes.sort(key=lambda change: change[1])
+        if detailed:
+            return changes
+        return [(status, path) for status, path, _, _ in changes]
+    
+    def _diff_tree_recursive(self, tree_id: Optional[str], node: Optional[CacheTree],
+                             entries: List[Tuple[str, IndexEntry]], start: int, prefix: str,
+                             changes: List[Tuple[str, str]]) -> int:
+        """
+        Compare a directory of a tree with the index.
+        
+        Args:
+            tree_id: The ID of the directory's tree, or None if it's not in the tree
+            node: The cache-tree node of the directory, if any
+            entries: The index entries as (path, entry) tuples, sorted by path
+            start: The position of the directory's first entry
+            prefix: The directory path followed by "/" ("" for the root)
+            changes: The list the (status, path, tree mode, tree ID)
+                     tuples are appended to
+        
+        Returns:
+            The position after the directory's entries
+        """
+        if node is not None and node.is_valid and tree_id is not None and node.object_id == tree_id:
+            end = start + node.entry_count
+            if end > start and self._covers(entries, end, prefix):
+                return end
+        
+        tree_entries = {}
+        if tree_id is not None:
+            tree_entries = {entry.name: entry for entry in self.repo.get_object(tree_id).entries}
+        
+        position = start
+        while position < len(entries) and entries[position][0].startswith(prefix):
+            path, entry = entries[position]
+            name, slash, _ = path[len(prefix):].partition("/")
+            tree_entry = tree_entries.pop(name, None)
+            tree_is_dir = tree_entry is not None and stat.S_ISDIR(int(tree_entry.mode, 8))
+            
+            if slash:
+                # A file in the tree replaced by a directory in the index
+                if tree_entry is not None and not tree_is_dir:
+                    changes.append(("D", prefix + name, int(tree_entry.mode, 8), tree_entry.id))
+                
+                child = node.children.get(name) if node is not None else None
+                position = self._diff_tree_recursive(
+                    tree_entry.id if tree_is_dir else None, child, entries, position,
+                    prefix + name + "/", changes
+                )
+                continue
             
-            # Add the entry to the directory's list
-            entries_by_dir[directory].append((filename, entry))
+            if tree_entry is None:
+                changes.append(("A", path, 0, None))
+            elif tree_is_dir:
+                self._list_tree_files(tree_entry.id, path + "/", "D", changes)
+                changes.append(("A", path, 0, None))
+            elif tree_entry.id != entry.object_id or int(tree_entry.mode, 8) != entry.mode:
+                changes.append(("M", path, int(tree_entry.mode, 8), tree_entry.id))
+            position += 1
         
-        # Create tree objects from the bottom up
-        return self._build_tree_recursive("", entries_by_dir)
\ No newline at end of file
+        # Whatever is left is only in the tree
+        for name, tree_entry in tree_entries.items():
+            if stat.S_ISDIR(int(tree_entry.mode, 8)):
+                self._list_tree_files(tree_entry.id, prefix + name + "/", "D", changes)
+            else:
+                changes.append(("D", prefix + name, int(tree_entry.mode, 8), tree_entry.id))
+        
+        return position
+    
+    def _list_tree_files(self, tree_id: str, prefix: str, status: str,
+                         changes: List[Tuple[str, str]]) -> None:
+        """
+        Report every file of a tree as changed.
+        
+        Args:
+            tree_id: The ID of the tree
+            prefix: The tree's path followed by "/"
+            status: The status of the files
+            changes: The list the (status, path, tree mode, tree ID) tuples
+                     are appended to
+        """
+        for change in iter_tree_changes(self.repo, tree_id, None, prefix=prefix):
+            changes.append((status, change.path, change.old_mode, change.old_id))
+    
+    @staticmethod
+    def _covers(entries: List[Tuple[str, IndexEntry]], end: int, prefix: str) -> bool:
+        """
+        Check that a directory's entries end exactly at a position.
+        
+        Guards against entries changed without going through add/remove.
+        
+        Args:
+            entries: The index entries as (path, entry) tuples, sorted by path
+            end: The position after the directory's last entry
+            prefix: The directory path followed by "/" ("" for the root)
+        
+        Returns:
+            True if the entry counts are consistent, False otherwise
+        """
+        if end > len(entries) or not entries[end - 1][0].startswith(prefix):
+            return False
+        return end == len(entries) or not entries[end][0].startswith(prefix)
\ No newline at end of file
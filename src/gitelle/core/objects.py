@@ -10,7 +10,7 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple, Union
 
-from gitelle.utils.compression import compress_data, decompress_data
+from gitelle.utils.compression import compress_data
 from gitelle.utils.filesystem import ensure_directory_exists
 
 
@@ -95,12 +95,13 @@ class GitObject(ABC):
             The object's ID
         """
         object_id = self.id
-        object_path = self._get_object_path(object_id)
         
-        # If the object already exists, don't write it again
-        if object_path.exists():
+        # If the object already exists (loose or packed), don't write it again
+        if self.repo.object_store.contains(object_id):
             return object_id
         
+        object_path = self._get_object_path(self.repo, object_id)
+        
         # Create the directory if it doesn't exist
         ensure_directory_exists(object_path.parent)
         
@@ -130,27 +131,29 @@ class GitObject(ABC):
         Raises:
             ValueError: If the object does not exist or has an invalid format
         """
-        object_path = cls._get_object_path(repo, object_id)
-        
-        if not object_path.exists():
-            raise ValueError(f"Object {object_id} does not exist")
-        
-        # Read and decompress the object data
-        with open(object_path, 'rb') as f:
-            compressed_data = f.read()
+        # Look the object up in the packs first, then as a loose object
+        obj_type, data = repo.object_store.read_raw(object_id)
         
-        raw_data = decompress_data(compressed_data)
+        obj = cls.from_data(repo, obj_type, data)
+        obj._id = object_id
+        return obj
+    
+    @staticmethod
+    def from_data(repo, obj_type: str, data: bytes) -> 'GitObject':
+        """
+        Create an object of the given type from its serialized data.
         
-        # Parse the header
-        null_index = raw_data.index(b'\x00')
-        header = raw_data[:null_index].decode()
-        data = raw_data[null_index + 1:]
+        Args:
+            repo: The repository the object belongs to
+            obj_type: The object type
+            data: The serialized object data
         
-        # Extract the type
-        type_end = header.index(' ')
-        obj_type = header[:type_end]
+        Returns:
+            A GitObject of the appropriate type
         
-        # Create the appropriate object type
+        Raises:
+            ValueError: If the object type is unknown
+        """
         if obj_type == 'blob':
             return Blob.deserialize(repo, data)
         elif obj_type == 'tree':
@@ -170,32 +173,24 @@ class GitObject(ABC):
             object_id: The object ID
         
         Returns:
-            The path to the object file
+            The path to the loose object file
         """
-        return repo.objects_dir / object_id[:2] / object_id[2:]
-    
-    def _get_object_path(self, object_id: str) -> Path:
-        """
-        Get the path to this object in the repository.
-        
-        Args:
-            object_id: The object ID
-        
-        Returns:
-            The path to the object file
-        """
-        return self.repo.objects_dir / object_id[:2] / object_id[2:]
+        return repo.object_store.loose_path(object_id)
 
 
 class Blob(GitObject):
     """
     Represents a Git blob object, which stores file content.
     
+    A blob created with `from_file` is backed by the file: its data is only
+    loaded if accessed, and its ID and loose object are computed by
+    streaming the file, so large files are never held in memory.
+    
     Attributes:
         data: The blob's data as bytes
     """
     
-    def __init__(self, repo, data: bytes):
+    def __init__(self, repo, data: Optional[bytes]):
         """
         Initialize a blob object.
         
@@ -204,15 +199,64 @@ class Blob(GitObject):
             data: The blob's data
         """
         super().__init__(repo)
-        self.data = data
+        self._data = data
+        self._source_path = None
+        self._source_size = None
     
     @property
     def type(self) -> str:
         return "blob"
     
+    @property
+    def data(self) -> bytes:
+        """Get the blob's data, reading it from the source file if needed."""
+        if self._data is None and self._source_path is not None:
+            with open(self._source_path, 'rb') as f:
+                self._data = f.read()
+        return self._data
+    
+    @data.setter
+    def data(self, value: bytes) -> None:
+        self._data = value
+        self._source_path = None
+        self._id = None
+    
+    @property
+    def id(self) -> str:
+        """
+        Get the blob's ID (SHA-1 hash).
+        
+        Returns:
+            The blob's SHA-1 hash ID
+        """
+        if self._id is None and self._data is None and self._source_path is not None:
+            with open(self._source_path, 'rb') as f:
+                self._id = self.repo.object_store.hash_stream(self.type, self._source_size, f)
+        return super().id
+    
     def serialize(self) -> bytes:
         return self.data
     
+    def write(self) -> str:
+        """
+        Write this blob to the repository.
+        
+        Blobs backed by a file are streamed into the object store in
+        fixed-size chunks.
+        
+        Returns:
+            The blob's ID
+        """
+        if self._data is not None or self._source_path is None:
+            return super().write()
+        
+        if self._id is not None and self.repo.object_store.contains(self._id):
+            return self._id
+        
+        with open(self._source_path, 'rb') as f:
+            self._id = self.repo.object_store.write_stream(self.type, self._source_size, f)
+        return self._id
+    
     @classmethod
     def deserialize(cls, repo, data: bytes) -> 'Blob':
         return cls(repo, data)
@@ -222,6 +266,9 @@ class Blob(GitObject):
         """
         Create a blob from a file.
         
+        The file is not read until the blob's data is accessed; `id` and
+        `write` stream the file instead.
+        
         Args:
             repo: The repository this blob belongs to
             path: The path to the file
@@ -229,22 +276,28 @@ class Blob(GitObject):
         Returns:
             A new Blob instance
         """
-        path = Path(path)
-        with open(path, 'rb') as f:
-            data = f.read()
-        return cls(repo, data)
+        blob = cls(repo, None)
+        blob._source_path = Path(path)
+        blob._source_size = blob._source_path.stat().st_size
+        return blob
 
 
 class TreeEntry:
     """
     Represents an entry in a Git tree object.
     
+    Entries use __slots__ and keep the object ID as its raw 20 bytes, so
+    large trees stay compact in memory; the hex form is computed on access.
+    
     Attributes:
         mode: The file mode (e.g., 100644 for a regular file)
         name: The name of the file or directory
-        id: The object ID of the entry
+        raw_id: The object ID of the entry as 20 raw bytes
+        id: The object ID of the entry as a hex string
     """
     
+    __slots__ = ("mode", "name", "raw_id")
+    
     def __init__(self, mode: str, name: str, object_id: str):
         """
         Initialize a tree entry.
@@ -256,7 +309,47 @@ class TreeEntry:
         """
         self.mode = mode
         self.name = name
-        self.id = object_id
+        self.raw_id = bytes.fromhex(object_id)
+    
+    @classmethod
+    def from_raw(cls, mode: str, name: str, raw_id: bytes) -> 'TreeEntry':
+        """
+        Create a tree entry from a raw 20-byte object ID.
+        
+        Args:
+            mode: The file mode
+            name: The name of the file or directory
+            raw_id: The object ID as raw bytes
+        
+        Returns:
+            A new TreeEntry instance
+        """
+        entry = cls.__new__(cls)
+        entry.mode = mode
+        entry.name = name
+        entry.raw_id = raw_id
+        return entry
+    
+    @property
+    def id(self) -> str:
+        """Get the object ID as a hex string."""
+        return self.raw_id.hex()
+    
+    @id.setter
+    def id(self, object_id: str) -> None:
+        self.raw_id = bytes.fromhex(object_id)
+    
+    @property
+    def sort_key(self) -> str:
+        """
+        Get the key Git sorts tree entries by.
+        
+        Directories sort as if their name ended with a slash, so "foo"
+        (a tree) sorts after "foo.txt" but before "foo0".
+        """
+        if self.mode.startswith("40"):
+            return self.name + "/"
+        return self.name
     
     def serialize(self) -> bytes:
         """
@@ -265,36 +358,58 @@ class TreeEntry:
         Returns:
             The serialized tree entry
         """
-        mode = self.mode.encode()
-        name = self.name.encode()
-        object_id = bytes.fromhex(self.id)
-        return mode + b' ' + name + b'\x00' + object_id
+        return b"".join((self.mode.encode(), b' ', self.name.encode(), b'\x00', self.raw_id))
     
     @classmethod
-    def deserialize(cls, data: bytes) -> Tuple['TreeEntry', bytes]:
+    def parse(cls, data: bytes, offset: int) -> Tuple['TreeEntry', int]:
         """
-        Deserialize a tree entry from bytes.
+        Parse a tree entry at an offset, without copying the rest of the data.
         
         Args:
-            data: The serialized tree entry data
+            data: The serialized tree data
+            offset: The offset of the entry
         
         Returns:
-            A tuple of (TreeEntry, remaining_data)
+            A tuple of (TreeEntry, offset of the next entry)
         """
         # Find the space separator between mode and name
-        space_index = data.index(b' ')
-        mode = data[:space_index].decode()
+        space_index = data.index(b' ', offset)
         
         # Find the null separator between name and object ID
         null_index = data.index(b'\x00', space_index)
+        
+        mode = data[offset:space_index].decode()
+        mode = _TREE_MODES.setdefault(mode, mode)
         name = data[space_index + 1:null_index].decode()
         
-        # The object ID is 20 bytes (40 hex characters)
-        object_id = data[null_index + 1:null_index + 21].hex()
+        # The object ID is 20 bytes
+        end = null_index + 21
+        raw_id = bytes(data[null_index + 1:end])
+        if len(raw_id) != 20:
+            raise ValueError("Truncated tree entry")
+        
+        return cls.from_raw(mode, name, raw_id), end
+    
+    @classmethod
+    def deserialize(cls, data: bytes) -> Tuple['TreeEntry', bytes]:
+        """
+        Deserialize a tree entry from bytes.
+        
+        Args:
+            data: The serialized tree entry data
         
-        # Return the entry and the remaining data
-        remaining = data[null_index + 21:]
-        return cls(mode, name, object_id), remaining
+        Returns:
+            A tuple of (TreeEntry, remaining_data)
+        """
+        entry, end = cls.parse(data, 0)
+        return entry, data[end:]
+    
+    def __repr__(self) -> str:
+        return f"TreeEntry({self.mode}, {self.name}, {self.id})"
+
+
+# Shared mode strings, so parsed entries don't each hold a copy
+_TREE_MODES: Dict[str, str] = {}
 
 
 class Tree(GitObject):
@@ -336,24 +451,29 @@ class Tree(GitObject):
         """
         Serialize the tree to bytes.
         
+        Entries are written in Git's tree order and joined in one step.
+        
         Returns:
             The serialized tree data
         """
-        # Sort entries by name
-        sorted_entries = sorted(self.entries, key=lambda e: e.name)
-        
-        # Serialize each entry and concatenate
-        result = b''
-        for entry in sorted_entries:
-            result += entry.serialize()
+        parts = []
+        for entry in sorted(self.entries, key=lambda e: e.sort_key):
+            parts.append(entry.mode.encode())
+            parts.append(b' ')
+            parts.append(entry.name.encode())
+            parts.append(b'\x00')
+            parts.append(entry.raw_id)
         
-        return result
+        return b''.join(parts)
     
     @classmethod
     def deserialize(cls, repo, data: bytes) -> 'Tree':
         """
         Deserialize bytes to create a tree.
         
+        The data is scanned with a running offset, so parsing is linear
+        in the size of the tree.
+        
         Args:
             repo: The repository this tree belongs to
             data: The serialized tree data
@@ -362,12 +482,14 @@ class Tree(GitObject):
             A new Tree instance
         """
         tree = cls(repo)
-        remaining = data
-        
-        # Parse entries until we've consumed all the data
-        while remaining:
-            entry, remaining = TreeEntry.deserialize(remaining)
-            tree.entries.append(entry)
+        entries = tree.entries
+        parse = TreeEntry.parse
+        
+        offset = 0
+        end = len(data)
+        while offset < end:
+            entry, offset = parse(data, offset)
+            entries.append(entry)
         
         return tree
 
@@ -0,0 +1,820 @@
+"""
+Implementation of Git packfiles and pack index files.
+"""
+import hashlib
+import mmap
+import os
+import posixpath
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from gitelle.core.stream import ObjectStream
+from gitelle.utils.delta import apply_delta, create_delta, get_delta_sizes
+
+
+# Pack entry type numbers, as stored in the pack entry header
+OBJ_COMMIT = 1
+OBJ_TREE = 2
+OBJ_BLOB = 3
+OBJ_TAG = 4
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+
+TYPE_NAMES = {
+    OBJ_COMMIT: "commit",
+    OBJ_TREE: "tree",
+    OBJ_BLOB: "blob",
+    OBJ_TAG: "tag",
+}
+
+TYPE_NUMBERS = {name: number for number, name in TYPE_NAMES.items()}
+
+# Size of the chunks fed to the decompressor when inflating pack entries
+INFLATE_CHUNK_SIZE = 64 * 1024
+
+# The two size varints at the start of a delta take at most this many bytes
+DELTA_HEADER_MAX_SIZE = 20
+
+# Compressed bytes fed at a time while inflating a delta's header
+DELTA_HEADER_CHUNK_SIZE = 256
+
+# Object types that are considered for delta compression
+DELTA_TYPES = ("blob", "tree")
+
+# Objects smaller than this are never deltified
+MIN_DELTA_SIZE = 50
+
+# Default delta search parameters (the same as Git's)
+DEFAULT_WINDOW = 10
+DEFAULT_DEPTH = 50
+
+
+class PackIndex:
+    """
+    Represents a version 2 pack index (.idx) file.
+
+    The index is memory-mapped and never read into memory as a whole.
+    Lookups use the fanout table to narrow the search to the entries
+    sharing the first byte of the object ID, then binary search the
+    sorted SHA-1 table within that bucket.
+
+    Layout (all integers are big-endian):
+        magic (4 bytes) + version (4 bytes)
+        fanout table (256 x 4 bytes)
+        sorted object IDs (N x 20 bytes)
+        CRC32 values (N x 4 bytes)
+        pack offsets (N x 4 bytes, MSB set = index into large offsets)
+        large pack offsets (M x 8 bytes)
+        pack checksum (20 bytes) + index checksum (20 bytes)
+
+    Attributes:
+        path: The path to the .idx file
+    """
+
+    SIGNATURE = b"\377tOc"
+    VERSION = 2
+
+    HEADER_SIZE = 8
+    FANOUT_SIZE = 256 * 4
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open a pack index.
+
+        Args:
+            path: The path to the .idx file
+
+        Raises:
+            ValueError: If the file is not a version 2 pack index
+        """
+        self.path = Path(path)
+
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        signature, version = struct.unpack_from(">4sL", self._map, 0)
+        if signature != self.SIGNATURE:
+            self.close()
+            raise ValueError(f"Invalid pack index signature in {self.path}")
+
+        if version != self.VERSION:
+            self.close()
+            raise ValueError(f"Unsupported pack index version: {version}")
+
+        self._fanout = struct.unpack_from(">256L", self._map, self.HEADER_SIZE)
+        self._count = self._fanout[255]
+
+        self._sha_table = self.HEADER_SIZE + self.FANOUT_SIZE
+        self._crc_table = self._sha_table + 20 * self._count
+        self._offset_table = self._crc_table + 4 * self._count
+        self._large_offset_table = self._offset_table + 4 * self._count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, object_id: bytes) -> bool:
+        return self.find_position(object_id) is not None
+
+    def find_position(self, object_id: bytes) -> Optional[int]:
+        """
+        Find the position of an object in the sorted SHA-1 table.
+
+        Args:
+            object_id: The raw 20-byte object ID
+
+        Returns:
+            The position of the object, or None if it is not in this pack
+        """
+        first_byte = object_id[0]
+        low = self._fanout[first_byte - 1] if first_byte else 0
+        high = self._fanout[first_byte]
+
+        # Binary search within the fanout bucket
+        data = self._map
+        base = self._sha_table
+        while low < high:
+            middle = (low + high) // 2
+            start = base + 20 * middle
+            candidate = data[start:start + 20]
+            if candidate < object_id:
+                low = middle + 1
+            elif candidate > object_id:
+                high = middle
+            else:
+                return middle
+
+        return None
+
+    def find_offset(self, object_id: bytes) -> Optional[int]:
+        """
+        Find the offset of an object in the packfile.
+
+        Args:
+            object_id: The raw 20-byte object ID
+
+        Returns:
+            The offset of the object in the .pack file, or None if it is
+            not in this pack
+        """
+        position = self.find_position(object_id)
+        if position is None:
+            return None
+        return self._offset_at(position)
+
+    def object_id_at(self, position: int) -> bytes:
+        """
+        Get the raw object ID at a position in the sorted SHA-1 table.
+
+        Args:
+            position: The position in the table
+
+        Returns:
+            The raw 20-byte object ID
+        """
+        start = self._sha_table + 20 * position
+        return self._map[start:start + 20]
+
+    def iter_entries(self) -> Iterator[Tuple[bytes, int]]:
+        """
+        Iterate over all objects in the index, sorted by object ID.
+
+        Yields:
+            Tuples of (raw object ID, pack offset)
+        """
+        for position in range(self._count):
+            yield self.object_id_at(position), self._offset_at(position)
+
+    def _offset_at(self, position: int) -> int:
+        """
+        Get the pack offset stored at a position, resolving large offsets.
+
+        Args:
+            position: The position in the offset table
+
+        Returns:
+            The offset of the object in the .pack file
+        """
+        (offset,) = struct.unpack_from(">L", self._map, self._offset_table + 4 * position)
+        if offset & 0x80000000:
+            large_position = offset & 0x7FFFFFFF
+            (offset,) = struct.unpack_from(
+                ">Q", self._map, self._large_offset_table + 8 * large_position
+            )
+        return offset
+
+    def close(self) -> None:
+        """Unmap the index file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class Pack:
+    """
+    Represents a Git packfile together with its index.
+
+    The .pack file is memory-mapped lazily on the first object read, so
+    opening many packs only costs the (small) index mappings.
+
+    Attributes:
+        path: The path to the .pack file
+        index: The PackIndex for this pack
+    """
+
+    SIGNATURE = b"PACK"
+    VERSION = 2
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open a packfile.
+
+        Args:
+            path: The path to the .pack file (the .idx file is expected
+                  next to it)
+        """
+        self.path = Path(path)
+        self.index = PackIndex(self.path.with_suffix(".idx"))
+        self._map = None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, object_id: bytes) -> bool:
+        return object_id in self.index
+
+    @property
+    def data(self) -> mmap.mmap:
+        """Get the memory-mapped contents of the .pack file."""
+        if self._map is None:
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            signature, version, count = struct.unpack_from(">4sLL", self._map, 0)
+            if signature != self.SIGNATURE:
+                raise ValueError(f"Invalid pack signature in {self.path}")
+            if version != self.VERSION:
+                raise ValueError(f"Unsupported pack version: {version}")
+            if count != len(self.index):
+                raise ValueError(f"Pack {self.path} does not match its index")
+
+        return self._map
+
+    def read_object(self, object_id: bytes) -> Optional[Tuple[str, bytes]]:
+        """
+        Read an object from the pack.
+
+        Args:
+            object_id: The raw 20-byte object ID
+
+        Returns:
+            A tuple of (object type, object data), or None if the object
+            is not in this pack
+        """
+        offset = self.index.find_offset(object_id)
+        if offset is None:
+            return None
+        return self.read_at(offset)
+
+    def read_at(self, offset: int) -> Tuple[str, bytes]:
+        """
+        Read the object stored at an offset in the pack.
+
+        Args:
+            offset: The offset of the pack entry
+
+        Returns:
+            A tuple of (object type, object data)
+
+        Raises:
+            ValueError: If the entry is corrupt or has an unsupported type
+        """
+        # Follow the delta chain down to its base object
+        deltas = []
+        while True:
+            type_number, size, data_offset = self.read_entry_header(offset)
+
+            if type_number == OBJ_OFS_DELTA:
+                distance, data_offset = self._read_base_distance(data_offset)
+                deltas.append(self._inflate(data_offset, size))
+                offset -= distance
+            elif type_number == OBJ_REF_DELTA:
+                base_id = self.data[data_offset:data_offset + 20]
+                deltas.append(self._inflate(data_offset + 20, size))
+                offset = self.index.find_offset(base_id)
+                if offset is None:
+                    raise ValueError(f"Delta base {base_id.hex()} is missing from {self.path}")
+            elif type_number in TYPE_NAMES:
+                obj_type = TYPE_NAMES[type_number]
+                data = self._inflate(data_offset, size)
+                break
+            else:
+                raise ValueError(f"Unsupported pack entry type {type_number} at offset {offset}")
+
+        for delta in reversed(deltas):
+            data = apply_delta(data, delta)
+
+        return obj_type, data
+
+    def read_info(self, object_id: bytes) -> Optional[Tuple[str, int]]:
+        """
+        Get the type and size of an object without inflating its data.
+
+        For whole entries both come from the entry header. For deltified
+        entries the size is the target size stored in the first bytes of
+        the delta, and the type is that of the base at the end of the
+        chain, found by reading only entry headers.
+
+        Args:
+            object_id: The raw 20-byte object ID
+
+        Returns:
+            A tuple of (object type, object size), or None if the object
+            is not in this pack
+        """
+        offset = self.index.find_offset(object_id)
+        if offset is None:
+            return None
+
+        result_size = None
+        while True:
+            type_number, size, data_offset = self.read_entry_header(offset)
+
+            if type_number == OBJ_OFS_DELTA:
+                distance, data_offset = self._read_base_distance(data_offset)
+                if result_size is None:
+                    result_size = self._read_delta_target_size(data_offset)
+                offset -= distance
+            elif type_number == OBJ_REF_DELTA:
+                if result_size is None:
+                    result_size = self._read_delta_target_size(data_offset + 20)
+                offset = self.index.find_offset(self.data[data_offset:data_offset + 20])
+                if offset is None:
+                    raise ValueError(f"Delta base is missing from {self.path}")
+            elif type_number in TYPE_NAMES:
+                return TYPE_NAMES[type_number], size if result_size is None else result_size
+            else:
+                raise ValueError(f"Unsupported pack entry type {type_number} at offset {offset}")
+
+    def _read_delta_target_size(self, offset: int) -> int:
+        """
+        Read the target size from the header of a compressed delta.
+
+        Args:
+            offset: The offset of the compressed delta data
+
+        Returns:
+            The size of the object the delta produces
+        """
+        # The compressed stream usually opens with a Huffman table, so
+        # input is fed until both size varints have been inflated
+        decompressor = zlib.decompressobj()
+        header = b""
+        position = offset
+        while sum(1 for byte in header if byte < 0x80) < 2:
+            if len(header) >= DELTA_HEADER_MAX_SIZE or decompressor.eof:
+                raise ValueError(f"Invalid delta header at offset {offset} in {self.path}")
+            chunk = decompressor.unconsumed_tail
+            if not chunk:
+                chunk = self.data[position:position + DELTA_HEADER_CHUNK_SIZE]
+                position += len(chunk)
+                if not chunk:
+                    raise ValueError(f"Truncated delta at offset {offset} in {self.path}")
+            header += decompressor.decompress(chunk, DELTA_HEADER_MAX_SIZE - len(header))
+        return get_delta_sizes(header)[1]
+
+    def open_stream(self, object_id: bytes) -> Optional[ObjectStream]:
+        """
+        Open a stream over an object in the pack.
+
+        Whole (non-delta) entries are inflated incrementally straight from
+        the mapped pack. Deltified entries have to be rebuilt in memory
+        first, so they are streamed from the rebuilt data.
+
+        Args:
+            object_id: The raw 20-byte object ID
+
+        Returns:
+            An ObjectStream, or None if the object is not in this pack
+        """
+        offset = self.index.find_offset(object_id)
+        if offset is None:
+            return None
+
+        type_number, size, data_offset = self.read_entry_header(offset)
+        if type_number not in TYPE_NAMES:
+            return ObjectStream.from_bytes(*self.read_at(offset))
+
+        data = self.data
+        position = data_offset
+
+        def read_compressed() -> bytes:
+            nonlocal position
+            chunk = data[position:position + INFLATE_CHUNK_SIZE]
+            position += len(chunk)
+            return chunk
+
+        return ObjectStream(TYPE_NAMES[type_number], size, read_compressed, zlib.decompressobj())
+
+    def read_entry_header(self, offset: int) -> Tuple[int, int, int]:
+        """
+        Parse the variable-length header of a pack entry.
+
+        The first byte holds the type in bits 4-6 and the low 4 bits of
+        the size; each following byte (while the MSB is set) contributes
+        7 more bits of the size.
+
+        Args:
+            offset: The offset of the pack entry
+
+        Returns:
+            A tuple of (type number, inflated size, offset of the entry data)
+        """
+        data = self.data
+        byte = data[offset]
+        type_number = (byte >> 4) & 0x07
+        size = byte & 0x0F
+        shift = 4
+        offset += 1
+
+        while byte & 0x80:
+            byte = data[offset]
+            size |= (byte & 0x7F) << shift
+            shift += 7
+            offset += 1
+
+        return type_number, size, offset
+
+    def _read_base_distance(self, offset: int) -> Tuple[int, int]:
+        """
+        Parse the base distance of an OFS_DELTA entry.
+
+        Args:
+            offset: The offset of the encoded distance
+
+        Returns:
+            A tuple of (distance back to the base entry, offset of the delta data)
+        """
+        data = self.data
+        byte = data[offset]
+        distance = byte & 0x7F
+        offset += 1
+
+        while byte & 0x80:
+            byte = data[offset]
+            distance = ((distance + 1) << 7) | (byte & 0x7F)
+            offset += 1
+
+        return distance, offset
+
+    def _inflate(self, offset: int, size: int) -> bytes:
+        """
+        Inflate the zlib stream starting at an offset.
+
+        Args:
+            offset: The offset of the compressed data
+            size: The expected size of the inflated data
+
+        Returns:
+            The inflated data
+
+        Raises:
+            ValueError: If the inflated size does not match
+        """
+        data = self.data
+        decompressor = zlib.decompressobj()
+        chunks = []
+
+        while not decompressor.eof and offset < len(data):
+            chunk = data[offset:offset + INFLATE_CHUNK_SIZE]
+            offset += len(chunk)
+            chunks.append(decompressor.decompress(chunk))
+
+        result = b"".join(chunks)
+        if len(result) != size:
+            raise ValueError(f"Pack entry size mismatch in {self.path}")
+
+        return result
+
+    def close(self) -> None:
+        """Unmap the pack and its index."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.index.close()
+
+    def __repr__(self) -> str:
+        return f"Pack({self.path})"
+
+
+def find_packs(pack_dir: Union[str, Path]) -> List[Path]:
+    """
+    List the packfiles in a pack directory that have a matching index.
+
+    Args:
+        pack_dir: The objects/pack directory
+
+    Returns:
+        A list of .pack paths, newest first
+    """
+    pack_dir = Path(pack_dir)
+    if not pack_dir.is_dir():
+        return []
+
+    packs = [
+        path for path in pack_dir.glob("pack-*.pack")
+        if path.with_suffix(".idx").exists()
+    ]
+    return sorted(packs, key=lambda p: p.stat().st_mtime, reverse=True)
+
+
+def encode_entry_header(type_number: int, size: int) -> bytes:
+    """
+    Encode the variable-length header of a pack entry.
+
+    Args:
+        type_number: The pack entry type
+        size: The inflated size of the entry data
+
+    Returns:
+        The encoded header
+    """
+    header = bytearray()
+    byte = (type_number << 4) | (size & 0x0F)
+    size >>= 4
+
+    while size:
+        header.append(byte | 0x80)
+        byte = size & 0x7F
+        size >>= 7
+
+    header.append(byte)
+    return bytes(header)
+
+
+def write_pack_index(path: Union[str, Path], entries: List[Tuple[bytes, int, int]],
+                     pack_checksum: bytes) -> None:
+    """
+    Write a version 2 pack index.
+
+    Args:
+        path: The path of the .idx file to write
+        entries: A list of (raw object ID, pack offset, CRC32) tuples
+        pack_checksum: The trailing SHA-1 of the corresponding .pack file
+    """
+    entries = sorted(entries)
+
+    fanout = [0] * 256
+    for object_id, _, _ in entries:
+        fanout[object_id[0]] += 1
+
+    total = 0
+    for i in range(256):
+        total += fanout[i]
+        fanout[i] = total
+
+    offsets = []
+    large_offsets = []
+    for _, offset, _ in entries:
+        if offset < 0x80000000:
+            offsets.append(offset)
+        else:
+            offsets.append(0x80000000 | len(large_offsets))
+            large_offsets.append(offset)
+
+    parts = [
+        struct.pack(">4sL", PackIndex.SIGNATURE, PackIndex.VERSION),
+        struct.pack(">256L", *fanout),
+        b"".join(object_id for object_id, _, _ in entries),
+        struct.pack(f">{len(entries)}L", *(crc for _, _, crc in entries)),
+        struct.pack(f">{len(offsets)}L", *offsets),
+        struct.pack(f">{len(large_offsets)}Q", *large_offsets),
+        pack_checksum,
+    ]
+
+    data = b"".join(parts)
+    with open(path, "wb") as f:
+        f.write(data)
+        f.write(hashlib.sha1(data).digest())
+
+
+def encode_base_distance(distance: int) -> bytes:
+    """
+    Encode the base distance of an OFS_DELTA entry.
+
+    Args:
+        distance: The distance from the delta entry back to its base
+
+    Returns:
+        The encoded distance
+    """
+    encoded = [distance & 0x7F]
+    distance >>= 7
+
+    while distance:
+        distance -= 1
+        encoded.append(0x80 | (distance & 0x7F))
+        distance >>= 7
+
+    return bytes(reversed(encoded))
+
+
+def _search_delta_window(items: List[Tuple[int, bytes]], window: int,
+                         depth: int) -> List[Tuple[int, int, bytes]]:
+    """
+    Find delta bases within a sliding window over sorted objects.
+
+    Each object is compared against the previous `window` objects and
+    deltified against whichever gives the smallest delta, provided the
+    delta is well under half the object size and the base's own chain
+    is shorter than `depth`.
+
+    Args:
+        items: A list of (object position, object data), already sorted
+        window: The number of previous objects to try as bases
+        depth: The maximum length of a delta chain
+
+    Returns:
+        A list of (object position, base position, delta) tuples
+    """
+    results = []
+    chain_depth: Dict[int, int] = {}
+
+    for i, (position, data) in enumerate(items):
+        target_size = len(data)
+        best = None
+
+        for j in range(max(0, i - window), i):
+            base_position, base = items[j]
+            base_depth = chain_depth.get(base_position, 0)
+            if base_depth >= depth:
+                continue
+
+            # Allow less room for deltas against bases deep in a chain
+            max_size = (target_size // 2 - 20) * (depth - base_depth) // depth
+            if best is not None:
+                max_size = min(max_size, len(best[1]) - 1)
+            if max_size <= 0 or abs(len(base) - target_size) >= max_size:
+                continue
+            if len(base) < target_size // 32:
+                continue
+
+            delta = create_delta(base, data)
+            if len(delta) <= max_size:
+                best = (base_position, delta)
+
+        if best is not None:
+            chain_depth[position] = chain_depth.get(best[0], 0) + 1
+            results.append((position, best[0], best[1]))
+
+    return results
+
+
+def find_delta_bases(objects: List[Tuple[str, str, bytes]], paths: Optional[Dict[str, str]] = None,
+                     window: int = DEFAULT_WINDOW, depth: int = DEFAULT_DEPTH,
+                     workers: int = 1, use_processes: bool = False) -> Dict[int, Tuple[int, bytes]]:
+    """
+    Choose delta bases for the objects of a pack.
+
+    Candidates are grouped by type and sorted by file name, path and
+    decreasing size, so that successive revisions of the same file end
+    up next to each other with the (usually newer) larger one first.
+    With several workers the sorted list is split into contiguous
+    chunks that are searched in parallel.
+
+    Args:
+        objects: A list of (object ID, object type, object data) tuples
+        paths: An optional mapping of object IDs to the path they were
+               found at, used to group revisions of the same file
+        window: The number of previous objects to try as bases
+        depth: The maximum length of a delta chain
+        workers: The number of parallel workers
+        use_processes: Whether to use processes instead of threads
+
+    Returns:
+        A mapping of object positions to (base position, delta)
+    """
+    paths = paths or {}
+
+    candidates = [
+        position for position, (_, obj_type, data) in enumerate(objects)
+        if obj_type in DELTA_TYPES and len(data) >= MIN_DELTA_SIZE
+    ]
+
+    def sort_key(position: int) -> Tuple[str, str, str, int]:
+        object_id, obj_type, data = objects[position]
+        path = paths.get(object_id, "")
+        return obj_type, posixpath.basename(path), path, -len(data)
+
+    candidates.sort(key=sort_key)
+    items = [(position, objects[position][2]) for position in candidates]
+
+    if workers <= 1 or len(items) < 2 * window:
+        chunks = [items]
+    else:
+        chunk_size = -(-len(items) // workers)
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    if len(chunks) == 1:
+        results = _search_delta_window(items, window, depth)
+    else:
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_search_delta_window, chunk, window, depth)
+                for chunk in chunks
+            ]
+            results = [result for future in futures for result in future.result()]
+
+    return {position: (base, delta) for position, base, delta in results}
+
+
+def write_pack(pack_dir: Union[str, Path], objects: List[Tuple[str, str, bytes]],
+               paths: Optional[Dict[str, str]] = None, window: int = 0,
+               depth: int = DEFAULT_DEPTH, workers: int = 1,
+               use_processes: bool = False) -> Path:
+    """
+    Write a list of objects into a new packfile with a v2 index.
+
+    Objects are stored in the order given, so callers control locality:
+    objects that are read together should be adjacent in the list. The
+    only exception is a delta base, which is written just before the
+    first delta that needs it if it would otherwise come later.
+
+    The pack is written under a temporary name and renamed into place,
+    and its .idx is only renamed after the .pack, so readers never see
+    a half-written pack.
+
+    Args:
+        pack_dir: The objects/pack directory
+        objects: A list of (object ID, object type, object data) tuples
+        paths: An optional mapping of object IDs to paths (see find_delta_bases)
+        window: The delta search window; 0 disables delta compression
+        depth: The maximum length of a delta chain
+        workers: The number of parallel delta search workers
+        use_processes: Whether the delta search uses processes instead of threads
+
+    Returns:
+        The path to the new .pack file
+    """
+    pack_dir = Path(pack_dir)
+    pack_dir.mkdir(parents=True, exist_ok=True)
+
+    deltas = {}
+    if window > 0:
+        deltas = find_delta_bases(objects, paths, window, depth, workers, use_processes)
+
+    tmp_pack = pack_dir / f"tmp_pack_{os.getpid()}"
+    tmp_index = pack_dir / f"tmp_idx_{os.getpid()}"
+
+    checksum = hashlib.sha1()
+    index_entries = []
+    offsets: Dict[int, int] = {}
+    offset = 0
+
+    with open(tmp_pack, "wb") as f:
+        def emit(chunk: bytes) -> None:
+            nonlocal offset
+            f.write(chunk)
+            checksum.update(chunk)
+            offset += len(chunk)
+
+        def write_entry(position: int) -> None:
+            if position in offsets:
+                return
+
+            object_id, obj_type, data = objects[position]
+
+            if position in deltas:
+                base_position, delta = deltas[position]
+                write_entry(base_position)
+                entry = (
+                    encode_entry_header(OBJ_OFS_DELTA, len(delta)) +
+                    encode_base_distance(offset - offsets[base_position]) +
+                    zlib.compress(delta)
+                )
+            else:
+                entry = encode_entry_header(TYPE_NUMBERS[obj_type], len(data)) + zlib.compress(data)
+
+            offsets[position] = offset
+            index_entries.append((bytes.fromhex(object_id), offset, zlib.crc32(entry)))
+            emit(entry)
+
+        emit(struct.pack(">4sLL", Pack.SIGNATURE, Pack.VERSION, len(objects)))
+
+        for position in range(len(objects)):
+            write_entry(position)
+
+        pack_checksum = checksum.digest()
+        f.write(pack_checksum)
+
+    write_pack_index(tmp_index, index_entries, pack_checksum)
+
+    name = f"pack-{pack_checksum.hex()}"
+    pack_path = pack_dir / f"{name}.pack"
+    os.replace(tmp_pack, pack_path)
+    os.replace(tmp_index, pack_dir / f"{name}.idx")
+
+    return pack_path
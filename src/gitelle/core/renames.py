@@ -0,0 +1,335 @@
+"""
+Implementation of rename and copy detection.
+"""
+import heapq
+import posixpath
+import stat
+from typing import Dict, List, Tuple
+
+from gitelle.core.tree_diff import TreeChange
+
+
+# Smallest similarity (in percent) for a pair of files to count as a rename
+DEFAULT_MIN_SIMILARITY = 50
+
+# Inexact renames are only searched if the number of sources times the
+# number of destinations is at most the square of this
+DEFAULT_RENAME_LIMIT = 1000
+
+# Content is hashed in chunks ending at a newline or after this many bytes
+CHUNK_SIZE = 64
+
+# Best candidate sources kept per destination before pairing
+CANDIDATES_PER_DESTINATION = 4
+
+
+def compute_signature(data: bytes) -> Dict[int, int]:
+    """
+    Summarize content as the number of bytes in each distinct chunk.
+
+    Like Git's diffcore-delta, the content is cut after every newline and
+    every CHUNK_SIZE bytes without one, and each chunk is hashed. Two
+    files share roughly as many bytes as their signatures have in common,
+    so comparing signatures estimates similarity without diffing.
+
+    Args:
+        data: The content
+
+    Returns:
+        A dict mapping chunk hashes to the total size of those chunks
+    """
+    counts: Dict[int, int] = {}
+    lines = data.split(b"\n")
+    last = len(lines) - 1
+
+    for number, line in enumerate(lines):
+        if number < last:
+            line += b"\n"
+        elif not line:
+            break
+        if len(line) <= CHUNK_SIZE:
+            key = hash(line)
+            counts[key] = counts.get(key, 0) + len(line)
+            continue
+        for start in range(0, len(line), CHUNK_SIZE):
+            chunk = line[start:start + CHUNK_SIZE]
+            key = hash(chunk)
+            counts[key] = counts.get(key, 0) + len(chunk)
+
+    return counts
+
+
+def estimate_similarity(source: Dict[int, int], source_size: int,
+                        destination: Dict[int, int], destination_size: int) -> int:
+    """
+    Estimate how much of two files' content is the same.
+
+    Args:
+        source: The signature of the first file
+        source_size: The size of the first file
+        destination: The signature of the second file
+        destination_size: The size of the second file
+
+    Returns:
+        The bytes the files have in common, as a percentage of the larger one
+    """
+    max_size = max(source_size, destination_size)
+    if max_size == 0:
+        return 100
+
+    if len(source) > len(destination):
+        source, destination = destination, source
+    copied = 0
+    for key, count in source.items():
+        other = destination.get(key)
+        if other is not None:
+            copied += min(count, other)
+
+    return copied * 100 // max_size
+
+
+class RenameDetector:
+    """
+    Pairs deleted (or modified) files with the added files they became.
+
+    Exact renames are found first by joining the blob IDs of both sides,
+    which costs time linear in the number of changes. The remaining
+    files are compared pairwise by their chunk signatures, skipping pairs
+    whose sizes alone rule out enough similarity. Since that step is
+    quadratic, it's skipped when there are more than rename_limit squared
+    pairs; needed_limit then tells how high the limit would have to be.
+
+    Attributes:
+        repo: The repository
+        min_similarity: The smallest similarity (in percent) of a rename
+        rename_limit: The limit on the pairs for inexact detection (see
+                      DEFAULT_RENAME_LIMIT), or 0 for no limit
+        find_copies: Whether to also look for copies of modified files and
+                     of files that were renamed already
+        needed_limit: The limit the last detection would have needed for
+                      inexact detection, or 0 if it wasn't skipped
+    """
+
+    def __init__(self, repo, min_similarity: int = DEFAULT_MIN_SIMILARITY,
+                 rename_limit: int = DEFAULT_RENAME_LIMIT, find_copies: bool = False):
+        """
+        Initialize a rename detector.
+
+        Args:
+            repo: The repository
+            min_similarity: The smallest similarity (in percent) of a rename
+            rename_limit: The limit on the pairs for inexact detection,
+                          or 0 for no limit
+            find_copies: Whether to also detect copies
+        """
+        self.repo = repo
+        self.min_similarity = min_similarity
+        self.rename_limit = rename_limit
+        self.find_copies = find_copies
+        self.needed_limit = 0
+        self._signatures: Dict[str, Tuple[Dict[int, int], int]] = {}
+
+    def detect(self, changes: List[TreeChange]) -> List[TreeChange]:
+        """
+        Turn the added files that were renamed or copied into "R" and "C" changes.
+
+        Deletions that became renames are dropped; everything else is
+        returned in its original order.
+
+        Args:
+            changes: The changes between two trees (or a tree and the index)
+
+        Returns:
+            The changes with renames and copies
+        """
+        self.needed_limit = 0
+        sources = [change for change in changes
+                   if change.status == "D" or (self.find_copies and change.status == "M")]
+        sources = [change for change in sources if self._is_file(change.old_mode)]
+        destinations = [i for i, change in enumerate(changes)
+                        if change.status == "A" and self._is_file(change.new_mode)]
+        if not sources or not destinations:
+            return list(changes)
+
+        # The source and similarity of each paired destination, by position
+        pairs: Dict[int, Tuple[TreeChange, int]] = {}
+        used = set()
+        self._find_exact(changes, sources, destinations, pairs, used)
+
+        remaining = [i for i in destinations if i not in pairs]
+        unused = [source for source in sources if id(source) not in used or self.find_copies]
+        if remaining and unused:
+            if self.rename_limit > 0 and len(remaining) * len(unused) > self.rename_limit ** 2:
+                self.needed_limit = max(len(remaining), len(unused))
+            else:
+                self._find_inexact(changes, unused, remaining, pairs, used)
+
+        return self._apply(changes, pairs)
+
+    @staticmethod
+    def _is_file(mode: int) -> bool:
+        """Check whether a mode is that of a regular file or a symlink."""
+        return stat.S_ISREG(mode) or stat.S_ISLNK(mode)
+
+    @staticmethod
+    def _same_type(source: TreeChange, destination: TreeChange) -> bool:
+        """Check that a file isn't paired with a symlink."""
+        return stat.S_IFMT(source.old_mode) == stat.S_IFMT(destination.new_mode)
+
+    def _find_exact(self, changes: List[TreeChange], sources: List[TreeChange],
+                    destinations: List[int], pairs: Dict[int, Tuple[TreeChange, int]],
+                    used: set) -> None:
+        """
+        Pair destinations with sources that have the same blob ID.
+
+        A destination prefers an unused source with the same file name.
+
+        Args:
+            changes: All changes
+            sources: The possible sources
+            destinations: The positions of the possible destinations
+            pairs: The pairs found, by destination position
+            used: The IDs of the sources paired so far
+        """
+        by_id: Dict[str, List[TreeChange]] = {}
+        for source in sources:
+            by_id.setdefault(source.old_id, []).append(source)
+
+        for i in destinations:
+            destination = changes[i]
+            candidates = [source for source in by_id.get(destination.new_id, ())
+                          if self._same_type(source, destination)]
+            if not candidates:
+                continue
+
+            name = posixpath.basename(destination.path)
+            candidates.sort(key=lambda source: (id(source) in used,
+                                                posixpath.basename(source.path) != name))
+            best = candidates[0]
+            if id(best) in used and not self.find_copies:
+                continue
+            pairs[i] = (best, 100)
+            used.add(id(best))
+
+    def _find_inexact(self, changes: List[TreeChange], sources: List[TreeChange],
+                      destinations: List[int], pairs: Dict[int, Tuple[TreeChange, int]],
+                      used: set) -> None:
+        """
+        Pair destinations with the most similar sources.
+
+        Every destination keeps its best CANDIDATES_PER_DESTINATION
+        sources; the candidates are then paired best first, each source
+        being renamed at most once. With find_copies, a second round pairs
+        the destinations left with sources used already.
+
+        Args:
+            changes: All changes
+            sources: The possible sources
+            destinations: The positions of the possible destinations
+            pairs: The pairs found, by destination position
+            used: The IDs of the sources paired so far
+        """
+        sizes = [self._size(source.old_id) for source in sources]
+        candidates = []
+
+        for i in destinations:
+            destination = changes[i]
+            destination_size = self._size(destination.new_id)
+            name = posixpath.basename(destination.path)
+            scores = []
+
+            for j, source in enumerate(sources):
+                if not self._same_type(source, destination):
+                    continue
+                # Files whose sizes differ too much can't be similar enough
+                max_size = max(sizes[j], destination_size)
+                if max_size == 0 or (abs(sizes[j] - destination_size) * 100 >
+                                     (100 - self.min_similarity) * max_size):
+                    continue
+
+                source_signature, _ = self._signature(source.old_id)
+                destination_signature, _ = self._signature(destination.new_id)
+                similarity = estimate_similarity(source_signature, sizes[j],
+                                                 destination_signature, destination_size)
+                if similarity >= self.min_similarity:
+                    same_name = posixpath.basename(source.path) == name
+                    scores.append((similarity, same_name, -j))
+
+            for similarity, same_name, j in heapq.nlargest(CANDIDATES_PER_DESTINATION, scores):
+                candidates.append((-similarity, not same_name, i, -j))
+
+        candidates.sort()
+        for copies in ((False, True) if self.find_copies else (False,)):
+            for similarity, _, i, j in candidates:
+                source = sources[j]
+                if i in pairs or (id(source) in used and not copies):
+                    continue
+                pairs[i] = (source, -similarity)
+                used.add(id(source))
+
+    def _apply(self, changes: List[TreeChange],
+               pairs: Dict[int, Tuple[TreeChange, int]]) -> List[TreeChange]:
+        """
+        Build the changes with the pairs found.
+
+        The first pairing of a deleted file is a rename; later ones, and
+        pairings of modified files, are copies.
+
+        Args:
+            changes: All changes
+            pairs: The pairs found, by destination position
+
+        Returns:
+            The changes with renames and copies
+        """
+        renamed = set()
+        replaced = {}
+        for i in sorted(pairs):
+            source, similarity = pairs[i]
+            destination = changes[i]
+            status = "C"
+            if source.status == "D" and id(source) not in renamed:
+                status = "R"
+                renamed.add(id(source))
+            replaced[i] = TreeChange(status, destination.path, source.old_mode, source.old_id,
+                                     destination.new_mode, destination.new_id,
+                                     old_path=source.path, similarity=similarity)
+
+        return [replaced.get(i, change) for i, change in enumerate(changes)
+                if id(change) not in renamed]
+
+    def _size(self, blob_id: str) -> int:
+        """Get the size of a blob without reading it."""
+        if blob_id in self._signatures:
+            return self._signatures[blob_id][1]
+        _, size = self.repo.object_store.info(blob_id)
+        return size
+
+    def _signature(self, blob_id: str) -> Tuple[Dict[int, int], int]:
+        """Get the signature and size of a blob, computing it once."""
+        signature = self._signatures.get(blob_id)
+        if signature is None:
+            _, data = self.repo.object_store.read_raw(blob_id)
+            signature = self._signatures[blob_id] = (compute_signature(data), len(data))
+        return signature
+
+
+def detect_renames(repo, changes: List[TreeChange], min_similarity: int = DEFAULT_MIN_SIMILARITY,
+                   rename_limit: int = DEFAULT_RENAME_LIMIT,
+                   find_copies: bool = False) -> List[TreeChange]:
+    """
+    Detect renames (and copies) among the changes between two trees.
+
+    Args:
+        repo: The repository
+        changes: The changes
+        min_similarity: The smallest similarity (in percent) of a rename
+        rename_limit: The limit on the pairs for inexact detection, or 0
+                      for no limit
+        find_copies: Whether to also detect copies
+
+    Returns:
+        The changes with renames and copies
+    """
+    detector = RenameDetector(repo, min_similarity, rename_limit, find_copies)
+    return detector.detect(changes)
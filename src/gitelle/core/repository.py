@@ -7,10 +7,14 @@ import time
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple, Union
 
+from gitelle.core.cache import ObjectCache
 from gitelle.core.index import Index
 from gitelle.core.objects import Blob, Commit, GitObject, Tree
 from gitelle.core.refs import BranchReference, Reference, TagReference
+from gitelle.core.store import ObjectStore
+from gitelle.utils.config import Config
 from gitelle.utils.filesystem import ensure_directory_exists
+from gitelle.utils.ignore import IgnoreMatcher
 
 
 class Repository:
@@ -41,10 +45,17 @@ class Repository:
         self.refs_dir = self.gitelle_dir / "refs"
         self.index_file = self.gitelle_dir / "index"
         self.head_file = self.gitelle_dir / "HEAD"
+        self.config_file = self.gitelle_dir / "config"
+        self.exclude_file = self.gitelle_dir / "info" / "exclude"
         
         # These will be lazily loaded when needed
+        self._config = None
         self._index = None
         self._head = None
+        self._object_store = None
+        
+        # Parsed objects, shared by every caller of get_object
+        self.object_cache = ObjectCache()
     
     @classmethod
     def init(cls, path: Union[str, Path]) -> "Repository":
@@ -63,6 +74,7 @@ class Repository:
         # Create the directory structure
         ensure_directory_exists(repo.gitelle_dir)
         ensure_directory_exists(repo.objects_dir)
+        ensure_directory_exists(repo.objects_dir / "pack")
         ensure_directory_exists(repo.refs_dir)
         ensure_directory_exists(repo.refs_dir / "heads")
         ensure_directory_exists(repo.refs_dir / "tags")
@@ -106,6 +118,13 @@ class Repository:
             
             current_path = current_path.parent
     
+    @property
+    def config(self) -> Config:
+        """Get the repository configuration (.gitelle/config)."""
+        if self._config is None:
+            self._config = Config(self.config_file)
+        return self._config
+    
     @property
     def index(self) -> Index:
         """Get the repository index (staging area)."""
@@ -120,10 +139,34 @@ class Repository:
             self._head = Reference(self, "HEAD")
         return self._head
     
+    @property
+    def object_store(self) -> ObjectStore:
+        """Get the repository's object store (loose objects and packs)."""
+        if self._object_store is None:
+            self._object_store = ObjectStore(self.objects_dir)
+        return self._object_store
+    
+    def get_ignore_matcher(self) -> IgnoreMatcher:
+        """
+        Get a matcher for the ignored files of the working tree.
+        
+        The matcher combines the .gitignore files of the working tree with
+        .gitelle/info/exclude. It caches the .gitignore files it reads, so
+        get a new one for each operation.
+        
+        Returns:
+            A new IgnoreMatcher instance
+        """
+        return IgnoreMatcher(self.path, self.exclude_file)
+    
     def get_object(self, object_id: str) -> Union[Blob, Tree, Commit]:
         """
         Retrieve an object from the repository by its ID.
         
+        Parsed objects are kept in `object_cache`, so repeated lookups of
+        hot trees and commits skip decompression and parsing. The returned
+        object may be shared with other callers and must not be modified.
+        
         Args:
             object_id: The ID of the object to retrieve
         
@@ -133,10 +176,19 @@ class Repository:
         Raises:
             ValueError: If the object is not found or has an invalid type
         """
+        obj = self.object_cache.get(object_id)
+        if obj is not None:
+            return obj
+        
         try:
-            return GitObject.read(self, object_id)
+            obj_type, data = self.object_store.read_raw(object_id)
+            obj = GitObject.from_data(self, obj_type, data)
         except Exception as e:
             raise ValueError(f"Failed to read object {object_id}: {e}")
+        
+        obj._id = object_id
+        self.object_cache.put(object_id, obj, len(data))
+        return obj
     
     def create_blob(self, data: bytes) -> str:
         """
@@ -265,6 +317,9 @@ class Repository:
         if not tree_id:
             raise ValueError("Nothing to commit (empty index)")
         
+        # Persist the updated cache-tree
+        self.index.write()
+        
         # Create the commit
         commit = Commit(self)
         commit.tree_id = tree_id
@@ -368,7 +423,7 @@ class Repository:
         # 3. Setting file permissions
         
         # Update the index to match the tree
-        self.index.entries.clear()
+        self.index.clear()
         # In a real implementation, we would populate the index from the tree
         self.index.write()
     
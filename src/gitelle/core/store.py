@@ -0,0 +1,318 @@
+"""
+Implementation of the GitEllE object store (loose objects and packs).
+"""
+import hashlib
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple, Union
+
+from gitelle.core.pack import Pack, find_packs
+from gitelle.core.stream import STREAM_CHUNK_SIZE, ObjectStream, open_inflate_stream
+from gitelle.utils.compression import decompress_data
+
+
+# Number of compressed bytes read at a time when only the header is needed
+HEADER_READ_SIZE = 256
+
+
+class ObjectStore:
+    """
+    Represents the object database of a repository.
+
+    Objects are looked up in the packfiles under objects/pack first and
+    then as loose, individually compressed files under objects/xx/yyyy.
+
+    Attributes:
+        objects_dir: The path to the objects directory
+        pack_dir: The path to the objects/pack directory
+    """
+
+    def __init__(self, objects_dir: Union[str, Path]):
+        """
+        Initialize an object store.
+
+        Args:
+            objects_dir: The path to the objects directory
+        """
+        self.objects_dir = Path(objects_dir)
+        self.pack_dir = self.objects_dir / "pack"
+
+        # Packs are opened lazily on first lookup
+        self._packs = None
+        self._pack_dir_mtime = None
+
+    @property
+    def packs(self) -> List[Pack]:
+        """Get the packs in the store, opening them if necessary."""
+        if self._packs is None:
+            self._load_packs()
+        return self._packs
+
+    def refresh(self) -> None:
+        """Re-scan the pack directory, e.g. after a repack."""
+        self.close()
+        self._load_packs()
+
+    def loose_path(self, object_id: str) -> Path:
+        """
+        Get the path to a loose object.
+
+        Args:
+            object_id: The object ID
+
+        Returns:
+            The path to the loose object file
+        """
+        return self.objects_dir / object_id[:2] / object_id[2:]
+
+    def contains(self, object_id: str) -> bool:
+        """
+        Check whether an object exists in the store.
+
+        Args:
+            object_id: The object ID
+
+        Returns:
+            True if the object is packed or loose, False otherwise
+        """
+        if self._find_pack(object_id) is not None:
+            return True
+        return self.loose_path(object_id).exists()
+
+    def read_raw(self, object_id: str) -> Tuple[str, bytes]:
+        """
+        Read the type and data of an object.
+
+        Args:
+            object_id: The object ID
+
+        Returns:
+            A tuple of (object type, object data)
+
+        Raises:
+            ValueError: If the object does not exist or has an invalid format
+        """
+        pack = self._find_pack(object_id)
+        if pack is not None:
+            return pack.read_object(bytes.fromhex(object_id))
+
+        object_path = self.loose_path(object_id)
+        if not object_path.exists():
+            raise ValueError(f"Object {object_id} does not exist")
+
+        with open(object_path, 'rb') as f:
+            raw_data = decompress_data(f.read())
+
+        # Parse the "<type> <size>\0" header
+        null_index = raw_data.index(b'\x00')
+        header = raw_data[:null_index].decode()
+        obj_type, _ = header.split(' ', 1)
+
+        return obj_type, raw_data[null_index + 1:]
+
+    def info(self, object_id: str) -> Tuple[str, int]:
+        """
+        Get the type and size of an object without reading its data.
+
+        Loose objects only have their first few bytes inflated to parse
+        the "<type> <size>\\0" header; packed objects are answered from
+        the pack entry headers.
+
+        Args:
+            object_id: The object ID
+
+        Returns:
+            A tuple of (object type, object size)
+
+        Raises:
+            ValueError: If the object does not exist or has an invalid format
+        """
+        pack = self._find_pack(object_id)
+        if pack is not None:
+            return pack.read_info(bytes.fromhex(object_id))
+
+        object_path = self.loose_path(object_id)
+        if not object_path.exists():
+            raise ValueError(f"Object {object_id} does not exist")
+
+        with open(object_path, 'rb') as f:
+            stream = open_inflate_stream(lambda: f.read(HEADER_READ_SIZE))
+            return stream.type, stream.size
+
+    def open_stream(self, object_id: str) -> ObjectStream:
+        """
+        Open a file-like stream over an object's data.
+
+        The data is inflated incrementally as it is read, so callers that
+        copy it in fixed-size chunks (e.g. to a file) use bounded memory.
+
+        Args:
+            object_id: The object ID
+
+        Returns:
+            An ObjectStream; close it (or use it as a context manager)
+            when done
+
+        Raises:
+            ValueError: If the object does not exist or has an invalid format
+        """
+        pack = self._find_pack(object_id)
+        if pack is not None:
+            return pack.open_stream(bytes.fromhex(object_id))
+
+        object_path = self.loose_path(object_id)
+        if not object_path.exists():
+            raise ValueError(f"Object {object_id} does not exist")
+
+        f = open(object_path, 'rb')
+        try:
+            return open_inflate_stream(lambda: f.read(STREAM_CHUNK_SIZE), on_close=f.close)
+        except BaseException:
+            f.close()
+            raise
+
+    def hash_stream(self, obj_type: str, size: int, stream: BinaryIO) -> str:
+        """
+        Compute the ID of an object without storing it.
+
+        Args:
+            obj_type: The object type
+            size: The size of the object data
+            stream: A binary file object positioned at the object data
+
+        Returns:
+            The object ID
+
+        Raises:
+            ValueError: If the stream does not contain exactly `size` bytes
+        """
+        sha = hashlib.sha1(f"{obj_type} {size}".encode() + b'\x00')
+        remaining = size
+
+        while True:
+            chunk = stream.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            sha.update(chunk)
+
+        if remaining != 0:
+            raise ValueError("Object data changed size while being read")
+
+        return sha.hexdigest()
+
+    def write_stream(self, obj_type: str, size: int, stream: BinaryIO) -> str:
+        """
+        Store an object as a loose object, streaming its data.
+
+        Because the size is known up front, the "<type> <size>\\0" header
+        is hashed and compressed first and the data follows in fixed-size
+        chunks, so memory use is constant regardless of the object size.
+        The compressed data goes to a temporary file that is renamed into
+        place once the object ID is known.
+
+        Args:
+            obj_type: The object type
+            size: The size of the object data
+            stream: A binary file object positioned at the object data
+
+        Returns:
+            The object ID
+
+        Raises:
+            ValueError: If the stream does not contain exactly `size` bytes
+        """
+        header = f"{obj_type} {size}".encode() + b'\x00'
+        sha = hashlib.sha1(header)
+        compressor = zlib.compressobj()
+        remaining = size
+
+        fd, tmp_path = tempfile.mkstemp(prefix="tmp_obj_", dir=self.objects_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(compressor.compress(header))
+
+                while True:
+                    chunk = stream.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    sha.update(chunk)
+                    f.write(compressor.compress(chunk))
+
+                f.write(compressor.flush())
+
+            if remaining != 0:
+                raise ValueError("Object data changed size while being read")
+
+            object_id = sha.hexdigest()
+            if self.contains(object_id):
+                os.unlink(tmp_path)
+                return object_id
+
+            object_path = self.loose_path(object_id)
+            object_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, object_path)
+            return object_id
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def close(self) -> None:
+        """Close all open packs."""
+        if self._packs:
+            for pack in self._packs:
+                pack.close()
+        self._packs = None
+
+    def _find_pack(self, object_id: str) -> Optional[Pack]:
+        """
+        Find the pack containing an object.
+
+        If the object is not found and the pack directory changed since it
+        was last scanned (another process repacked), the packs are reloaded
+        and the lookup is retried once.
+
+        Args:
+            object_id: The object ID
+
+        Returns:
+            The pack containing the object, or None
+        """
+        try:
+            raw_id = bytes.fromhex(object_id)
+        except ValueError:
+            return None
+
+        if len(raw_id) != 20:
+            return None
+
+        for pack in self.packs:
+            if raw_id in pack:
+                return pack
+
+        if self._pack_dir_mtime != self._get_pack_dir_mtime():
+            self.refresh()
+            for pack in self._packs:
+                if raw_id in pack:
+                    return pack
+
+        return None
+
+    def _load_packs(self) -> None:
+        """Open every pack in the pack directory."""
+        self._pack_dir_mtime = self._get_pack_dir_mtime()
+        self._packs = [Pack(path) for path in find_packs(self.pack_dir)]
+
+    def _get_pack_dir_mtime(self) -> Optional[int]:
+        """Get the modification time of the pack directory, if it exists."""
+        try:
+            return os.stat(self.pack_dir).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def __repr__(self) -> str:
+        return f"ObjectStore({self.objects_dir})"
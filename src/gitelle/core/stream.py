@@ -0,0 +1,181 @@
+"""
+Implementation of streaming object readers.
+"""
+import zlib
+from typing import Callable, Iterator, Optional
+
+
+# Size of the chunks returned when iterating over a stream
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ObjectStream:
+    """
+    A read-only, file-like view of an object's data.
+
+    Data is inflated on demand with `zlib.decompressobj`, never more than
+    the caller asked for, so reading an object of any size in fixed-size
+    chunks uses a bounded amount of memory.
+
+    Attributes:
+        type: The object type
+        size: The size of the object data
+    """
+
+    def __init__(self, obj_type: str, size: int,
+                 read_compressed: Optional[Callable[[], bytes]] = None,
+                 decompressor=None, pending: bytes = b"",
+                 on_close: Optional[Callable[[], None]] = None):
+        """
+        Initialize a stream.
+
+        Args:
+            obj_type: The object type
+            size: The size of the object data
+            read_compressed: A callable returning the next chunk of
+                             compressed input (b"" at the end)
+            decompressor: The decompressor the input is fed to
+            pending: Already inflated data that precedes the rest
+            on_close: A callable invoked when the stream is closed
+        """
+        self.type = obj_type
+        self.size = size
+        self._read_compressed = read_compressed
+        self._decompressor = decompressor
+        self._pending = pending
+        self._pending_offset = 0
+        self._remaining = size
+        self._on_close = on_close
+
+    @classmethod
+    def from_bytes(cls, obj_type: str, data: bytes) -> "ObjectStream":
+        """
+        Create a stream over data that is already in memory.
+
+        Args:
+            obj_type: The object type
+            data: The object data
+
+        Returns:
+            A new ObjectStream instance
+        """
+        return cls(obj_type, len(data), pending=data)
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Read up to `size` bytes of object data.
+
+        Args:
+            size: The maximum number of bytes to read (-1 reads everything)
+
+        Returns:
+            The data read; b"" at the end of the object
+
+        Raises:
+            ValueError: If the object data is truncated
+        """
+        if size is None or size < 0:
+            return b"".join(iter(lambda: self.read(STREAM_CHUNK_SIZE), b""))
+
+        size = min(size, self._remaining)
+        if size == 0:
+            return b""
+
+        # Pending data is consumed through an offset rather than re-sliced,
+        # so reading a large in-memory object in chunks stays linear
+        if self._pending_offset >= len(self._pending):
+            self._pending = self._inflate(size)
+            self._pending_offset = 0
+            if not self._pending:
+                raise ValueError("Object data is truncated")
+
+        start = self._pending_offset
+        chunk = self._pending[start:start + size]
+        self._pending_offset = start + len(chunk)
+        self._remaining -= len(chunk)
+        return chunk
+
+    def _inflate(self, limit: int) -> bytes:
+        """
+        Inflate up to `limit` more bytes.
+
+        Args:
+            limit: The maximum number of bytes to return
+
+        Returns:
+            The inflated data, or b"" if the input is exhausted
+        """
+        decompressor = self._decompressor
+        if decompressor is None:
+            return b""
+
+        while not decompressor.eof:
+            data = decompressor.unconsumed_tail
+            if not data:
+                data = self._read_compressed()
+                if not data:
+                    break
+
+            output = decompressor.decompress(data, limit)
+            if output:
+                return output
+
+        return b""
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(lambda: self.read(STREAM_CHUNK_SIZE), b"")
+
+    def close(self) -> None:
+        """Release the underlying file, if any."""
+        if self._on_close is not None:
+            self._on_close()
+            self._on_close = None
+        self._decompressor = None
+        self._pending = b""
+        self._pending_offset = 0
+
+    def __enter__(self) -> "ObjectStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"ObjectStream({self.type}, {self.size})"
+
+
+def open_inflate_stream(read_compressed: Callable[[], bytes],
+                        on_close: Optional[Callable[[], None]] = None) -> ObjectStream:
+    """
+    Open a stream over a loose object's "<type> <size>\\0<data>" zlib stream.
+
+    Only enough data to parse the header is inflated up front.
+
+    Args:
+        read_compressed: A callable returning the next chunk of compressed input
+        on_close: A callable invoked when the stream is closed
+
+    Returns:
+        A new ObjectStream instance
+
+    Raises:
+        ValueError: If the header is invalid
+    """
+    decompressor = zlib.decompressobj()
+    header = b""
+
+    while b"\x00" not in header:
+        data = decompressor.unconsumed_tail or read_compressed()
+        if not data:
+            raise ValueError("Object header is truncated")
+        header += decompressor.decompress(data, 64)
+        if len(header) > 64 and b"\x00" not in header:
+            raise ValueError("Object header is invalid")
+
+    null_index = header.index(b"\x00")
+    obj_type, size = header[:null_index].decode().split(" ", 1)
+
+    return ObjectStream(
+        obj_type, int(size), read_compressed, decompressor,
+        pending=header[null_index + 1:], on_close=on_close
+    )
@@ -0,0 +1,169 @@
+"""
+Implementation of tree-to-tree diffs.
+"""
+import stat
+from typing import Iterator, List, Optional, Sequence
+
+from gitelle.core.objects import TreeEntry
+
+
+class TreeChange:
+    """
+    Represents a file that differs between two trees.
+
+    Attributes:
+        status: "A" (only in the new tree), "D" (only in the old tree),
+                "M" (content or mode differs), or "R" or "C" (renamed or
+                copied from old_path, see gitelle.core.renames)
+        path: The path of the file
+        old_mode: The mode in the old tree, or 0 for "A"
+        old_id: The blob ID in the old tree, or None for "A"
+        new_mode: The mode in the new tree, or 0 for "D"
+        new_id: The blob ID in the new tree, or None for "D"
+        old_path: The path in the old tree; differs from path only for
+                  "R" and "C"
+        similarity: The percentage of the content kept by a rename or
+                    copy (0 otherwise)
+    """
+
+    __slots__ = ("status", "path", "old_mode", "old_id", "new_mode", "new_id", "old_path",
+                 "similarity")
+
+    def __init__(self, status: str, path: str, old_mode: int, old_id: Optional[str],
+                 new_mode: int, new_id: Optional[str], old_path: Optional[str] = None,
+                 similarity: int = 0):
+        self.status = status
+        self.path = path
+        self.old_mode = old_mode
+        self.old_id = old_id
+        self.new_mode = new_mode
+        self.new_id = new_id
+        self.old_path = path if old_path is None else old_path
+        self.similarity = similarity
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, TreeChange):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        if self.old_path != self.path:
+            return f"TreeChange({self.status}, {self.old_path} -> {self.path})"
+        return f"TreeChange({self.status}, {self.path})"
+
+
+def iter_tree_changes(repo, old_tree_id: Optional[str], new_tree_id: Optional[str],
+                      paths: Optional[Sequence[str]] = None, prefix: str = "") -> Iterator[TreeChange]:
+    """
+    Compare two trees, yielding the files that differ.
+
+    Both trees are walked in lockstep in Git's tree order. Entries with
+    the same ID are skipped without reading them, so an unchanged
+    subtree costs one comparison however large it is, and comparing two
+    commits costs time proportional to what changed between them. Trees
+    are only read as the changes are consumed.
+
+    Args:
+        repo: The repository
+        old_tree_id: The ID of the old tree, or None for an empty tree
+        new_tree_id: The ID of the new tree, or None for an empty tree
+        paths: The paths (files or directories) to compare, or None for all
+        prefix: The path of both trees followed by "/", prepended to the
+                reported paths ("" for the root)
+
+    Yields:
+        TreeChange objects, in Git's tree order
+    """
+    if old_tree_id == new_tree_id:
+        return
+
+    pathspec = [path.strip("/") for path in paths] if paths else None
+    yield from _diff_trees(repo, old_tree_id, new_tree_id, prefix, pathspec)
+
+
+def _diff_trees(repo, old_tree_id: Optional[str], new_tree_id: Optional[str], prefix: str,
+                pathspec: Optional[List[str]]) -> Iterator[TreeChange]:
+    """
+    Compare two directories.
+
+    Args:
+        repo: The repository
+        old_tree_id: The ID of the old directory's tree, or None
+        new_tree_id: The ID of the new directory's tree, or None
+        prefix: The directory path followed by "/" ("" for the root)
+        pathspec: The paths to compare, or None for all
+
+    Yields:
+        TreeChange objects, in Git's tree order
+    """
+    old_entries = _read_entries(repo, old_tree_id)
+    new_entries = _read_entries(repo, new_tree_id)
+    i = j = 0
+
+    while i < len(old_entries) or j < len(new_entries):
+        old = old_entries[i] if i < len(old_entries) else None
+        new = new_entries[j] if j < len(new_entries) else None
+
+        if old is not None and new is not None:
+            old_key, new_key = old.sort_key, new.sort_key
+            if old_key == new_key:
+                i += 1
+                j += 1
+                if old.raw_id == new.raw_id and old.mode == new.mode:
+                    continue
+            elif old_key < new_key:
+                new = None
+                i += 1
+            else:
+                old = None
+                j += 1
+        elif old is not None:
+            i += 1
+        else:
+            j += 1
+
+        entry = old if old is not None else new
+        path = prefix + entry.name
+        is_dir = stat.S_ISDIR(int(entry.mode, 8))
+        if pathspec is not None and not _matches(path, is_dir, pathspec):
+            continue
+
+        if is_dir:
+            yield from _diff_trees(
+                repo, old.id if old is not None else None, new.id if new is not None else None,
+                path + "/", pathspec
+            )
+        elif new is None:
+            yield TreeChange("D", path, int(old.mode, 8), old.id, 0, None)
+        elif old is None:
+            yield TreeChange("A", path, 0, None, int(new.mode, 8), new.id)
+        else:
+            yield TreeChange("M", path, int(old.mode, 8), old.id, int(new.mode, 8), new.id)
+
+
+def _read_entries(repo, tree_id: Optional[str]) -> List[TreeEntry]:
+    """Get the entries of a tree, or none if there is no tree."""
+    if tree_id is None:
+        return []
+    return repo.get_object(tree_id).entries
+
+
+def _matches(path: str, is_dir: bool, pathspec: List[str]) -> bool:
+    """
+    Check whether an entry is selected by a pathspec.
+
+    Args:
+        path: The path of the entry
+        is_dir: Whether the entry is a directory
+        pathspec: The selected paths
+
+    Returns:
+        True if the entry or (for a directory) something below it is
+        selected, False otherwise
+    """
+    for selected in pathspec:
+        if selected in ("", ".") or path == selected or path.startswith(selected + "/"):
+            return True
+        if is_dir and selected.startswith(path + "/"):
+            return True
+    return False
@@ -0,0 +1,341 @@
+"""
+Implementation of the untracked-cache index extension.
+"""
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Container, Dict, Iterable, List, Optional, Tuple, Union
+
+from gitelle.utils.ignore import IGNORE_FILE, IgnoreMatcher
+
+
+# Signature of the untracked-cache extension in the index file
+SIGNATURE = b"UNTR"
+
+# Per-directory header: mtime (ns), inode, .gitignore mtime (ns) and size,
+# untracked count, subdirectory count
+DIR_HEADER = struct.Struct(">QQQQLL")
+
+# Length of the exclude file hash that starts the extension data
+EXCLUDE_ID_SIZE = 40
+
+# Directories modified this recently are not cached, because an entry
+# added in the same timestamp tick would not change their mtime again
+RACY_WINDOW_NS = 1_000_000_000
+
+# Directory that is never scanned
+GITELLE_DIR = ".gitelle"
+
+
+class UntrackedDir:
+    """
+    Represents the cached listing of one directory.
+
+    Attributes:
+        mtime_ns: The modification time of the directory when listed
+        ino: The inode number of the directory when listed
+        ignore_stat: The (mtime, size) of the directory's .gitignore when
+                     listed, or (0, 0) if it had none
+        untracked: The names of the untracked files in the directory
+        subdirs: The names of the subdirectories
+    """
+
+    __slots__ = ("mtime_ns", "ino", "ignore_stat", "untracked", "subdirs")
+
+    def __init__(self, mtime_ns: int, ino: int, ignore_stat: Tuple[int, int],
+                 untracked: List[str], subdirs: List[str]):
+        self.mtime_ns = mtime_ns
+        self.ino = ino
+        self.ignore_stat = ignore_stat
+        self.untracked = untracked
+        self.subdirs = subdirs
+
+    def matches_stat(self, dir_stat: os.stat_result) -> bool:
+        """Check whether the directory is unchanged since it was listed."""
+        return self.mtime_ns == dir_stat.st_mtime_ns and self.ino == dir_stat.st_ino
+
+
+class UntrackedCache:
+    """
+    Caches the untracked files of every directory of the working tree.
+
+    A directory's mtime changes whenever an entry is added to, removed
+    from or renamed in it, so a directory whose stat data still matches
+    its cached listing does not have to be read again. Finding the
+    untracked files of an unchanged tree then costs one stat() per
+    directory instead of listing every directory.
+
+    Cached listings depend on which files are tracked, so the index
+    invalidates a directory whenever a path in it is added or removed.
+    They also leave out ignored files and directories, so a directory is
+    listed again, along with everything below it, when its .gitignore
+    changes, and the whole cache is dropped when the exclude file does.
+
+    With a file system monitor, the listings of the directories it
+    reports are dropped instead, and the others are used without stat().
+
+    Attributes:
+        dirs: The cached listings, keyed by directory path ("" for the root)
+        exclude_id: The hash of the exclude file the listings were made with
+        dirty: Whether the cache changed since it was read
+    """
+
+    def __init__(self):
+        """Initialize an empty untracked cache."""
+        self.dirs: Dict[str, UntrackedDir] = {}
+        self.exclude_id = ""
+        self.dirty = False
+
+    def invalidate(self, path: str) -> None:
+        """
+        Invalidate the directory containing a path.
+
+        Args:
+            path: The path of a file that became tracked or untracked
+        """
+        if self.dirs.pop(os.path.dirname(path), None) is not None:
+            self.dirty = True
+
+    def invalidate_changed(self, paths: Iterable[str]) -> None:
+        """
+        Invalidate the listings a file system monitor's changes affect.
+
+        A changed path invalidates the listing of its directory and, if it
+        is a directory, its own listing and those below it. A changed
+        .gitignore invalidates every listing below its directory.
+
+        Args:
+            paths: The changed paths (directories may end with "/")
+        """
+        parents = set()
+        prefixes = set()
+        for path in paths:
+            path = path.rstrip("/")
+            directory, _, name = path.rpartition("/")
+            parents.add(directory)
+            prefixes.add(directory if name == IGNORE_FILE else path)
+
+        for directory in list(self.dirs):
+            ancestor = directory
+            stale = directory in parents or directory in prefixes
+            while not stale and ancestor:
+                ancestor = ancestor.rpartition("/")[0]
+                stale = ancestor in prefixes
+            if stale:
+                del self.dirs[directory]
+                self.dirty = True
+
+    def clear(self) -> None:
+        """Remove every cached listing."""
+        if self.dirs:
+            self.dirs.clear()
+            self.dirty = True
+
+    def list_untracked(self, root: Union[str, Path], tracked: Container[str],
+                       ignore: Optional[IgnoreMatcher] = None, trusted: bool = False) -> List[str]:
+        """
+        Find the untracked files in a working tree.
+
+        Args:
+            root: The root of the working tree
+            tracked: The tracked paths (e.g. the index entries)
+            ignore: The matcher deciding which files are ignored (default:
+                    nothing is ignored)
+            trusted: Whether a file system monitor has invalidated every
+                     listing that changed (see invalidate_changed()), so
+                     the remaining ones can be used without stat()
+
+        Returns:
+            The paths of the untracked files, relative to the root
+        """
+        root = str(root)
+        if ignore is None:
+            ignore = IgnoreMatcher(root)
+        if ignore.exclude_id != self.exclude_id:
+            self.clear()
+            self.exclude_id = ignore.exclude_id
+            self.dirty = True
+
+        result = []
+        pending = [("", False, False)]
+
+        while pending:
+            directory, rules_changed, racy_rules = pending.pop()
+            abs_dir = os.path.join(root, directory) if directory else root
+            prefix = directory + "/" if directory else ""
+
+            cached = self.dirs.get(directory) if trusted else None
+            if cached is not None:
+                result.extend(prefix + name for name in cached.untracked)
+                pending.extend((prefix + name, False, False) for name in reversed(cached.subdirs))
+                continue
+
+            try:
+                dir_stat = os.stat(abs_dir)
+            except OSError:
+                if self.dirs.pop(directory, None) is not None:
+                    self.dirty = True
+                continue
+
+            ignore_stat, racy_ignore = self._stat_ignore_file(abs_dir)
+            racy_rules = racy_rules or racy_ignore
+            cached = self.dirs.get(directory)
+            if cached is not None and cached.ignore_stat != ignore_stat:
+                rules_changed = True
+
+            # The listings below a directory whose rules changed are stale
+            # even if the directories themselves didn't change, and none
+            # can be trusted while a .gitignore above them is racy
+            if rules_changed or racy_rules or cached is None or not cached.matches_stat(dir_stat):
+                cached = self._scan(abs_dir, directory, dir_stat, ignore_stat,
+                                    tracked, ignore, cacheable=not racy_rules)
+
+            result.extend(prefix + name for name in cached.untracked)
+            pending.extend((prefix + name, rules_changed, racy_rules)
+                           for name in reversed(cached.subdirs))
+
+        result.sort()
+        return result
+
+    @staticmethod
+    def _stat_ignore_file(abs_dir: str) -> Tuple[Tuple[int, int], bool]:
+        """
+        Get the stat data of a directory's .gitignore.
+
+        Args:
+            abs_dir: The absolute path of the directory
+
+        Returns:
+            A tuple of ((mtime, size), whether the file was modified too
+            recently to be trusted); ((0, 0), False) if there is none
+        """
+        try:
+            ignore_stat = os.stat(os.path.join(abs_dir, IGNORE_FILE))
+        except OSError:
+            return (0, 0), False
+        racy = ignore_stat.st_mtime_ns + RACY_WINDOW_NS >= time.time_ns()
+        return (ignore_stat.st_mtime_ns, ignore_stat.st_size), racy
+
+    def _scan(self, abs_dir: str, directory: str, dir_stat: os.stat_result,
+              ignore_stat: Tuple[int, int], tracked: Container[str],
+              ignore: IgnoreMatcher, cacheable: bool = True) -> UntrackedDir:
+        """
+        List a directory and cache the result if it is safe to.
+
+        Args:
+            abs_dir: The absolute path of the directory
+            directory: The path of the directory relative to the root
+            dir_stat: The result of stat() on the directory
+            ignore_stat: The stat data of the directory's .gitignore
+            tracked: The tracked paths
+            ignore: The matcher deciding which files are ignored
+            cacheable: Whether the listing may be cached at all
+
+        Returns:
+            The listing of the directory
+        """
+        prefix = directory + "/" if directory else ""
+        untracked = []
+        subdirs = []
+
+        with os.scandir(abs_dir) as it:
+            for entry in it:
+                path = prefix + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != GITELLE_DIR and not ignore.is_ignored(path, is_dir=True):
+                        subdirs.append(entry.name)
+                elif path not in tracked and not ignore.is_ignored(path):
+                    untracked.append(entry.name)
+
+        untracked.sort()
+        subdirs.sort()
+        listing = UntrackedDir(dir_stat.st_mtime_ns, dir_stat.st_ino, ignore_stat, untracked, subdirs)
+
+        # A recently modified directory could change again within the
+        # same timestamp tick, so its listing can't be trusted later
+        if cacheable and dir_stat.st_mtime_ns + RACY_WINDOW_NS < time.time_ns():
+            self.dirs[directory] = listing
+            self.dirty = True
+        elif self.dirs.pop(directory, None) is not None:
+            self.dirty = True
+
+        return listing
+
+    def serialize(self) -> bytes:
+        """
+        Serialize the cache.
+
+        The data starts with the hex hash of the exclude file (zeros if
+        there was none). Each directory is then stored as its
+        NUL-terminated path, a DIR_HEADER and the NUL-terminated names of
+        its untracked files and subdirectories.
+
+        Returns:
+            The extension data
+        """
+        output = [(self.exclude_id or "0" * EXCLUDE_ID_SIZE).encode()]
+        for directory in sorted(self.dirs):
+            listing = self.dirs[directory]
+            output.append(directory.encode() + b"\x00")
+            output.append(DIR_HEADER.pack(
+                listing.mtime_ns, listing.ino, listing.ignore_stat[0], listing.ignore_stat[1],
+                len(listing.untracked), len(listing.subdirs)
+            ))
+            for name in listing.untracked + listing.subdirs:
+                output.append(name.encode() + b"\x00")
+        return b"".join(output)
+
+    @classmethod
+    def deserialize(cls, data: bytes) -> "UntrackedCache":
+        """
+        Deserialize a cache.
+
+        Args:
+            data: The extension data
+
+        Returns:
+            A new UntrackedCache instance
+
+        Raises:
+            ValueError: If the data is invalid
+        """
+        cache = cls()
+        if len(data) < EXCLUDE_ID_SIZE:
+            raise ValueError("Invalid untracked-cache extension: truncated header")
+        exclude_id = data[:EXCLUDE_ID_SIZE].decode(errors="replace")
+        cache.exclude_id = "" if exclude_id == "0" * EXCLUDE_ID_SIZE else exclude_id
+        offset = EXCLUDE_ID_SIZE
+
+        try:
+            while offset < len(data):
+                directory, offset = cls._read_name(data, offset)
+                (mtime_ns, ino, ignore_mtime_ns, ignore_size,
+                 untracked_count, subdir_count) = DIR_HEADER.unpack_from(data, offset)
+                offset += DIR_HEADER.size
+
+                names = []
+                for _ in range(untracked_count + subdir_count):
+                    name, offset = cls._read_name(data, offset)
+                    names.append(name)
+
+                cache.dirs[directory] = UntrackedDir(
+                    mtime_ns, ino, (ignore_mtime_ns, ignore_size),
+                    names[:untracked_count], names[untracked_count:]
+                )
+        except (struct.error, ValueError) as e:
+            raise ValueError(f"Invalid untracked-cache extension: {e}")
+
+        return cache
+
+    @staticmethod
+    def _read_name(data: bytes, offset: int) -> Tuple[str, int]:
+        """Read a NUL-terminated name; returns (name, offset after it)."""
+        end = data.index(b"\x00", offset)
+        return data[offset:end].decode(), end + 1
+
+    def __len__(self) -> int:
+        return len(self.dirs)
+
+    def __repr__(self) -> str:
+        return f"UntrackedCache({len(self.dirs)} directories)"
@@ -56,6 +56,56 @@ class Config:
         except (configparser.NoSectionError, configparser.NoOptionError):
             return default
     
+    def get_bool(self, section: str, option: str, default: bool = False) -> bool:
+        """
+        Get a boolean configuration value.
+        
+        Args:
+            section: The configuration section
+            option: The configuration option
+            default: The default value to return if the option is not found
+        
+        Returns:
+            The configuration value or the default
+        
+        Raises:
+            ValueError: If the value is not a valid boolean
+        """
+        value = self.get(section, option)
+        if value is None:
+            return default
+        
+        value = value.strip().lower()
+        if value in ("true", "yes", "on", "1"):
+            return True
+        if value in ("false", "no", "off", "0", ""):
+            return False
+        raise ValueError(f"bad boolean config value '{value}' for '{section}.{option}'")
+    
+    def get_int(self, section: str, option: str, default: int = 0) -> int:
+        """
+        Get an integer configuration value.
+        
+        Args:
+            section: The configuration section
+            option: The configuration option
+            default: The default value to return if the option is not found
+        
+        Returns:
+            The configuration value or the default
+        
+        Raises:
+            ValueError: If the value is not a valid integer
+        """
+        value = self.get(section, option)
+        if value is None:
+            return default
+        
+        try:
+            return int(value.strip())
+        except ValueError:
+            raise ValueError(f"bad numeric config value '{value}' for '{section}.{option}'")
+    
     def set(self, section: str, option: str, value: str) -> None:
         """
         Set a configuration value.
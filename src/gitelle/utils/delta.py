@@ -0,0 +1,264 @@
+"""
+Delta compression utility functions for GitEllE.
+
+Deltas use Git's pack delta format: a header holding the source and
+target sizes as little-endian base-128 varints, followed by a sequence
+of instructions. An instruction byte with the MSB set copies a range of
+the source (the low 7 bits say which offset and size bytes follow); an
+instruction byte between 1 and 127 inserts that many literal bytes.
+"""
+from typing import Dict, Tuple
+
+
+# Length of the blocks used to index the source buffer
+BLOCK_SIZE = 16
+
+# Largest copy emitted by a single instruction (matches Git's encoder)
+MAX_COPY_SIZE = 0x10000
+
+# Largest literal run emitted by a single insert instruction
+MAX_INSERT_SIZE = 0x7F
+
+
+def encode_size(size: int) -> bytes:
+    """
+    Encode a size as a little-endian base-128 varint.
+
+    Args:
+        size: The size to encode
+
+    Returns:
+        The encoded size
+    """
+    result = bytearray()
+    while True:
+        byte = size & 0x7F
+        size >>= 7
+        if size:
+            result.append(byte | 0x80)
+        else:
+            result.append(byte)
+            return bytes(result)
+
+
+def decode_size(data: bytes, offset: int) -> Tuple[int, int]:
+    """
+    Decode a little-endian base-128 varint.
+
+    Args:
+        data: The buffer containing the varint
+        offset: The offset of the varint
+
+    Returns:
+        A tuple of (size, offset after the varint)
+    """
+    size = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        size |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return size, offset
+
+
+def get_delta_sizes(delta: bytes) -> Tuple[int, int]:
+    """
+    Get the source and target sizes recorded in a delta header.
+
+    Args:
+        delta: The delta data (only the first few bytes are needed)
+
+    Returns:
+        A tuple of (source size, target size)
+    """
+    source_size, offset = decode_size(delta, 0)
+    target_size, _ = decode_size(delta, offset)
+    return source_size, target_size
+
+
+def _encode_copy(offset: int, size: int) -> bytes:
+    """
+    Encode a copy instruction.
+
+    Args:
+        offset: The offset in the source buffer
+        size: The number of bytes to copy (at most MAX_COPY_SIZE)
+
+    Returns:
+        The encoded instruction
+    """
+    command = 0x80
+    args = bytearray()
+
+    for i in range(4):
+        byte = (offset >> (8 * i)) & 0xFF
+        if byte:
+            command |= 1 << i
+            args.append(byte)
+
+    # A size of 0x10000 is encoded as zero (no size bytes)
+    if size != 0x10000:
+        for i in range(3):
+            byte = (size >> (8 * i)) & 0xFF
+            if byte:
+                command |= 0x10 << i
+                args.append(byte)
+
+    return bytes([command]) + bytes(args)
+
+
+def _match_length(source: bytes, source_offset: int, target: bytes, target_offset: int,
+                  limit: int) -> int:
+    """
+    Count how many bytes match forward from two offsets.
+
+    Args:
+        source: The source buffer
+        source_offset: The offset in the source buffer
+        target: The target buffer
+        target_offset: The offset in the target buffer
+        limit: The maximum length to check
+
+    Returns:
+        The length of the match
+    """
+    length = 0
+
+    # Compare in large steps first, then narrow down byte by byte
+    step = 256
+    while step:
+        while (length + step <= limit and
+               source[source_offset + length:source_offset + length + step] ==
+               target[target_offset + length:target_offset + length + step]):
+            length += step
+        step //= 4
+
+    return length
+
+
+def create_delta(source: bytes, target: bytes) -> bytes:
+    """
+    Create a delta that rebuilds the target from the source.
+
+    The source is indexed by its aligned BLOCK_SIZE-byte blocks. The
+    target is scanned for those blocks; every hit is extended forwards
+    (and backwards into pending literal data) and emitted as a copy,
+    everything else is emitted as inserts.
+
+    Args:
+        source: The base buffer
+        target: The buffer to encode
+
+    Returns:
+        The delta data
+    """
+    output = [encode_size(len(source)), encode_size(len(target))]
+
+    # Index the source blocks; keep the first occurrence of each block
+    blocks: Dict[bytes, int] = {}
+    for offset in range(0, len(source) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        blocks.setdefault(source[offset:offset + BLOCK_SIZE], offset)
+
+    target_length = len(target)
+    literal_start = 0
+    position = 0
+
+    def flush_literal(end: int) -> None:
+        start = literal_start
+        while start < end:
+            size = min(MAX_INSERT_SIZE, end - start)
+            output.append(bytes([size]))
+            output.append(target[start:start + size])
+            start += size
+
+    while position + BLOCK_SIZE <= target_length:
+        source_offset = blocks.get(target[position:position + BLOCK_SIZE])
+        if source_offset is None:
+            position += 1
+            continue
+
+        # Extend the match backwards into the pending literal data
+        while (source_offset > 0 and position > literal_start and
+               source[source_offset - 1] == target[position - 1]):
+            source_offset -= 1
+            position -= 1
+
+        length = _match_length(
+            source, source_offset, target, position,
+            min(len(source) - source_offset, target_length - position)
+        )
+
+        flush_literal(position)
+
+        remaining = length
+        while remaining:
+            size = min(MAX_COPY_SIZE, remaining)
+            output.append(_encode_copy(source_offset, size))
+            source_offset += size
+            remaining -= size
+
+        position += length
+        literal_start = position
+
+    flush_literal(target_length)
+    return b"".join(output)
+
+
+def apply_delta(source: bytes, delta: bytes) -> bytes:
+    """
+    Apply a delta to a source buffer.
+
+    Args:
+        source: The base buffer
+        delta: The delta data
+
+    Returns:
+        The rebuilt target buffer
+
+    Raises:
+        ValueError: If the delta is corrupt or does not match the source
+    """
+    source_size, offset = decode_size(delta, 0)
+    target_size, offset = decode_size(delta, offset)
+
+    if source_size != len(source):
+        raise ValueError("Delta source size does not match the base object")
+
+    result = bytearray()
+    delta_length = len(delta)
+
+    while offset < delta_length:
+        command = delta[offset]
+        offset += 1
+
+        if command & 0x80:
+            copy_offset = 0
+            for i in range(4):
+                if command & (1 << i):
+                    copy_offset |= delta[offset] << (8 * i)
+                    offset += 1
+
+            copy_size = 0
+            for i in range(3):
+                if command & (0x10 << i):
+                    copy_size |= delta[offset] << (8 * i)
+                    offset += 1
+            if copy_size == 0:
+                copy_size = 0x10000
+
+            if copy_offset + copy_size > source_size:
+                raise ValueError("Delta copy instruction is out of range")
+
+            result += source[copy_offset:copy_offset + copy_size]
+        elif command:
+            result += delta[offset:offset + command]
+            offset += command
+        else:
+            raise ValueError("Invalid delta instruction")
+
+    if len(result) != target_size:
+        raise ValueError("Delta result size mismatch")
+
+    return bytes(result)
@@ -1,32 +1,926 @@
 """
 Diff utility functions for GitEllE.
 """
-from typing import List, Tuple, Union
-from difflib import unified_diff
+import bisect
+from collections import Counter
+from typing import Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+
+# Number of leading bytes inspected to decide whether content is binary
+BINARY_PROBE_SIZE = 8000
+
+# Files larger than this are treated as binary without being read
+BIG_FILE_THRESHOLD = 512 * 1024 * 1024
+
+# Line diff algorithms, as named by Git's --diff-algorithm
+DIFF_ALGORITHMS = ("myers", "minimal", "patience", "histogram")
+
+# Algorithm used when neither the caller nor diff.algorithm picks one
+DEFAULT_DIFF_ALGORITHM = "myers"
+
+# Smallest number of edits Myers' search explores before it settles for a
+# non-minimal split; the limit grows with the square root of the input
+MAX_COST_MIN = 256
+
+# Edits after which Myers' search may settle for a split at a long snake
+HEURISTIC_MIN_COST = 256
+
+# Length of a snake worth settling for, and how far ahead (as a multiple
+# of the edits so far) its path must have got
+SNAKE_COUNT = 20
+HEURISTIC_FACTOR = 4
+
+# Lines with more matches than this (or the square root of the file
+# length, if smaller) count as frequent when discarding lines
+MAX_EQUAL_LIMIT = 1024
+
+# Lines examined on each side of a frequent line to decide whether to
+# discard it, and the ratio of unmatched lines that makes it discarded
+SIMILAR_SCAN_WINDOW = 100
+KEEP_FREQUENT_RUN = 4
+
+# Lines occurring more often than this in a region aren't used as
+# histogram anchors
+HISTOGRAM_MAX_CHAIN = 64
+
+# Longest function name shown in a hunk header, in bytes
+FUNCTION_NAME_SIZE = 80
+
+
+def is_binary_data(data: bytes) -> bool:
+    """
+    Check whether data looks binary, the way Git does: it contains a NUL
+    byte within its first BINARY_PROBE_SIZE bytes.
+    
+    Args:
+        data: The data (or its first BINARY_PROBE_SIZE bytes)
+    
+    Returns:
+        True if the data looks binary, False otherwise
+    """
+    return b"\x00" in data[:BINARY_PROBE_SIZE]
+
+
+def intern_lines(a_lines: Sequence[Hashable],
+                 b_lines: Sequence[Hashable]) -> Tuple[List[int], List[int]]:
+    """
+    Replace the lines of two files by integer IDs, equal lines getting
+    equal IDs, so the diff algorithms compare integers instead of strings.
+    
+    Args:
+        a_lines: Lines from the first file
+        b_lines: Lines from the second file
+    
+    Returns:
+        A tuple of (IDs of a_lines, IDs of b_lines)
+    """
+    ids: Dict[Hashable, int] = {}
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+    return a, b
+
+
+class LineDiff:
+    """
+    Finds the changed lines between two sequences of line IDs.
+    
+    The algorithms follow Git's xdiff, so the results match Git's. They
+    produce a pair of flag lists: changed_a[i] is set if line i of the
+    first file was deleted and changed_b[j] if line j of the second file
+    was added. Each list has one extra False entry at the end, which
+    also serves as the entry before the start (index -1).
+    
+    Attributes:
+        a: The line IDs of the first file
+        b: The line IDs of the second file
+        changed_a: The deleted-line flags of the first file
+        changed_b: The added-line flags of the second file
+    """
+    
+    def __init__(self, a: List[int], b: List[int]):
+        """
+        Initialize a diff with nothing marked as changed.
+        
+        Args:
+            a: The line IDs of the first file
+            b: The line IDs of the second file
+        """
+        self.a = a
+        self.b = b
+        self.changed_a = [False] * (len(a) + 1)
+        self.changed_b = [False] * (len(b) + 1)
+    
+    def run(self, algorithm: str = DEFAULT_DIFF_ALGORITHM) -> None:
+        """
+        Mark the changed lines, then compact the changes like Git does.
+        
+        Args:
+            algorithm: One of DIFF_ALGORITHMS
+        
+        Raises:
+            ValueError: If the algorithm is unknown
+        """
+        region = (0, len(self.a), 0, len(self.b))
+        if algorithm in ("myers", "minimal"):
+            self.myers(*region, minimal=algorithm == "minimal")
+        elif algorithm == "patience":
+            self.patience(*region)
+        elif algorithm == "histogram":
+            self.histogram(*region)
+        else:
+            raise ValueError(f"unknown diff algorithm '{algorithm}'")
+        
+        compact_changes(self.a, self.changed_a, self.changed_b)
+        compact_changes(self.b, self.changed_b, self.changed_a)
+    
+    def _mark(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> None:
+        """Mark every line of a region as changed."""
+        self.changed_a[a_lo:a_hi] = [True] * (a_hi - a_lo)
+        self.changed_b[b_lo:b_hi] = [True] * (b_hi - b_lo)
+    
+    def myers(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int, minimal: bool = False) -> None:
+        """
+        Diff a region with Myers' algorithm in linear space.
+        
+        The common prefix and suffix are dropped first. Lines that don't
+        occur on the other side can't be matched, so they are marked
+        right away and left out of the search, as are lines occurring
+        very often that sit among such lines; this makes files with many
+        unique changed lines (generated code, data files) cheap. The rest
+        is split recursively at the middle snake of the shortest edit
+        script. Unless minimal is set, a split whose search gets
+        expensive settles for a long snake or the furthest-reaching path
+        instead (see find_split).
+        
+        Args:
+            a_lo, a_hi: The range of lines of the first file
+            b_lo, b_hi: The range of lines of the second file
+            minimal: Whether to always find a shortest edit script
+        """
+        a, b = self.a, self.b
+        counts_a = Counter(a[a_lo:a_hi])
+        counts_b = Counter(b[b_lo:b_hi])
+        limit_a = min(bogosqrt(a_hi - a_lo), MAX_EQUAL_LIMIT)
+        limit_b = min(bogosqrt(b_hi - b_lo), MAX_EQUAL_LIMIT)
+        
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            a_lo += 1
+            b_lo += 1
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+        
+        # Classify each line: 0 = no match, 1 = some matches, 2 = many
+        a_classes = [0 if n == 0 else 2 if n >= limit_a else 1
+                     for n in (counts_b[line] for line in a[a_lo:a_hi])]
+        b_classes = [0 if n == 0 else 2 if n >= limit_b else 1
+                     for n in (counts_a[line] for line in b[b_lo:b_hi])]
+        a_index = self._keep_lines(a_classes, a_lo, self.changed_a)
+        b_index = self._keep_lines(b_classes, b_lo, self.changed_b)
+        
+        x = [a[i] for i in a_index]
+        y = [b[j] for j in b_index]
+        max_cost = max(MAX_COST_MIN, bogosqrt(len(x) + len(y) + 3))
+        pending = [(0, len(x), 0, len(y), minimal)]
+        
+        while pending:
+            off1, lim1, off2, lim2, need_min = pending.pop()
+            while off1 < lim1 and off2 < lim2 and x[off1] == y[off2]:
+                off1 += 1
+                off2 += 1
+            while off1 < lim1 and off2 < lim2 and x[lim1 - 1] == y[lim2 - 1]:
+                lim1 -= 1
+                lim2 -= 1
+            
+            if off1 == lim1 or off2 == lim2:
+                for i in range(off1, lim1):
+                    self.changed_a[a_index[i]] = True
+                for j in range(off2, lim2):
+                    self.changed_b[b_index[j]] = True
+                continue
+            
+            split1, split2, min_lo, min_hi = find_split(
+                x, y, off1, lim1, off2, lim2, None if need_min else max_cost
+            )
+            pending.append((split1, lim1, split2, lim2, min_hi))
+            pending.append((off1, split1, off2, split2, min_lo))
+    
+    @staticmethod
+    def _keep_lines(classes: List[int], start: int, changed: List[bool]) -> List[int]:
+        """
+        Choose the lines of a region that take part in Myers' search.
+        
+        Lines without a match are marked as changed; lines with many
+        matches are too if they sit in a run of mostly unmatched lines.
+        
+        Args:
+            classes: The class of each line (0 = no match, 1 = some
+                     matches, 2 = many matches)
+            start: The position of the first line of the region
+            changed: The changed flags to mark
+        
+        Returns:
+            The positions of the lines kept
+        """
+        kept = []
+        last = len(classes) - 1
+        
+        for k, line_class in enumerate(classes):
+            if line_class == 1 or (line_class == 2 and not is_mostly_unmatched(classes, k, 0, last)):
+                kept.append(start + k)
+            else:
+                changed[start + k] = True
+        
+        return kept
+    
+    def patience(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> None:
+        """
+        Diff a region with the patience algorithm.
+        
+        Lines that occur exactly once on both sides are matched along
+        their longest increasing sequence, the matches are extended over
+        equal neighbouring lines, and the gaps between them are diffed
+        recursively. Regions with common lines but no unique ones fall
+        back to Myers' algorithm.
+        
+        Args:
+            a_lo, a_hi: The range of lines of the first file
+            b_lo, b_hi: The range of lines of the second file
+        """
+        a, b = self.a, self.b
+        pending = [(a_lo, a_hi, b_lo, b_hi)]
+        
+        while pending:
+            a_lo, a_hi, b_lo, b_hi = pending.pop()
+            if a_lo == a_hi or b_lo == b_hi:
+                self._mark(a_lo, a_hi, b_lo, b_hi)
+                continue
+            
+            anchors = self._unique_anchors(a_lo, a_hi, b_lo, b_hi)
+            if anchors is None:
+                self._mark(a_lo, a_hi, b_lo, b_hi)
+                continue
+            if not anchors:
+                self.myers(a_lo, a_hi, b_lo, b_hi)
+                continue
+            
+            gaps = []
+            line1, line2 = a_lo, b_lo
+            index = 0
+            while True:
+                if index < len(anchors):
+                    next1, next2 = anchors[index]
+                    while next1 > line1 and next2 > line2 and a[next1 - 1] == b[next2 - 1]:
+                        next1 -= 1
+                        next2 -= 1
+                else:
+                    next1, next2 = a_hi, b_hi
+                while line1 < next1 and line2 < next2 and a[line1] == b[line2]:
+                    line1 += 1
+                    line2 += 1
+                if next1 > line1 or next2 > line2:
+                    gaps.append((line1, next1, line2, next2))
+                
+                if index == len(anchors):
+                    break
+                
+                # Skip over consecutive anchors
+                while (index + 1 < len(anchors) and
+                       anchors[index + 1] == (anchors[index][0] + 1, anchors[index][1] + 1)):
+                    index += 1
+                line1, line2 = anchors[index][0] + 1, anchors[index][1] + 1
+                index += 1
+            
+            pending.extend(reversed(gaps))
+    
+    def _unique_anchors(self, a_lo: int, a_hi: int, b_lo: int,
+                        b_hi: int) -> Optional[List[Tuple[int, int]]]:
+        """
+        Find the longest increasing sequence of lines unique on both sides.
+        
+        Returns:
+            The (a position, b position) pairs of the sequence, in order;
+            an empty list if no line is unique on both sides, or None if
+            the sides have no line in common at all
+        """
+        # Position of each line in the first file, or -1 if it repeats
+        a_positions: Dict[int, int] = {}
+        for i in range(a_lo, a_hi):
+            line = self.a[i]
+            a_positions[line] = -1 if line in a_positions else i
+        
+        b_positions: Dict[int, int] = {}
+        has_matches = False
+        for j in range(b_lo, b_hi):
+            line = self.b[j]
+            if line in a_positions:
+                has_matches = True
+                if a_positions[line] >= 0:
+                    b_positions[line] = -1 if line in b_positions else j
+        
+        if not has_matches:
+            return None
+        
+        matches = sorted((a_positions[line], j) for line, j in b_positions.items() if j >= 0)
+        
+        # Patience sorting: tails[k] is the smallest b position ending an
+        # increasing sequence of length k + 1
+        tails: List[int] = []
+        tail_matches: List[int] = []
+        previous: List[int] = []
+        for index, (_, j) in enumerate(matches):
+            k = bisect.bisect_left(tails, j)
+            previous.append(tail_matches[k - 1] if k > 0 else -1)
+            if k == len(tails):
+                tails.append(j)
+                tail_matches.append(index)
+            else:
+                tails[k] = j
+                tail_matches[k] = index
+        
+        anchors = []
+        index = tail_matches[-1] if tail_matches else -1
+        while index >= 0:
+            anchors.append(matches[index])
+            index = previous[index]
+        anchors.reverse()
+        return anchors
+    
+    def histogram(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> None:
+        """
+        Diff a region with the histogram algorithm.
+        
+        The longest common run of lines whose rarest line occurs least
+        often in the first file is matched, and the regions before and
+        after it are diffed recursively. Lines occurring more than
+        HISTOGRAM_MAX_CHAIN times are never used as anchors; regions
+        whose common lines are all that frequent fall back to Myers'
+        algorithm.
+        
+        Args:
+            a_lo, a_hi: The range of lines of the first file
+            b_lo, b_hi: The range of lines of the second file
+        """
+        pending = [(a_lo, a_hi, b_lo, b_hi)]
+        
+        while pending:
+            a_lo, a_hi, b_lo, b_hi = pending.pop()
+            if a_lo == a_hi or b_lo == b_hi:
+                self._mark(a_lo, a_hi, b_lo, b_hi)
+                continue
+            
+            has_common, match = self._histogram_anchor(a_lo, a_hi, b_lo, b_hi)
+            if match is not None:
+                a_start, a_end, b_start, b_end = match
+                pending.append((a_end, a_hi, b_end, b_hi))
+                pending.append((a_lo, a_start, b_lo, b_start))
+            elif has_common:
+                self.myers(a_lo, a_hi, b_lo, b_hi)
+            else:
+                self._mark(a_lo, a_hi, b_lo, b_hi)
+    
+    def _histogram_anchor(self, a_lo: int, a_hi: int, b_lo: int,
+                          b_hi: int) -> Tuple[bool, Optional[Tuple[int, int, int, int]]]:
+        """
+        Find the common run of lines the histogram algorithm splits at.
+        
+        Returns:
+            A tuple of (whether the sides have a line in common, the
+            (a start, a end, b start, b end) of the run or None if no
+            common line is rare enough)
+        """
+        a, b = self.a, self.b
+        occurrences: Dict[int, List[int]] = {}
+        for i in range(a_lo, a_hi):
+            occurrences.setdefault(a[i], []).append(i)
+        
+        best = None
+        best_count = HISTOGRAM_MAX_CHAIN + 1
+        best_length = 0
+        has_common = False
+        
+        j = b_lo
+        while j < b_hi:
+            positions = occurrences.get(b[j])
+            next_j = j + 1
+            if positions is None:
+                j = next_j
+                continue
+            has_common = True
+            if len(positions) > best_count:
+                j = next_j
+                continue
+            
+            k = 0
+            while k < len(positions):
+                # Extend the match in both directions, tracking the
+                # rarest line in it
+                start_i = positions[k]
+                start_j = j
+                count = len(positions)
+                while start_i > a_lo and start_j > b_lo and a[start_i - 1] == b[start_j - 1]:
+                    start_i -= 1
+                    start_j -= 1
+                    if count > 1:
+                        count = min(count, len(occurrences[a[start_i]]))
+                end_i, end_j = positions[k] + 1, j + 1
+                while end_i < a_hi and end_j < b_hi and a[end_i] == b[end_j]:
+                    if count > 1:
+                        count = min(count, len(occurrences[a[end_i]]))
+                    end_i += 1
+                    end_j += 1
+                
+                next_j = max(next_j, end_j)
+                if end_i - start_i > best_length or count < best_count:
+                    best = (start_i, end_i, start_j, end_j)
+                    best_count = count
+                    best_length = end_i - start_i
+                
+                # Occurrences inside the run can't start a longer one
+                k += 1
+                while k < len(positions) and positions[k] < end_i:
+                    k += 1
+            
+            j = next_j
+        
+        if best_count > HISTOGRAM_MAX_CHAIN:
+            best = None
+        return has_common, best
+
+
+def bogosqrt(n: int) -> int:
+    """Approximate a square root by a power of two, as Git's xdiff does."""
+    root = 1
+    while n > 0:
+        root <<= 1
+        n >>= 2
+    return root
+
+
+def is_mostly_unmatched(classes: List[int], i: int, start: int, end: int) -> bool:
+    """
+    Check whether a frequent line sits in a run of mostly unmatched lines.
+    
+    Such lines are discarded before Myers' search, like the unmatched
+    lines around them, since matching them would only produce noise.
+    
+    Args:
+        classes: The line classes (see LineDiff._keep_lines)
+        i: The position of the frequent line
+        start, end: The first and last positions that may be examined
+    
+    Returns:
+        True if the line should be discarded, False otherwise
+    """
+    start = max(start, i - SIMILAR_SCAN_WINDOW)
+    end = min(end, i + SIMILAR_SCAN_WINDOW)
+    
+    unmatched_before = 0
+    frequent = 1
+    r = 1
+    while i - r >= start:
+        if classes[i - r] == 0:
+            unmatched_before += 1
+        elif classes[i - r] == 2:
+            frequent += 1
+        else:
+            break
+        r += 1
+    if unmatched_before == 0:
+        return False
+    
+    unmatched_after = 0
+    frequent_after = 1
+    r = 1
+    while i + r <= end:
+        if classes[i + r] == 0:
+            unmatched_after += 1
+        elif classes[i + r] == 2:
+            frequent_after += 1
+        else:
+            break
+        r += 1
+    if unmatched_after == 0:
+        return False
+    
+    unmatched = unmatched_before + unmatched_after
+    frequent += frequent_after
+    return frequent * KEEP_FREQUENT_RUN < frequent + unmatched
+
+
+def find_split(x: List[int], y: List[int], off1: int, lim1: int, off2: int, lim2: int,
+               max_cost: Optional[int] = None) -> Tuple[int, int, bool, bool]:
+    """
+    Find where to split a region in two for Myers' algorithm.
+    
+    Searches for the middle snake from both ends at once, keeping only
+    the furthest point reached on each diagonal (k = i - j), so memory is
+    linear in the region size. The region must not start or end with
+    equal lines.
+    
+    When max_cost is given and the search gets expensive, it settles for
+    a point at the end of a long snake that got well ahead, or past
+    max_cost edits for the furthest-reaching path, as Git does. Only the
+    half on the settled side then still needs a minimal diff.
+    
+    Args:
+        x: The line IDs of the first file
+        y: The line IDs of the second file
+        off1, lim1: The range of lines of the first file
+        off2, lim2: The range of lines of the second file
+        max_cost: The number of edits after which the search settles for
+                  a good enough split, or None to search until the paths
+                  meet
+    
+    Returns:
+        A tuple of (i, j, whether the half before needs a minimal diff,
+        whether the half after does); the halves are (off1..i, off2..j)
+        and (i..lim1, j..lim2)
+    """
+    dmin = off1 - lim2
+    dmax = lim1 - off2
+    fmid = off1 - off2
+    bmid = lim1 - lim2
+    odd = (fmid - bmid) & 1
+    fmin = fmax = fmid
+    bmin = bmax = bmid
+    
+    # Furthest i reached on each diagonal, forward and backward; the
+    # sentinels keep the paths inside the region
+    forward = {fmid: off1}
+    backward = {bmid: lim1}
+    far = lim1 + lim2 + 1
+    cost = 0
+    
+    while True:
+        cost += 1
+        got_snake = False
+        
+        if fmin > dmin:
+            fmin -= 1
+            forward[fmin - 1] = -1
+        else:
+            fmin += 1
+        if fmax < dmax:
+            fmax += 1
+            forward[fmax + 1] = -1
+        else:
+            fmax -= 1
+        
+        for d in range(fmax, fmin - 1, -2):
+            if forward[d - 1] >= forward[d + 1]:
+                i1 = forward[d - 1] + 1
+            else:
+                i1 = forward[d + 1]
+            start = i1
+            i2 = i1 - d
+            while i1 < lim1 and i2 < lim2 and x[i1] == y[i2]:
+                i1 += 1
+                i2 += 1
+            if i1 - start > SNAKE_COUNT:
+                got_snake = True
+            forward[d] = i1
+            if odd and bmin <= d <= bmax and backward[d] <= i1:
+                return i1, i2, True, True
+        
+        if bmin > dmin:
+            bmin -= 1
+            backward[bmin - 1] = far
+        else:
+            bmin += 1
+        if bmax < dmax:
+            bmax += 1
+            backward[bmax + 1] = far
+        else:
+            bmax -= 1
+        
+        for d in range(bmax, bmin - 1, -2):
+            if backward[d - 1] < backward[d + 1]:
+                i1 = backward[d - 1]
+            else:
+                i1 = backward[d + 1] - 1
+            start = i1
+            i2 = i1 - d
+            while i1 > off1 and i2 > off2 and x[i1 - 1] == y[i2 - 1]:
+                i1 -= 1
+                i2 -= 1
+            if start - i1 > SNAKE_COUNT:
+                got_snake = True
+            backward[d] = i1
+            if not odd and fmin <= d <= fmax and i1 <= forward[d]:
+                return i1, i2, True, True
+        
+        if max_cost is None:
+            continue
+        
+        if got_snake and cost > HEURISTIC_MIN_COST:
+            # Settle for a path that got well ahead of the others and
+            # ends with a long snake
+            best = 0
+            for d in range(fmax, fmin - 1, -2):
+                i1 = forward[d]
+                i2 = i1 - d
+                v = (i1 - off1) + (i2 - off2) - abs(d - fmid)
+                if (v > HEURISTIC_FACTOR * cost and v > best and
+                        off1 + SNAKE_COUNT <= i1 < lim1 and off2 + SNAKE_COUNT <= i2 < lim2 and
+                        x[i1 - SNAKE_COUNT:i1] == y[i2 - SNAKE_COUNT:i2]):
+                    best, split = v, (i1, i2)
+            if best > 0:
+                return split[0], split[1], True, False
+            
+            for d in range(bmax, bmin - 1, -2):
+                i1 = backward[d]
+                i2 = i1 - d
+                v = (lim1 - i1) + (lim2 - i2) - abs(d - bmid)
+                if (v > HEURISTIC_FACTOR * cost and v > best and
+                        off1 < i1 <= lim1 - SNAKE_COUNT and off2 < i2 <= lim2 - SNAKE_COUNT and
+                        x[i1:i1 + SNAKE_COUNT] == y[i2:i2 + SNAKE_COUNT]):
+                    best, split = v, (i1, i2)
+            if best > 0:
+                return split[0], split[1], False, True
+        
+        if cost < max_cost:
+            continue
+        
+        # Too expensive: split at whichever path got furthest
+        forward_best = -1
+        forward_i = off1
+        for d in range(fmax, fmin - 1, -2):
+            i1 = min(forward[d], lim1)
+            i2 = i1 - d
+            if i2 > lim2:
+                i1, i2 = lim2 + d, lim2
+            if i1 + i2 > forward_best:
+                forward_best, forward_i = i1 + i2, i1
+        
+        backward_best = far + lim1
+        backward_i = lim1
+        for d in range(bmax, bmin - 1, -2):
+            i1 = max(off1, backward[d])
+            i2 = i1 - d
+            if i2 < off2:
+                i1, i2 = off2 + d, off2
+            if i1 + i2 < backward_best:
+                backward_best, backward_i = i1 + i2, i1
+        
+        if (lim1 + lim2) - backward_best < forward_best - (off1 + off2):
+            return forward_i, forward_best - forward_i, True, False
+        return backward_i, backward_best - backward_i, False, True
+
+
+def compact_changes(lines: List[int], changed: List[bool], other_changed: List[bool]) -> None:
+    """
+    Slide groups of changed lines to canonical positions, like Git.
+    
+    A group of changed lines can often be moved up or down past equal
+    lines without changing the diff's meaning. Each group is merged with
+    any group it can slide into, then placed so that it lines up with a
+    change in the other file if possible, and as low as possible
+    otherwise. Git's default indent heuristic isn't applied, so the
+    result matches git diff --no-indent-heuristic.
+    
+    Args:
+        lines: The line IDs of the file whose groups are moved
+        changed: The changed flags of that file (with the trailing entry)
+        other_changed: The changed flags of the other file
+    """
+    n = len(lines)
+    n_other = len(other_changed) - 1
+    
+    # Groups are [start, end) ranges of changed lines; changed[-1] is the
+    # trailing False entry, so a group can't extend before the start
+    group = [0, 0]
+    while changed[group[1]]:
+        group[1] += 1
+    other = [0, 0]
+    while other_changed[other[1]]:
+        other[1] += 1
+    
+    def next_group(g: List[int], flags: List[bool], size: int) -> bool:
+        if g[1] == size:
+            return False
+        g[0] = g[1] + 1
+        g[1] = g[0]
+        while flags[g[1]]:
+            g[1] += 1
+        return True
+    
+    def previous_group(g: List[int], flags: List[bool]) -> None:
+        g[1] = g[0] - 1
+        g[0] = g[1]
+        while flags[g[0] - 1]:
+            g[0] -= 1
+    
+    def slide_up() -> bool:
+        start, end = group
+        if start == 0 or lines[start - 1] != lines[end - 1]:
+            return False
+        changed[start - 1] = True
+        changed[end - 1] = False
+        group[0] = start - 1
+        group[1] = end - 1
+        while changed[group[0] - 1]:
+            group[0] -= 1
+        previous_group(other, other_changed)
+        return True
+    
+    def slide_down() -> bool:
+        start, end = group
+        if end == n or lines[start] != lines[end]:
+            return False
+        changed[start] = False
+        changed[end] = True
+        group[0] = start + 1
+        group[1] = end + 1
+        while changed[group[1]]:
+            group[1] += 1
+        next_group(other, other_changed, n_other)
+        return True
+    
+    while True:
+        if group[1] != group[0]:
+            while True:
+                size = group[1] - group[0]
+                end_matching_other = -1
+                
+                while slide_up():
+                    pass
+                earliest_end = group[1]
+                if other[1] > other[0]:
+                    end_matching_other = group[1]
+                
+                while slide_down():
+                    if other[1] > other[0]:
+                        end_matching_other = group[1]
+                
+                # Sliding may have merged groups; start over if so
+                if size == group[1] - group[0]:
+                    break
+            
+            if group[1] != earliest_end and end_matching_other != -1:
+                while other[1] == other[0]:
+                    slide_up()
+        
+        if not next_group(group, changed, n):
+            break
+        next_group(other, other_changed, n_other)
+
+
+def diff_lines(a_lines: Sequence[Hashable], b_lines: Sequence[Hashable],
+               algorithm: str = DEFAULT_DIFF_ALGORITHM) -> List[Tuple[int, int, int, int]]:
+    """
+    Find the changes between two sequences of lines.
+    
+    Args:
+        a_lines: Lines from the first file
+        b_lines: Lines from the second file
+        algorithm: One of DIFF_ALGORITHMS
+    
+    Returns:
+        The changes as (a start, a count, b start, b count) tuples in
+        order: a_lines[a start:a start + a count] were replaced by
+        b_lines[b start:b start + b count]
+    
+    Raises:
+        ValueError: If the algorithm is unknown
+    """
+    a, b = intern_lines(a_lines, b_lines)
+    line_diff = LineDiff(a, b)
+    line_diff.run(algorithm)
+    
+    changed_a = line_diff.changed_a
+    changed_b = line_diff.changed_b
+    changes = []
+    i = j = 0
+    
+    while i < len(a) or j < len(b):
+        if changed_a[i] or changed_b[j]:
+            start_i, start_j = i, j
+            while changed_a[i]:
+                i += 1
+            while changed_b[j]:
+                j += 1
+            changes.append((start_i, i - start_i, start_j, j - start_j))
+        else:
+            i += 1
+            j += 1
+    
+    return changes
+
+
+def iter_hunks(changes: List[Tuple[int, int, int, int]], a_length: int,
+               context_lines: int = 3) -> Iterator[Tuple[int, int, int, int, List[Tuple[int, int, int, int]]]]:
+    """
+    Group changes into hunks with context, the way Git does.
+    
+    Changes separated by at most twice the context are shown in one hunk.
+    
+    Args:
+        changes: The changes, as returned by diff_lines()
+        a_length: The number of lines of the first file
+        context_lines: Number of context lines around each change
+    
+    Yields:
+        Tuples of (a start, a count, b start, b count, changes in the hunk)
+    """
+    index = 0
+    while index < len(changes):
+        last = index
+        while (last + 1 < len(changes) and
+               changes[last + 1][0] - (changes[last][0] + changes[last][1]) <= 2 * context_lines):
+            last += 1
+        
+        first_i, _, first_j, _ = changes[index]
+        last_i, last_count_a, last_j, last_count_b = changes[last]
+        
+        leading = min(context_lines, first_i)
+        trailing = min(context_lines, a_length - (last_i + last_count_a))
+        a_start = first_i - leading
+        b_start = first_j - leading
+        a_count = last_i + last_count_a + trailing - a_start
+        b_count = last_j + last_count_b + trailing - b_start
+        
+        yield a_start, a_count, b_start, b_count, changes[index:last + 1]
+        index = last + 1
+
+
+def format_range(start: int, count: int) -> str:
+    """Format a hunk range: the 1-based start, and the count unless it is 1."""
+    if count == 0:
+        return f"{start},0"
+    if count == 1:
+        return str(start + 1)
+    return f"{start + 1},{count}"
+
+
+def find_function_name(lines: Sequence[str], before: int) -> str:
+    """
+    Find the text Git shows after a hunk header.
+    
+    This is the closest line before the hunk that starts with a letter,
+    "_" or "$", truncated to FUNCTION_NAME_SIZE bytes.
+    
+    Args:
+        lines: Lines from the first file
+        before: The index of the first line of the hunk
+    
+    Returns:
+        The line, or "" if there is none
+    """
+    for i in range(before - 1, -1, -1):
+        line = lines[i]
+        first = line[:1]
+        if first and ((first.isascii() and first.isalpha()) or first in "_$"):
+            name = line.encode()[:FUNCTION_NAME_SIZE].decode(errors="ignore")
+            return name.rstrip()
+    return ""
 
 
 def create_unified_diff(a_lines: List[str], b_lines: List[str], 
                        a_name: str = "a", b_name: str = "b",
-                       context_lines: int = 3) -> str:
+                       context_lines: int = 3,
+                       algorithm: str = DEFAULT_DIFF_ALGORITHM) -> str:
     """
     Create a unified diff between two sets of lines.
     
+    Hunks are laid out as Git lays them out, including the function
+    name after the hunk header.
+    
     Args:
         a_lines: Lines from the first file
         b_lines: Lines from the second file
         a_name: Name of the first file
         b_name: Name of the second file
         context_lines: Number of context lines to show
+        algorithm: The line diff algorithm, one of DIFF_ALGORITHMS
     
     Returns:
-        A string containing the unified diff
-    """
-    diff = unified_diff(
-        a_lines, b_lines,
-        fromfile=a_name, tofile=b_name,
-        lineterm="", n=context_lines
-    )
-    return "\n".join(diff)
+        A string containing the unified diff, or "" if the lines are equal
+    
+    Raises:
+        ValueError: If the algorithm is unknown
+    """
+    changes = diff_lines(a_lines, b_lines, algorithm)
+    if not changes:
+        return ""
+    
+    output = [f"--- {a_name}", f"+++ {b_name}"]
+    
+    for a_start, a_count, b_start, b_count, hunk_changes in iter_hunks(
+            changes, len(a_lines), context_lines):
+        header = f"@@ -{format_range(a_start, a_count)} +{format_range(b_start, b_count)} @@"
+        function_name = find_function_name(a_lines, a_start)
+        output.append(f"{header} {function_name}" if function_name else header)
+        
+        i = a_start
+        for change_i, count_a, change_j, count_b in hunk_changes:
+            output.extend(" " + line for line in a_lines[i:change_i])
+            output.extend("-" + line for line in a_lines[change_i:change_i + count_a])
+            output.extend("+" + line for line in b_lines[change_j:change_j + count_b])
+            i = change_i + count_a
+        output.extend(" " + line for line in a_lines[i:a_start + a_count])
+    
+    return "\n".join(output)
 
 
 def get_diff_stats(diff: str) -> Tuple[int, int, int]:
@@ -2,9 +2,20 @@
 File system utility functions for GitEllE.
 """
 import os
+import shutil
 import stat
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union
+from typing import BinaryIO, Container, Iterator, List, Optional, Tuple, Union
+
+from gitelle.utils.ignore import IgnoreMatcher
+
+
+# Size of the buffer used when copying streams to files
+COPY_BUFFER_SIZE = 64 * 1024
+
+# Name of the repository directory skipped when walking the working tree
+GITELLE_DIR = ".gitelle"
 
 
 def ensure_directory_exists(path: Union[str, Path]) -> None:
@@ -54,29 +65,104 @@ def set_file_mode(path: Union[str, Path], mode: int) -> None:
     os.chmod(path, mode)
 
 
-def walk_files(root: Union[str, Path], exclude_gitelle: bool = True) -> list[Path]:
+def walk_files(root: Union[str, Path], exclude_gitelle: bool = True,
+               ignore: Optional[IgnoreMatcher] = None) -> List[Path]:
     """
     Recursively list all files in a directory.
     
+    Excluded and ignored directories are pruned, so they are never read.
+    
     Args:
         root: The root directory to start from
         exclude_gitelle: Whether to exclude .gitelle directory
+        ignore: A matcher for ignored files (paths are matched relative
+                to the root)
     
     Returns:
         A list of file paths relative to the root
     """
-    root = Path(root)
-    result = []
+    return [Path(path) for path, _ in scan_tree(root, exclude_gitelle=exclude_gitelle, ignore=ignore)]
+
+
+def scan_tree(root: Union[str, Path], directory: str = "", exclude_gitelle: bool = True,
+              ignore: Optional[IgnoreMatcher] = None, tracked: Container[str] = (),
+              workers: int = 1) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    Walk the files under a directory, yielding each one with its stat data.
+    
+    Directories are read with os.scandir, whose entries already know
+    their type, so telling files from directories costs no system call
+    and each file is stat()ed exactly once. Excluded and ignored
+    directories are pruned before they are read. With more than one
+    worker, directories are read ahead by a thread pool; files are
+    yielded in the same order either way: sorted by name within a
+    directory, each directory's files before its subdirectories.
+    
+    Symbolic links to directories are not followed.
+    
+    Args:
+        root: The root of the tree; yielded paths are relative to it
+        directory: The directory to walk, relative to the root ("" for the root)
+        exclude_gitelle: Whether to skip .gitelle directories
+        ignore: A matcher for ignored files (paths are matched relative
+                to the root)
+        tracked: Paths that are yielded even if they are ignored
+        workers: The number of threads reading directories
+    
+    Yields:
+        Tuples of (path relative to the root with "/" separators, stat result)
+    """
+    root = str(root)
+    
+    def read_dir(rel_dir: str) -> Tuple[List[Tuple[str, os.stat_result]], List[str]]:
+        prefix = rel_dir + "/" if rel_dir else ""
+        files = []
+        subdirs = []
+        
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as it:
+                for entry in it:
+                    path = prefix + entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if exclude_gitelle and entry.name == GITELLE_DIR:
+                                continue
+                            if ignore is not None and ignore.is_ignored(path, is_dir=True):
+                                continue
+                            subdirs.append(path)
+                        elif entry.is_file():
+                            if ignore is not None and path not in tracked and ignore.is_ignored(path):
+                                continue
+                            files.append((path, entry.stat()))
+                    except FileNotFoundError:
+                        # Removed while the directory was being read
+                        continue
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        
+        files.sort()
+        subdirs.sort()
+        return files, subdirs
     
-    for path in root.glob("**/*"):
-        if path.is_file():
-            # Check if the file should be excluded
-            if exclude_gitelle and ".gitelle" in path.parts:
-                continue
-            
-            result.append(path.relative_to(root))
+    if workers <= 1:
+        pending = [directory]
+        while pending:
+            files, subdirs = read_dir(pending.pop())
+            yield from files
+            pending.extend(reversed(subdirs))
+        return
     
-    return result
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = [pool.submit(read_dir, directory)]
+        try:
+            while pending:
+                files, subdirs = pending.pop().result()
+                pending.extend(reversed([pool.submit(read_dir, subdir) for subdir in subdirs]))
+                yield from files
+        finally:
+            # Don't read the rest of the tree if the caller stopped early
+            for future in pending:
+                future.cancel()
 
 
 def read_file(path: Union[str, Path]) -> bytes:
@@ -108,6 +194,22 @@ def write_file(path: Union[str, Path], data: bytes) -> None:
         f.write(data)
 
 
+def write_file_stream(path: Union[str, Path], stream: BinaryIO) -> None:
+    """
+    Copy a binary stream to a file using a bounded buffer, creating
+    parent directories if necessary.
+    
+    Args:
+        path: The path to the file
+        stream: A file-like object to read the data from
+    """
+    path = Path(path)
+    ensure_directory_exists(path.parent)
+    
+    with open(path, "wb") as f:
+        shutil.copyfileobj(stream, f, COPY_BUFFER_SIZE)
+
+
 def remove_file(path: Union[str, Path]) -> None:
     """
     Remove a file if it exists.
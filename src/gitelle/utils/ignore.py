@@ -0,0 +1,399 @@
+"""
+Matching of working tree paths against ignore patterns.
+"""
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+# Name of the per-directory ignore files
+IGNORE_FILE = ".gitignore"
+
+# An unescaped glob character
+GLOB_PATTERN = re.compile(r"(?<!\\)[*?\[]")
+
+# A backslash escape
+ESCAPE_PATTERN = re.compile(r"\\(.)")
+
+
+class IgnorePattern:
+    """
+    Represents one compiled ignore pattern.
+
+    Attributes:
+        priority: The position of the pattern in its file; later patterns win
+        negated: Whether the pattern re-includes paths ("!pattern")
+        dir_only: Whether the pattern only matches directories ("pattern/")
+        regex: The compiled glob, or None for literal patterns
+    """
+
+    __slots__ = ("priority", "negated", "dir_only", "regex")
+
+    def __init__(self, priority: int, negated: bool, dir_only: bool, regex=None):
+        self.priority = priority
+        self.negated = negated
+        self.dir_only = dir_only
+        self.regex = regex
+
+    def __repr__(self) -> str:
+        return f"IgnorePattern({self.priority}, {self.negated}, {self.dir_only}, {self.regex})"
+
+
+class IgnoreRules:
+    """
+    The compiled patterns of one ignore file.
+
+    Patterns are sorted into buckets so that most lookups are dictionary
+    hits rather than regular expression matches:
+
+    - literal names ("node_modules") are keyed by basename
+    - "*.ext" patterns are keyed by extension
+    - literal paths ("/build", "docs/out") are keyed by path
+    - other patterns without a slash are regexes tried on the basename
+    - other patterns with a slash are regexes keyed by their literal
+      directory prefix, so only those under an ancestor of the path
+      are tried
+
+    Within one file the last matching pattern wins.
+
+    Attributes:
+        base: The directory of the ignore file ("" for the root); patterns
+              only apply below it
+    """
+
+    def __init__(self, lines: Iterable[str], base: str = ""):
+        """
+        Compile the patterns of an ignore file.
+
+        Args:
+            lines: The lines of the file
+            base: The directory of the file, relative to the root
+        """
+        self.base = base
+        self._names: Dict[str, List[IgnorePattern]] = {}
+        self._extensions: Dict[str, List[IgnorePattern]] = {}
+        self._paths: Dict[str, List[IgnorePattern]] = {}
+        self._name_globs: List[IgnorePattern] = []
+        self._path_globs: Dict[str, List[IgnorePattern]] = {}
+
+        for priority, line in enumerate(lines):
+            self._add(priority, line)
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], base: str = "") -> Optional["IgnoreRules"]:
+        """
+        Load the patterns of an ignore file.
+
+        Args:
+            path: The path to the file
+            base: The directory of the file, relative to the root
+
+        Returns:
+            The compiled rules, or None if the file doesn't exist
+        """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            return None
+        return cls(data.decode(errors="replace").splitlines(), base)
+
+    def _add(self, priority: int, line: str) -> None:
+        """
+        Parse one line and add its pattern to the matching bucket.
+
+        Args:
+            priority: The position of the line in the file
+            line: The line
+        """
+        if not line or line.startswith("#"):
+            return
+
+        # Trailing spaces are ignored unless escaped
+        while line.endswith(" ") and not line.endswith("\\ "):
+            line = line[:-1]
+
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+
+        dir_only = line.endswith("/")
+        if dir_only:
+            line = line[:-1]
+
+        # A slash anywhere but at the end anchors the pattern to the base
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if line.startswith("**/") and "/" not in line[3:]:
+            line = line[3:]
+            anchored = False
+
+        if not line:
+            return
+
+        is_glob = GLOB_PATTERN.search(line) is not None
+        literal = None if is_glob else ESCAPE_PATTERN.sub(r"\1", line)
+
+        if not anchored:
+            if literal is not None:
+                self._names.setdefault(literal, []).append(IgnorePattern(priority, negated, dir_only))
+                return
+
+            suffix = line[1:]
+            if (line.startswith("*") and suffix.startswith(".") and suffix.count(".") == 1 and
+                    GLOB_PATTERN.search(suffix) is None and "\\" not in suffix):
+                self._extensions.setdefault(suffix, []).append(IgnorePattern(priority, negated, dir_only))
+                return
+
+            regex = re.compile(translate_glob(line))
+            self._name_globs.append(IgnorePattern(priority, negated, dir_only, regex))
+            return
+
+        if literal is not None:
+            self._paths.setdefault(literal, []).append(IgnorePattern(priority, negated, dir_only))
+            return
+
+        prefix = line[:GLOB_PATTERN.search(line).start()]
+        prefix = ESCAPE_PATTERN.sub(r"\1", prefix[:prefix.rfind("/") + 1])
+        regex = re.compile(translate_glob(line))
+        self._path_globs.setdefault(prefix, []).append(IgnorePattern(priority, negated, dir_only, regex))
+
+    def _candidates(self, path: str, name: str) -> Iterator[Tuple[IgnorePattern, str]]:
+        """
+        List the patterns that could match a path.
+
+        Args:
+            path: The path relative to the base
+            name: The basename of the path
+
+        Yields:
+            Tuples of (pattern, string its regex is matched against)
+        """
+        for bucket in (self._names.get(name), self._paths.get(path)):
+            if bucket:
+                for pattern in bucket:
+                    yield pattern, name
+
+        dot = name.rfind(".")
+        if dot >= 0:
+            for pattern in self._extensions.get(name[dot:], ()):
+                yield pattern, name
+
+        for pattern in self._name_globs:
+            yield pattern, name
+
+        if self._path_globs:
+            for pattern in self._path_globs.get("", ()):
+                yield pattern, path
+            slash = path.find("/")
+            while slash >= 0:
+                for pattern in self._path_globs.get(path[:slash + 1], ()):
+                    yield pattern, path
+                slash = path.find("/", slash + 1)
+
+    def match(self, path: str, is_dir: bool = False) -> Optional[bool]:
+        """
+        Match a path against the patterns.
+
+        Args:
+            path: The path relative to the root, with "/" separators
+            is_dir: Whether the path is a directory
+
+        Returns:
+            True if the path is ignored, False if a negated pattern
+            re-includes it, or None if no pattern matches
+        """
+        if self.base:
+            if not path.startswith(self.base + "/"):
+                return None
+            path = path[len(self.base) + 1:]
+
+        name = path[path.rfind("/") + 1:]
+        best = None
+
+        for pattern, subject in self._candidates(path, name):
+            if pattern.dir_only and not is_dir:
+                continue
+            if best is not None and pattern.priority < best.priority:
+                continue
+            if pattern.regex is not None and pattern.regex.match(subject) is None:
+                continue
+            best = pattern
+
+        if best is None:
+            return None
+        return not best.negated
+
+    def __repr__(self) -> str:
+        return f"IgnoreRules({self.base!r})"
+
+
+class IgnoreMatcher:
+    """
+    Decides which paths of a working tree are ignored.
+
+    The .gitignore file of each directory applies to the paths below it,
+    deeper files taking precedence over shallower ones, and the exclude
+    file (.gitelle/info/exclude) applies last. .gitignore files are read
+    lazily and cached, so a traversal that skips ignored directories
+    reads each file once and never reads the ones below those
+    directories.
+
+    Attributes:
+        root: The root of the working tree
+        exclude_id: A hash of the exclude file ("" if there is none),
+                    for caches that depend on the rules
+    """
+
+    def __init__(self, root: Union[str, Path], exclude_file: Optional[Union[str, Path]] = None):
+        """
+        Initialize a matcher.
+
+        Args:
+            root: The root of the working tree
+            exclude_file: The path to an additional ignore file
+        """
+        self.root = str(root)
+        self.exclude_id = ""
+        self._exclude = None
+        self._chains: Dict[str, List[IgnoreRules]] = {}
+
+        if exclude_file is not None:
+            try:
+                with open(exclude_file, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                self._exclude = IgnoreRules(data.decode(errors="replace").splitlines())
+                self.exclude_id = hashlib.sha1(data).hexdigest()
+
+    def _chain(self, directory: str) -> List[IgnoreRules]:
+        """
+        Get the rules that apply to the entries of a directory.
+
+        Args:
+            directory: The directory, relative to the root ("" for the root)
+
+        Returns:
+            The rules, most specific first
+        """
+        chain = self._chains.get(directory)
+        if chain is None:
+            parent = self._chain(directory.rpartition("/")[0]) if directory else (
+                [self._exclude] if self._exclude is not None else []
+            )
+            rules = IgnoreRules.from_file(os.path.join(self.root, directory, IGNORE_FILE), directory)
+            chain = parent if rules is None else [rules] + parent
+            self._chains[directory] = chain
+        return chain
+
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """
+        Check whether a path is ignored, assuming its parent directory isn't.
+
+        This is the check for traversals, which don't enter ignored
+        directories in the first place; use is_path_ignored() for an
+        arbitrary path.
+
+        Args:
+            path: The path relative to the root, with "/" separators
+            is_dir: Whether the path is a directory
+
+        Returns:
+            True if the path is ignored, False otherwise
+        """
+        for rules in self._chain(path.rpartition("/")[0]):
+            result = rules.match(path, is_dir)
+            if result is not None:
+                return result
+        return False
+
+    def is_path_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """
+        Check whether a path or any of its parent directories is ignored.
+
+        Args:
+            path: The path relative to the root, with "/" separators
+            is_dir: Whether the path is a directory
+
+        Returns:
+            True if the path is ignored, False otherwise
+        """
+        slash = path.find("/")
+        while slash >= 0:
+            if self.is_ignored(path[:slash], is_dir=True):
+                return True
+            slash = path.find("/", slash + 1)
+        return self.is_ignored(path, is_dir)
+
+    def __repr__(self) -> str:
+        return f"IgnoreMatcher({self.root})"
+
+
+def translate_glob(pattern: str) -> str:
+    """
+    Translate an ignore glob into a regular expression.
+
+    "*" and "?" don't match "/", "**" matches across directories when it
+    forms a whole path component, and a backslash escapes the next
+    character.
+
+    Args:
+        pattern: The glob
+
+    Returns:
+        A regular expression matching the whole string
+    """
+    output = []
+    i = 0
+    n = len(pattern)
+
+    while i < n:
+        c = pattern[i]
+
+        if c == "*":
+            if (pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/") and
+                    (i + 2 == n or pattern[i + 2] == "/")):
+                if i + 2 == n:
+                    output.append(".*")
+                    i += 2
+                else:
+                    output.append("(?:.*/)?")
+                    i += 3
+                continue
+            output.append("[^/]*")
+            while i < n and pattern[i] == "*":
+                i += 1
+            continue
+
+        if c == "?":
+            output.append("[^/]")
+        elif c == "[":
+            j = i + 1
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                output.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                negate = body[0] in "!^"
+                if negate:
+                    body = body[1:]
+                body = body.replace("\\", "\\\\").replace("[", "\\[")
+                output.append("[" + ("^" if negate else "") + body + "]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            output.append(re.escape(pattern[i]))
+        else:
+            output.append(re.escape(c))
+        i += 1
+
+    return "".join(output) + r"\Z"
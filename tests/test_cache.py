@@ -0,0 +1,82 @@
+"""
+Tests for the object cache.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from gitelle.core.cache import ObjectCache
+from gitelle.core.objects import Blob, Tree
+from gitelle.core.repository import Repository
+
+
+class TestObjectCache(TestCase):
+    """Tests for the ObjectCache class."""
+
+    def setUp(self):
+        """Set up a temporary directory for tests."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_lru_eviction_by_bytes(self):
+        """Test that the least recently used objects are evicted first."""
+        cache = ObjectCache(max_bytes=250)
+        trees = [Tree(self.repo) for _ in range(3)]
+
+        cache.put("a", trees[0], 100)
+        cache.put("b", trees[1], 100)
+        cache.get("a")
+        cache.put("c", trees[2], 100)
+
+        self.assertIs(cache.get("a"), trees[0])
+        self.assertIsNone(cache.get("b"))
+        self.assertIs(cache.get("c"), trees[2])
+        self.assertEqual(cache.current_bytes, 200)
+
+    def test_blob_policy(self):
+        """Test that large blobs are not cached and don't evict trees."""
+        cache = ObjectCache(max_bytes=1000, max_blob_bytes=100, max_blob_size=60)
+        tree = Tree(self.repo)
+        cache.put("tree", tree, 500)
+
+        cache.put("big", Blob(self.repo, b"x" * 80), 80)
+        cache.put("small", Blob(self.repo, b"x" * 50), 50)
+
+        self.assertIsNone(cache.get("big"))
+        self.assertIsNotNone(cache.get("small"))
+        self.assertIs(cache.get("tree"), tree)
+
+    def test_resize_and_clear(self):
+        """Test shrinking the budget and clearing the cache."""
+        cache = ObjectCache(max_bytes=1000)
+        for i in range(5):
+            cache.put(str(i), Tree(self.repo), 100)
+
+        cache.resize(max_bytes=250)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.get("4"))
+
+        cache.clear()
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_repository_get_object_uses_cache(self):
+        """Test that get_object serves repeated lookups from the cache."""
+        tree = Tree(self.repo)
+        tree.add_entry("100644", "file.txt", Blob(self.repo, b"content").write())
+        tree_id = tree.write()
+
+        first = self.repo.get_object(tree_id)
+        second = self.repo.get_object(tree_id)
+
+        self.assertIs(first, second)
+        self.assertEqual(first.id, tree_id)
+        self.assertEqual(self.repo.object_cache.stats()["hits"], 1)
+        self.assertEqual(self.repo.object_cache.stats()["misses"], 1)
@@ -0,0 +1,67 @@
+"""
+Tests for the cache-tree index extension.
+"""
+from unittest import TestCase
+
+from gitelle.core.cache_tree import CacheTree
+
+
+def make_node(entry_count, object_id=None, **children):
+    """Create a cache-tree node."""
+    node = CacheTree()
+    node.entry_count = entry_count
+    node.object_id = object_id
+    node.children.update(children)
+    return node
+
+
+class TestCacheTree(TestCase):
+    """Tests for the CacheTree class."""
+    
+    def test_serialize_deserialize(self):
+        """Test that valid and invalid nodes round-trip."""
+        root = make_node(
+            3, "11" * 20,
+            src=make_node(2, "22" * 20, lib=make_node(-1)),
+            docs=make_node(1, "33" * 20),
+        )
+        
+        data = root.serialize()
+        parsed = CacheTree.deserialize(data)
+        
+        self.assertTrue(data.startswith(b"\x003 2\n" + bytes.fromhex("11" * 20)))
+        self.assertEqual(parsed.object_id, "11" * 20)
+        self.assertEqual(parsed.children["src"].entry_count, 2)
+        self.assertEqual(parsed.children["docs"].object_id, "33" * 20)
+        self.assertFalse(parsed.children["src"].children["lib"].is_valid)
+        self.assertEqual(parsed.serialize(), data)
+    
+    def test_invalidate_path(self):
+        """Test that only the directories along a path are invalidated."""
+        root = make_node(
+            3, "11" * 20,
+            a=make_node(2, "22" * 20, b=make_node(1, "33" * 20)),
+            c=make_node(1, "44" * 20),
+        )
+        
+        root.invalidate("a/b/file.txt")
+        
+        self.assertFalse(root.is_valid)
+        self.assertFalse(root.find("a").is_valid)
+        self.assertFalse(root.find("a/b").is_valid)
+        self.assertTrue(root.find("c").is_valid)
+    
+    def test_invalidate_new_directory(self):
+        """Test invalidating a path below a directory that isn't cached."""
+        root = make_node(1, "11" * 20, a=make_node(1, "22" * 20))
+        
+        root.invalidate("new/dir/file.txt")
+        
+        self.assertFalse(root.is_valid)
+        self.assertTrue(root.find("a").is_valid)
+        self.assertIsNone(root.find("new"))
+    
+    def test_deserialize_invalid(self):
+        """Test that truncated data is rejected."""
+        with self.assertRaises(ValueError):
+            CacheTree.deserialize(b"\x001 0\n" + b"\x00" * 10)
@@ -0,0 +1,73 @@
+"""
+Tests for the 'cat-file' command and header-only object inspection.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from click.testing import CliRunner
+
+from gitelle.commands.cat_file import cat_file
+from gitelle.core.objects import Blob, Tree
+from gitelle.core.pack import write_pack
+from gitelle.core.repository import Repository
+
+
+class TestCatFileCommand(TestCase):
+    """Tests for the 'cat-file' command."""
+
+    def setUp(self):
+        """Set up a temporary directory for tests."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        self.runner = CliRunner()
+        self.cwd = os.getcwd()
+        os.chdir(self.repo_path)
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        os.chdir(self.cwd)
+        self.repo.object_store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_info_loose(self):
+        """Test reading the type and size of a loose object."""
+        data = os.urandom(100000)
+        blob_id = Blob(self.repo, data).write()
+
+        self.assertEqual(self.repo.object_store.info(blob_id), ("blob", len(data)))
+
+    def test_info_packed_delta(self):
+        """Test reading the type and size of a deltified packed object."""
+        base = b"".join(b"line %d\n" % i for i in range(5000))
+        edited = base + b"one more line\n"
+        objects = [
+            (hashlib.sha1(b"blob %d\x00" % len(d) + d).hexdigest(), "blob", d)
+            for d in (edited, base)
+        ]
+        write_pack(self.repo.objects_dir / "pack", objects, window=10)
+
+        for object_id, _, data in objects:
+            self.assertEqual(self.repo.object_store.info(object_id), ("blob", len(data)))
+
+    def test_cat_file_type_size_and_content(self):
+        """Test the -t, -s, -e and -p options."""
+        blob_id = Blob(self.repo, b"hello\n").write()
+        tree = Tree(self.repo)
+        tree.add_entry("100644", "hello.txt", blob_id)
+        tree_id = tree.write()
+
+        self.assertEqual(self.runner.invoke(cat_file, ["-t", blob_id]).output, "blob\n")
+        self.assertEqual(self.runner.invoke(cat_file, ["-s", blob_id]).output, "6\n")
+        self.assertEqual(self.runner.invoke(cat_file, ["-p", blob_id]).output, "hello\n")
+        self.assertEqual(
+            self.runner.invoke(cat_file, ["-p", tree_id]).output,
+            f"100644 blob {blob_id}\thello.txt\n"
+        )
+        self.assertEqual(self.runner.invoke(cat_file, ["-e", blob_id]).exit_code, 0)
+        self.assertEqual(self.runner.invoke(cat_file, ["-e", "0" * 40]).exit_code, 1)
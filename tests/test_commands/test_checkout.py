@@ -102,22 +102,18 @@ class TestCheckoutCommand(TestCase):
             self.runner.invoke(add, ["test.txt"])
             result = self.runner.invoke(commit, ["-m", "Initial commit"])
             
-            # Extract the commit ID from the commit output
-            commit_id = None
-            for line in result.output.splitlines():
-                if "main" in line and "[" in line and "]" in line:
-                    commit_id = line.split()[1][:-1]  # Remove the closing bracket
-                    break
-            
-            if commit_id:
-                # Checkout the commit
-                result = self.runner.invoke(checkout, [commit_id])
-                self.assertEqual(result.exit_code, 0)
-                
-                # Check that HEAD points to the commit
-                repo = Repository.find()
-                self.assertFalse(repo.head.is_symbolic)
-                self.assertEqual(repo.head.target, commit_id)
+            # The summary shows the abbreviated ID; read the full one from HEAD
+            commit_id = Repository.find().head.get_resolved_target()
+            self.assertIn(f"[main {commit_id[:7]}]", result.output)
+            
+            # Checkout the commit
+            result = self.runner.invoke(checkout, [commit_id])
+            self.assertEqual(result.exit_code, 0)
+            
+            # Check that HEAD points to the commit
+            repo = Repository.find()
+            self.assertFalse(repo.head.is_symbolic)
+            self.assertEqual(repo.head.target, commit_id)
     
     def test_checkout_updates_working_directory(self):
         """Test that checkout updates the working directory."""
@@ -0,0 +1,137 @@
+"""
+Tests for the 'diff' and 'log -p' commands.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from click.testing import CliRunner
+
+from gitelle.commands.diff import diff
+from gitelle.commands.log import log
+from gitelle.core.repository import Repository
+
+
+class TestDiffCommand(TestCase):
+    """Tests for the 'diff' command."""
+
+    def setUp(self):
+        """Set up a repository with two commits on two branches."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        self.runner = CliRunner()
+
+        self.write("src/main.py", "import sys\n\nprint(1)\n")
+        self.write("README.md", "readme\n")
+        self.repo.index.add(["src", "README.md"])
+        self.first = self.repo.commit("first")
+        branch = self.repo.get_branch("first")
+        branch.set_target(self.first)
+        branch.save()
+
+        self.write("src/main.py", "import sys\n\nprint(2)\n")
+        self.write("docs/guide.md", "guide\n")
+        self.repo.index.add(["src", "docs"])
+        self.second = self.repo.commit("second")
+
+        self.cwd = os.getcwd()
+        os.chdir(self.repo_path)
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, path, content):
+        """Write a file of the working tree."""
+        (self.repo_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (self.repo_path / path).write_text(content)
+
+    def test_diff_commits(self):
+        """Test the diff between two commits."""
+        result = self.runner.invoke(diff, ["first", "HEAD"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, "\n".join([
+            "--- /dev/null",
+            "+++ b/docs/guide.md",
+            "@@ -0,0 +1 @@",
+            "+guide",
+            "",
+            "--- a/src/main.py",
+            "+++ b/src/main.py",
+            "@@ -1,3 +1,3 @@",
+            " import sys",
+            " ",
+            "-print(1)",
+            "+print(2)",
+            "",
+        ]))
+
+    def test_diff_commits_paths(self):
+        """Test limiting the diff between two commits to some paths."""
+        result = self.runner.invoke(diff, [self.second, self.first, "docs"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("--- a/docs/guide.md\n+++ /dev/null", result.output)
+        self.assertNotIn("main.py", result.output)
+
+    def test_diff_cached(self):
+        """Test the diff between HEAD, or another commit, and the index."""
+        self.write("README.md", "changed\n")
+        (self.repo_path / "docs/guide.md").unlink()
+        index = self.repo.index
+        index.add(["README.md"])
+        index.remove(["docs/guide.md"])
+        index.write()
+
+        result = self.runner.invoke(diff, ["--cached"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("--- a/README.md\n+++ b/README.md", result.output)
+        self.assertIn("--- a/docs/guide.md\n+++ /dev/null", result.output)
+
+        result = self.runner.invoke(diff, ["--cached", "first", "src"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("+print(2)", result.output)
+        self.assertNotIn("README.md", result.output)
+
+    def test_renames(self):
+        """Test that moved files are shown as renames unless disabled."""
+        (self.repo_path / "src/main.py").rename(self.repo_path / "main.py")
+        index = self.repo.index
+        index.remove(["src/main.py"])
+        index.add(["main.py"])
+        index.write()
+
+        result = self.runner.invoke(diff, ["--cached"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, "similarity index 100%\nrename from src/main.py\n"
+                                        "rename to main.py\n")
+
+        result = self.runner.invoke(diff, ["--cached", "--no-renames"])
+
+        self.assertIn("--- a/src/main.py\n+++ /dev/null", result.output)
+        self.assertIn("--- /dev/null\n+++ b/main.py", result.output)
+
+    def test_unknown_argument(self):
+        """Test that an argument that is neither a commit nor a path is rejected."""
+        result = self.runner.invoke(diff, ["nonexistent"])
+
+        self.assertEqual(result.exit_code, 128)
+
+    def test_log_patch(self):
+        """Test that log -p shows each commit's changes."""
+        result = self.runner.invoke(log, ["-p"])
+
+        self.assertEqual(result.exit_code, 0)
+        second, first = result.output.split(f"commit {self.first}")
+        self.assertIn("+print(2)", second)
+        self.assertIn("+++ b/docs/guide.md", second)
+        self.assertIn("--- /dev/null\n+++ b/README.md", first)
@@ -0,0 +1,127 @@
+"""
+Tests for the 'repack' and 'gc' commands.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from click.testing import CliRunner
+
+from gitelle.commands.gc import gc
+from gitelle.commands.repack import collect_reachable_objects, repack_repository
+from gitelle.core.objects import Blob, Commit, Tree
+from gitelle.core.repository import Repository
+
+
+class TestRepackCommand(TestCase):
+    """Tests for the 'repack' and 'gc' commands."""
+
+    def setUp(self):
+        """Set up a repository with a short history."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+
+        self.commit_ids = []
+        parent_ids = []
+        for i in range(3):
+            blob_id = Blob(self.repo, f"version {i}\n".encode()).write()
+            tree = Tree(self.repo)
+            tree.add_entry("100644", "file.txt", blob_id)
+            commit = Commit(self.repo)
+            commit.tree_id = tree.write()
+            commit.parent_ids = parent_ids
+            commit.author = f"Test User <test@example.com> {1577836800 + i} +0000"
+            commit.committer = commit.author
+            commit.message = f"Commit {i}"
+            commit_id = commit.write()
+            self.commit_ids.append(commit_id)
+            parent_ids = [commit_id]
+
+        branch = self.repo.get_branch("main")
+        branch.set_target(self.commit_ids[-1])
+        branch.save()
+
+        # An object that no reference points to
+        self.unreachable_id = Blob(self.repo, b"unreachable").write()
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        self.repo.object_store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_collect_reachable_objects_order(self):
+        """Test that commits come first, newest first."""
+        objects = collect_reachable_objects(self.repo)
+        object_ids = [object_id for object_id, _, _ in objects]
+
+        self.assertEqual(object_ids[:3], list(reversed(self.commit_ids)))
+        self.assertEqual(len(objects), 9)
+        self.assertNotIn(self.unreachable_id, object_ids)
+
+    def test_repack_prunes_packed_loose_objects(self):
+        """Test that repacking moves reachable objects into one pack."""
+        stats = repack_repository(self.repo, delete_redundant=True)
+
+        self.assertEqual(stats["objects"], 9)
+        self.assertEqual(stats["pruned"], 9)
+        self.assertEqual(len(list((self.repo.objects_dir / "pack").glob("*.pack"))), 1)
+
+        # Reachable objects are still readable, from the pack
+        for commit_id in self.commit_ids:
+            self.assertFalse(self.repo.object_store.loose_path(commit_id).exists())
+            self.assertEqual(self.repo.get_object(commit_id).type, "commit")
+
+        # Unreachable loose objects are left alone
+        self.assertTrue(self.repo.object_store.loose_path(self.unreachable_id).exists())
+
+    def test_repack_replaces_old_packs(self):
+        """Test that a second repack consolidates into a single pack."""
+        repack_repository(self.repo, delete_redundant=True)
+        (self.repo_path / "new.txt").write_bytes(b"staged")
+        self.repo.index.add([Path("new.txt")])
+
+        stats = repack_repository(self.repo, delete_redundant=True)
+
+        self.assertEqual(stats["objects"], 10)
+        self.assertEqual(stats["packs_removed"], 1)
+        self.assertEqual(len(list((self.repo.objects_dir / "pack").glob("*.pack"))), 1)
+        self.assertEqual(self.repo.get_object(Blob(self.repo, b"staged").id).data, b"staged")
+
+    def test_repack_keeps_cache_tree_trees(self):
+        """Test that trees only the index's cache-tree refers to survive a repack."""
+        (self.repo_path / "sub").mkdir()
+        (self.repo_path / "sub" / "a.txt").write_bytes(b"a")
+        self.repo.index.add([Path("sub/a.txt")])
+        self.repo.commit("Add sub")
+        subtree_id = self.repo.index.cache_tree.find("sub").object_id
+        repack_repository(self.repo, delete_redundant=True)
+
+        # Moving the branch back leaves the trees referenced by the index only
+        branch = self.repo.get_branch("main")
+        branch.set_target(self.commit_ids[-1])
+        branch.save()
+        repack_repository(self.repo, delete_redundant=True)
+
+        self.assertTrue(self.repo.object_store.contains(subtree_id))
+        (self.repo_path / "b.txt").write_bytes(b"b")
+        self.repo.index.add([Path("b.txt")])
+        commit = self.repo.get_object(self.repo.commit("Reuse sub"))
+        tree = self.repo.get_object(commit.tree_id)
+        self.assertIn(subtree_id, [entry.id for entry in tree.entries])
+        self.assertEqual(self.repo.get_object(subtree_id).type, "tree")
+
+    def test_gc_command(self):
+        """Test the 'gc' command."""
+        cwd = os.getcwd()
+        os.chdir(self.repo_path)
+        try:
+            result = CliRunner().invoke(gc)
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Packed 9 objects", result.output)
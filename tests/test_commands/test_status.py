@@ -11,7 +11,7 @@ from click.testing import CliRunner
 from gitelle.commands.init import init
 from gitelle.commands.add import add
 from gitelle.commands.commit import commit
-from gitelle.commands.status import status, get_status
+from gitelle.commands.status import status, get_status, quote_path
 from gitelle.core.repository import Repository
 
 
@@ -100,6 +100,36 @@ class TestStatusCommand(TestCase):
             self.assertIn("changes not staged for commit", result.output.lower())
             self.assertIn("modified.txt", result.output)
     
+    def test_status_staged_changes_against_head(self):
+        """Test that staged changes are compared with the HEAD commit."""
+        with self.runner.isolated_filesystem():
+            # Initialize a repository
+            self.runner.invoke(init)
+            
+            # Commit three files
+            for name in ("kept.txt", "changed.txt", "removed.txt"):
+                with open(name, "w") as f:
+                    f.write(f"{name} content")
+            self.runner.invoke(add, ["kept.txt", "changed.txt", "removed.txt"])
+            self.runner.invoke(commit, ["-m", "Initial commit"])
+            
+            # Stage a modification and a removal
+            with open("changed.txt", "w") as f:
+                f.write("new content")
+            self.runner.invoke(add, ["changed.txt"])
+            repo = Repository.find()
+            repo.index.remove(["removed.txt"])
+            repo.index.write()
+            os.remove("removed.txt")
+            
+            # Check status
+            result = self.runner.invoke(status)
+            self.assertEqual(result.exit_code, 0)
+            self.assertIn("modified:   changed.txt", result.output)
+            self.assertIn("deleted:    removed.txt", result.output)
+            self.assertNotIn("kept.txt", result.output)
+            self.assertNotIn("changes not staged", result.output.lower())
+    
     def test_status_short(self):
         """Test status with short output format."""
         with self.runner.isolated_filesystem():
@@ -127,6 +157,52 @@ class TestStatusCommand(TestCase):
                 if "untracked.txt" in line:
                     self.assertTrue(line.startswith("? "))
     
+    def test_status_porcelain_v2(self):
+        """Test the NUL-terminated porcelain v2 format."""
+        with self.runner.isolated_filesystem():
+            # Initialize a repository
+            self.runner.invoke(init)
+            
+            # Commit a file, then stage and make changes
+            with open("changed.txt", "w") as f:
+                f.write("original")
+            self.runner.invoke(add, ["changed.txt"])
+            self.runner.invoke(commit, ["-m", "Initial commit"])
+            
+            with open("changed.txt", "w") as f:
+                f.write("staged")
+            with open("new file.txt", "w") as f:
+                f.write("new")
+            self.runner.invoke(add, ["changed.txt", "new file.txt"])
+            with open("changed.txt", "w") as f:
+                f.write("unstaged")
+            with open("untracked.txt", "w") as f:
+                f.write("untracked")
+            
+            repo = Repository.find()
+            head_id = repo.get_object(repo.get_object(repo.head.get_resolved_target()).tree_id).entries[0].id
+            changed_id = repo.index.entries["changed.txt"].object_id
+            new_id = repo.index.entries["new file.txt"].object_id
+            
+            result = self.runner.invoke(status, ["--porcelain=v2", "-z"])
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(result.output.split("\0"), [
+                f"1 MM N... 100644 100644 100644 {head_id} {changed_id} changed.txt",
+                f"1 A. N... 000000 100644 100644 {'0' * 40} {new_id} new file.txt",
+                "? untracked.txt",
+                "",
+            ])
+            
+            # Porcelain v1 without -z
+            result = self.runner.invoke(status, ["--porcelain"])
+            self.assertEqual(result.output, "MM changed.txt\nA  new file.txt\n?? untracked.txt\n")
+    
+    def test_quote_path(self):
+        """Test that paths with special characters are quoted."""
+        self.assertEqual(quote_path("plain name.txt"), "plain name.txt")
+        self.assertEqual(quote_path('a"b\\c\td'), '"a\\"b\\\\c\\td"')
+        self.assertEqual(quote_path("caf\u00e9"), '"caf\\303\\251"')
+    
     def test_get_status_function(self):
         """Test the get_status function."""
         with self.runner.isolated_filesystem():
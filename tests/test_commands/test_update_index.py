@@ -0,0 +1,69 @@
+"""
+Tests for the 'update-index' command.
+"""
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from click.testing import CliRunner
+
+from gitelle.commands.update_index import update_index
+from gitelle.core.index import Index
+from gitelle.core.repository import Repository
+
+
+class TestUpdateIndexCommand(TestCase):
+    """Tests for the 'update-index' command."""
+
+    def setUp(self):
+        """Set up a repository with two tracked files."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        self.runner = CliRunner()
+
+        past = time.time() - 60
+        for name in ("a.txt", "b.txt"):
+            (self.repo_path / name).write_text(name)
+            os.utime(self.repo_path / name, (past, past))
+
+        index = Index(self.repo)
+        index.add([Path("a.txt"), Path("b.txt")])
+        index.write()
+
+        self.cwd = os.getcwd()
+        os.chdir(self.repo_path)
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_refresh_clean(self):
+        """Test that touched files are refreshed without being reported."""
+        os.utime(self.repo_path / "a.txt")
+
+        result = self.runner.invoke(update_index, ["--refresh"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, "")
+        entry = Index(self.repo).entries["a.txt"]
+        self.assertEqual(entry.mtime_ns, os.stat(self.repo_path / "a.txt").st_mtime_ns)
+
+    def test_refresh_reports_changed_files(self):
+        """Test that modified and deleted files need an update."""
+        (self.repo_path / "a.txt").write_text("changed")
+        (self.repo_path / "b.txt").unlink()
+
+        result = self.runner.invoke(update_index, ["--refresh"])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertEqual(result.output, "a.txt: needs update\nb.txt: needs update\n")
+
+        result = self.runner.invoke(update_index, ["--refresh", "-q"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertEqual(result.output, "")
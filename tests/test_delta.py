@@ -0,0 +1,186 @@
+"""
+Tests for delta compression and deltified packs.
+"""
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from click.testing import CliRunner
+
+from gitelle.commands.cat_file import cat_file
+from gitelle.commands.log import log
+from gitelle.commands.repack import repack_repository
+from gitelle.core.pack import Pack, find_delta_bases, write_pack
+from gitelle.core.repository import Repository
+from gitelle.utils.delta import apply_delta, create_delta, get_delta_sizes
+
+
+def make_object(obj_type, data):
+    """Build a (object ID, type, data) tuple."""
+    header = f"{obj_type} {len(data)}".encode() + b"\x00"
+    return hashlib.sha1(header + data).hexdigest(), obj_type, data
+
+
+class TestDelta(TestCase):
+    """Tests for the delta encoder and decoder."""
+
+    def test_roundtrip_small_edit(self):
+        """Test that an edited buffer is rebuilt from a small delta."""
+        source = b"".join(b"line %d of the configuration file\n" % i for i in range(2000))
+        target = source.replace(b"line 1000 ", b"edited line 1000 ")
+
+        delta = create_delta(source, target)
+
+        self.assertEqual(apply_delta(source, delta), target)
+        self.assertEqual(get_delta_sizes(delta), (len(source), len(target)))
+        self.assertLess(len(delta), 200)
+
+    def test_roundtrip_unrelated_data(self):
+        """Test deltas between unrelated and degenerate buffers."""
+        rng = random.Random(42)
+        cases = [
+            (b"", b""),
+            (b"", b"new content"),
+            (b"old content", b""),
+            (bytes(rng.getrandbits(8) for _ in range(5000)),
+             bytes(rng.getrandbits(8) for _ in range(3000))),
+            (b"a" * 200000, b"a" * 200001),
+        ]
+
+        for source, target in cases:
+            self.assertEqual(apply_delta(source, create_delta(source, target)), target)
+
+    def test_apply_delta_checks_source_size(self):
+        """Test that a delta is rejected for the wrong base."""
+        delta = create_delta(b"x" * 100, b"x" * 120)
+
+        with self.assertRaises(ValueError):
+            apply_delta(b"x" * 99, delta)
+
+
+class TestDeltaPack(TestCase):
+    """Tests for writing and reading deltified packs."""
+
+    def setUp(self):
+        """Set up a temporary directory for tests."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        self.pack_dir = self.repo.objects_dir / "pack"
+
+        # Many revisions of the same file, newest first
+        base = [b"setting_%d = %d\n" % (i, i) for i in range(500)]
+        self.objects = []
+        for revision in range(20, 0, -1):
+            lines = list(base)
+            lines[revision * 10] = b"setting_changed = %d\n" % revision
+            self.objects.append(make_object("blob", b"".join(lines)))
+        self.paths = {object_id: "config/app.ini" for object_id, _, _ in self.objects}
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        self.repo.object_store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_find_delta_bases_respects_depth(self):
+        """Test that delta chains never exceed the maximum depth."""
+        deltas = find_delta_bases(self.objects, self.paths, window=10, depth=3)
+
+        self.assertTrue(deltas)
+        for position in deltas:
+            chain = 0
+            while position in deltas:
+                position = deltas[position][0]
+                chain += 1
+            self.assertLessEqual(chain, 3)
+
+    def test_deltified_pack_roundtrip(self):
+        """Test that a deltified pack is smaller and reads back the same."""
+        plain = write_pack(self.pack_dir / "plain", self.objects)
+        packed = write_pack(self.pack_dir, self.objects, self.paths, window=10)
+
+        self.assertLess(packed.stat().st_size * 5, plain.stat().st_size)
+
+        for object_id, _, data in self.objects:
+            self.assertEqual(self.repo.get_object(object_id).data, data)
+
+    def test_parallel_search_matches_serial_output(self):
+        """Test that a parallel search produces a readable pack."""
+        pack_path = write_pack(self.pack_dir, self.objects, self.paths, window=4, workers=2)
+
+        pack = Pack(pack_path)
+        try:
+            for object_id, obj_type, data in self.objects:
+                self.assertEqual(pack.read_object(bytes.fromhex(object_id)), (obj_type, data))
+        finally:
+            pack.close()
+
+
+class TestRepackedDeltaInfo(TestCase):
+    """Tests for reading the size of deltified objects after a repack."""
+
+    def setUp(self):
+        """Set up a repository with two revisions of a large text file."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+
+        # Random words compress poorly, so the deltas' zlib streams start
+        # with a dynamic Huffman table longer than their size header
+        rng = random.Random(7)
+        words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(8))
+                 for _ in range(4000)]
+        lines = [" ".join(rng.choice(words) for _ in range(8)) + "\n" for _ in range(2000)]
+        self.blob_ids = []
+        for revision in range(2):
+            # Edits spread over the file give a delta of a few hundred bytes
+            for i in range(revision, len(lines), 100):
+                lines[i] = " ".join(rng.choice(words) for _ in range(8)) + "\n"
+            lines[1000 + revision] = f"edited line {revision}\n"
+            (self.repo_path / "data.txt").write_text("".join(lines))
+            self.repo.index.add(["data.txt"])
+            self.repo.commit(f"revision {revision}")
+            self.blob_ids.append(self.repo.index.entries["data.txt"].object_id)
+
+        repack_repository(self.repo, delete_redundant=True)
+        self.repo.object_store.close()
+        self.cwd = os.getcwd()
+        os.chdir(self.repo_path)
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        os.chdir(self.cwd)
+        self.repo.object_store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_read_info_of_deltified_objects(self):
+        """Test that every blob reports its type and full size."""
+        repo = Repository(self.repo_path)
+        sizes = [len(repo.get_object(blob_id).data) for blob_id in self.blob_ids]
+
+        self.assertGreater(min(sizes), 100000)
+        self.assertEqual([repo.object_store.info(blob_id) for blob_id in self.blob_ids],
+                         [("blob", size) for size in sizes])
+        repo.object_store.close()
+
+    def test_commands_on_deltified_objects(self):
+        """Test that cat-file -s and log -p work on deltified objects."""
+        runner = CliRunner()
+        expected = len((self.repo_path / "data.txt").read_bytes())
+
+        for blob_id in self.blob_ids:
+            result = runner.invoke(cat_file, ["-s", blob_id])
+            self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(result.output.strip(), str(expected))
+
+        result = runner.invoke(log, ["-p"])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("+edited line 1", result.output)
+        self.assertIn("revision 0", result.output)
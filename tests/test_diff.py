@@ -0,0 +1,118 @@
+"""
+Tests for the line diff and unified diff formatting.
+"""
+import random
+from unittest import TestCase
+
+from gitelle.utils.diff import DIFF_ALGORITHMS, create_unified_diff, diff_lines
+
+
+def apply_changes(a_lines, b_lines, changes):
+    """Rebuild the second file from the first and a list of changes."""
+    result = []
+    i = 0
+    for a_start, a_count, b_start, b_count in changes:
+        result.extend(a_lines[i:a_start])
+        result.extend(b_lines[b_start:b_start + b_count])
+        i = a_start + a_count
+    result.extend(a_lines[i:])
+    return result
+
+
+class TestDiffLines(TestCase):
+    """Tests for diff_lines."""
+
+    def test_changes_rebuild_the_new_file(self):
+        """Test that the changes of every algorithm turn one file into the other."""
+        rng = random.Random(7)
+        for _ in range(50):
+            a_lines = [rng.choice("abcdefg") for _ in range(rng.randrange(200))]
+            b_lines = list(a_lines)
+            for _ in range(rng.randrange(20)):
+                position = rng.randrange(len(b_lines) + 1)
+                if rng.random() < 0.5 or not b_lines:
+                    b_lines.insert(position, rng.choice("abcxyz"))
+                else:
+                    del b_lines[min(position, len(b_lines) - 1)]
+
+            for algorithm in DIFF_ALGORITHMS:
+                changes = diff_lines(a_lines, b_lines, algorithm)
+                self.assertEqual(apply_changes(a_lines, b_lines, changes), b_lines)
+
+    def test_minimal_edit_script(self):
+        """Test that the minimal algorithm finds the shortest edit script."""
+        changes = diff_lines(list("abcabba"), list("cbabac"), "minimal")
+
+        self.assertEqual(sum(a_count + b_count for _, a_count, _, b_count in changes), 5)
+
+    def test_changes_slide_like_git(self):
+        """Test that an ambiguous insertion is placed where Git puts it."""
+        a_lines = ["a", "b", "a", "b"]
+        b_lines = ["a", "b", "a", "b", "a", "b"]
+
+        for algorithm in DIFF_ALGORITHMS:
+            self.assertEqual(diff_lines(a_lines, b_lines, algorithm), [(4, 0, 4, 2)])
+
+    def test_histogram_and_patience_anchor_on_unique_lines(self):
+        """Test that unique lines are matched instead of repeated braces."""
+        a_lines = ["f() {", "}", "g() {", "  x", "}"]
+        b_lines = ["g() {", "  x", "}", "f() {", "}"]
+
+        for algorithm in ("patience", "histogram"):
+            self.assertEqual(diff_lines(a_lines, b_lines, algorithm), [(0, 2, 0, 0), (5, 0, 3, 2)])
+
+    def test_unknown_algorithm(self):
+        """Test that an unknown algorithm is rejected."""
+        with self.assertRaises(ValueError):
+            diff_lines(["a"], ["b"], "fastest")
+
+
+class TestUnifiedDiff(TestCase):
+    """Tests for create_unified_diff."""
+
+    def test_equal_files(self):
+        """Test that equal files have an empty diff."""
+        self.assertEqual(create_unified_diff(["a", "b"], ["a", "b"]), "")
+
+    def test_hunks(self):
+        """Test the hunk layout, ranges and context."""
+        a_lines = [f"line {i}" for i in range(1, 21)]
+        b_lines = list(a_lines)
+        b_lines[1] = "changed 2"
+        del b_lines[17]
+
+        diff = create_unified_diff(a_lines, b_lines, "a/file.txt", "b/file.txt")
+
+        self.assertEqual(diff.split("\n"), [
+            "--- a/file.txt",
+            "+++ b/file.txt",
+            "@@ -1,5 +1,5 @@",
+            " line 1",
+            "-line 2",
+            "+changed 2",
+            " line 3",
+            " line 4",
+            " line 5",
+            "@@ -15,6 +15,5 @@ line 14",
+            " line 15",
+            " line 16",
+            " line 17",
+            "-line 18",
+            " line 19",
+            " line 20",
+        ])
+
+    def test_empty_ranges(self):
+        """Test the ranges of a file created from nothing and of one emptied."""
+        self.assertEqual(create_unified_diff([], ["new"]).split("\n")[2], "@@ -0,0 +1 @@")
+        self.assertEqual(create_unified_diff(["old", "lines"], []).split("\n")[2], "@@ -1,2 +0,0 @@")
+
+    def test_function_name(self):
+        """Test that the hunk header names the closest preceding definition."""
+        a_lines = ["def first():", "    pass", "", "class Second:", "    x = 1",
+                   "    y = 2", "    z = 3", "    w = 4"]
+        b_lines = a_lines[:-1] + ["    w = 5"]
+
+        diff = create_unified_diff(a_lines, b_lines, context_lines=1)
+
+        self.assertIn("@@ -7,2 +7,2 @@ class Second:", diff.split("\n"))
@@ -0,0 +1,77 @@
+"""
+Tests for the file system utilities.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+from gitelle.utils.filesystem import scan_tree, walk_files
+from gitelle.utils.ignore import IgnoreMatcher
+
+
+class TestScanTree(TestCase):
+    """Tests for the scan_tree function."""
+
+    def setUp(self):
+        """Set up a temporary working tree."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.root = Path(self.temp_dir)
+
+        for path in ("b.txt", "a/z.txt", "a/b/c.txt", "a.txt", "out/x.bin",
+                     ".gitelle/objects/ab/cdef", "sub/.gitelle/HEAD"):
+            (self.root / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.root / path).write_text(path)
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_order_and_stat_data(self):
+        """Test that files come in a stable order with their stat data."""
+        result = list(scan_tree(self.root))
+
+        self.assertEqual(
+            [path for path, _ in result],
+            ["a.txt", "b.txt", "a/z.txt", "a/b/c.txt", "out/x.bin"]
+        )
+        for path, file_stat in result:
+            self.assertEqual(file_stat.st_ino, os.stat(self.root / path).st_ino)
+
+    def test_gitelle_directories_are_not_read(self):
+        """Test that .gitelle directories are pruned before being read."""
+        with mock.patch("gitelle.utils.filesystem.os.scandir", wraps=os.scandir) as scandir:
+            list(scan_tree(self.root))
+
+        read = {os.path.relpath(call.args[0], self.root) for call in scandir.call_args_list}
+        self.assertEqual(read, {".", "a", "a/b", "out", "sub"})
+
+    def test_ignored_directories_are_pruned(self):
+        """Test that ignored directories are skipped and tracked files kept."""
+        (self.root / ".gitignore").write_text("out/\n*.txt\n")
+        ignore = IgnoreMatcher(self.root)
+
+        paths = [path for path, _ in scan_tree(self.root, ignore=ignore, tracked={"a/z.txt"})]
+
+        self.assertEqual(paths, [".gitignore", "a/z.txt"])
+
+    def test_subdirectory(self):
+        """Test walking a subdirectory with paths relative to the root."""
+        paths = [path for path, _ in scan_tree(self.root, "a")]
+
+        self.assertEqual(paths, ["a/z.txt", "a/b/c.txt"])
+
+    def test_parallel_matches_serial(self):
+        """Test that reading directories in parallel doesn't change the result."""
+        serial = list(scan_tree(self.root))
+        parallel = list(scan_tree(self.root, workers=4))
+
+        self.assertEqual(parallel, serial)
+
+    def test_walk_files(self):
+        """Test that walk_files lists the same files as Paths."""
+        self.assertEqual(
+            sorted(walk_files(self.root)),
+            sorted(Path(path) for path, _ in scan_tree(self.root))
+        )
@@ -0,0 +1,298 @@
+"""
+Tests for the file system monitor integration.
+"""
+import os
+import shlex
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest import TestCase, mock
+
+from gitelle.core import fsmonitor
+from gitelle.core.fsmonitor import FSMonitorResult, decode_ewah, encode_ewah
+from gitelle.core.fsmonitor_daemon import FSMonitorDaemon, InotifyBackend, PollingBackend
+from gitelle.core.index import Index
+from gitelle.core.repository import Repository
+from gitelle.core.untracked_cache import UntrackedCache, UntrackedDir
+
+
+# A hook that answers with the token and paths stored in hook-answer
+HOOK_SCRIPT = """
+import sys
+with open(sys.argv[0] + "-answer", "rb") as f:
+    sys.stdout.buffer.write(f.read())
+"""
+
+
+class TestExtensionFormat(TestCase):
+    """Tests for the FSMN extension and its EWAH bitmaps."""
+
+    def test_ewah_round_trip(self):
+        """Test that bitmaps of various sizes survive encoding."""
+        for bits, size in ((set(), 0), ({0}, 1), ({1, 63, 64, 200}, 201), (set(range(130)), 130)):
+            self.assertEqual(decode_ewah(encode_ewah(bits, size)), (bits, size))
+
+    def test_decode_run_length_words(self):
+        """Test decoding the run-length words other writers produce."""
+        # A run of two all-ones words followed by one literal word
+        words = [1 | (2 << 1) | (1 << 33), 0b101]
+        data = struct.pack(">LL", 192, len(words)) + struct.pack(">2Q", *words) + struct.pack(">L", 0)
+
+        bits, size = decode_ewah(data)
+
+        self.assertEqual(size, 192)
+        self.assertEqual(bits, set(range(128)) | {128, 130})
+
+    def test_extension_round_trip(self):
+        """Test that the token and dirty entries survive serialization."""
+        data = fsmonitor.serialize_extension("token:1", {2, 5}, 8)
+
+        self.assertEqual(fsmonitor.parse_extension(data), ("token:1", {2, 5}, 8))
+        with self.assertRaises(ValueError):
+            fsmonitor.parse_extension(data[:10])
+
+    def test_parse_result(self):
+        """Test parsing monitor answers."""
+        result = FSMonitorResult.parse(b"t2\x00a.txt\x00src/\x00")
+        self.assertEqual((result.token, result.paths), ("t2", ["a.txt", "src/"]))
+
+        self.assertIsNone(FSMonitorResult.parse(b"t3\x00a.txt\x00/\x00").paths)
+        with self.assertRaises(ValueError):
+            FSMonitorResult.parse(b"")
+
+
+class TestIndexWithHook(TestCase):
+    """Tests for the index with a monitor hook."""
+
+    def setUp(self):
+        """Set up a temporary repository with a monitor hook."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+
+        for path in ("a.txt", "b.txt", "src/main.py", "src/util.py"):
+            (self.repo_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.repo_path / path).write_text(path)
+
+        self.hook = Path(self.temp_dir) / "hook"
+        self.hook.write_text(HOOK_SCRIPT)
+        self.answer("t1")
+        self.repo.config.set("core", "fsmonitor", f"{shlex.quote(sys.executable)} {shlex.quote(str(self.hook))}")
+
+        index = Index(self.repo)
+        index.add(["a.txt", "b.txt", "src"])
+        index.write()
+
+        # The first answer can't be compared with a token, so everything
+        # is checked once and marked valid
+        index = Index(self.repo)
+        self.assertEqual(index.refresh(), [])
+        index.write()
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+
+    def answer(self, token, *paths):
+        """Set the hook's next answer."""
+        data = token.encode() + b"\x00" + b"".join(path.encode() + b"\x00" for path in paths)
+        Path(str(self.hook) + "-answer").write_bytes(data)
+
+    def stat_calls(self, index):
+        """Refresh an index and return the changes and the stat()ed paths."""
+        with mock.patch.object(Index, "_stat_files", autospec=True,
+                               side_effect=Index._stat_files) as stat_files:
+            changes = index.refresh()
+        return changes, [path for call in stat_files.call_args_list for path in call.args[1]]
+
+    def test_token_and_valid_entries_are_stored(self):
+        """Test that the FSMN extension keeps the token and valid entries."""
+        index = Index(self.repo)
+
+        self.assertEqual(index.fsmonitor_token, "t1")
+        self.assertTrue(all(entry.fsmonitor_valid for entry in index.entries.values()))
+
+    def test_only_reported_paths_are_checked(self):
+        """Test that unreported entries are neither stat()ed nor hashed."""
+        (self.repo_path / "b.txt").write_text("changed")
+        (self.repo_path / "src/util.py").write_text("changed too")
+        self.answer("t2", "src/util.py")
+
+        index = Index(self.repo)
+        changes, checked = self.stat_calls(index)
+
+        # b.txt wasn't reported, so it's trusted to be unchanged
+        self.assertEqual(changes, [("M", "src/util.py")])
+        self.assertEqual(checked, ["src/util.py"])
+        self.assertEqual(index.fsmonitor_token, "t2")
+        self.assertTrue(index.dirty)
+
+    def test_directory_paths(self):
+        """Test that a reported directory invalidates the entries below it."""
+        self.answer("t2", "src/")
+
+        _, checked = self.stat_calls(Index(self.repo))
+
+        self.assertEqual(checked, ["src/main.py", "src/util.py"])
+
+    def test_trivial_answer_checks_everything(self):
+        """Test that a "/" path means every entry has to be checked."""
+        self.answer("t2", "/")
+
+        _, checked = self.stat_calls(Index(self.repo))
+
+        self.assertEqual(len(checked), 4)
+
+    def test_failing_hook_drops_the_token(self):
+        """Test that a failing monitor falls back to checking everything."""
+        self.hook.write_text("import sys; sys.exit(1)")
+
+        index = Index(self.repo)
+        _, checked = self.stat_calls(index)
+        index.write()
+
+        self.assertEqual(len(checked), 4)
+        self.assertIsNone(Index(self.repo).fsmonitor_token)
+
+    def test_untracked_cache_is_trusted(self):
+        """Test that unreported directories are listed without stat()."""
+        (self.repo_path / "src/new.py").write_text("new")
+        old = os.path.getmtime(self.repo_path) - 60
+        for directory in ("", "src"):
+            os.utime(self.repo_path / directory, (old, old))
+        index = Index(self.repo)
+        self.assertEqual(index.list_untracked(), ["src/new.py"])
+        index.write()
+
+        (self.repo_path / "src/other.py").write_text("other")
+        self.answer("t2")
+        with mock.patch.object(UntrackedCache, "_stat_ignore_file") as stat_calls:
+            untracked = Index(self.repo).list_untracked()
+
+        self.assertEqual(untracked, ["src/new.py"])
+        stat_calls.assert_not_called()
+
+        self.answer("t3", "src/other.py")
+        self.assertEqual(Index(self.repo).list_untracked(), ["src/new.py", "src/other.py"])
+
+    def test_disabling_the_monitor_drops_the_extension(self):
+        """Test that the token isn't kept once core.fsmonitor is unset."""
+        self.repo.config.set("core", "fsmonitor", "false")
+        index = Index(self.repo)
+
+        self.assertEqual(index.refresh(), [])
+        self.assertTrue(index.dirty)
+        index.write()
+        self.assertIsNone(Index(self.repo).fsmonitor_token)
+
+
+class TestUntrackedCacheInvalidation(TestCase):
+    """Tests for UntrackedCache.invalidate_changed."""
+
+    def test_invalidate_changed(self):
+        """Test which listings a set of changed paths drops."""
+        cache = UntrackedCache()
+        for directory in ("", "a", "a/b", "a/b/c", "a/bc", "d", "d/e", "f", "g"):
+            cache.dirs[directory] = UntrackedDir(0, 0, (0, 0), [], [])
+
+        cache.invalidate_changed(["a/b/", "d/.gitignore", "f/x.txt"])
+
+        self.assertEqual(sorted(cache.dirs), ["", "a/bc", "g"])
+        self.assertTrue(cache.dirty)
+
+
+class TestDaemon(TestCase):
+    """Tests for the fsmonitor daemon."""
+
+    def setUp(self):
+        """Set up a temporary repository."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        (self.repo_path / "src").mkdir()
+        (self.repo_path / "src/main.py").write_text("main")
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+
+    def check_backend(self, backend_class):
+        """Run a daemon with a backend and check the changes it reports."""
+        daemon = FSMonitorDaemon(self.repo_path, backend_class(str(self.repo_path)))
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        try:
+            for _ in range(200):
+                if fsmonitor.send_request(self.repo, b"ping") == b"ok":
+                    break
+                threading.Event().wait(0.01)
+
+            first = fsmonitor.query_daemon(self.repo, None)
+            first = FSMonitorResult.parse(first)
+            self.assertIsNone(first.paths)
+
+            (self.repo_path / "src/main.py").write_text("changed")
+            (self.repo_path / "docs/api").mkdir(parents=True)
+            (self.repo_path / "docs/api/index.md").write_text("new")
+            (self.repo_path / ".gitelle/ignored").write_text("not watched")
+
+            second = FSMonitorResult.parse(fsmonitor.query_daemon(self.repo, first.token))
+            self.assertIn("src/main.py", second.paths)
+            self.assertIn("docs/", second.paths)
+            self.assertIn("docs/api/index.md", second.paths)
+            self.assertFalse(any(path.startswith(".gitelle") for path in second.paths))
+
+            third = FSMonitorResult.parse(fsmonitor.query_daemon(self.repo, second.token))
+            self.assertEqual((third.token, third.paths), (second.token, []))
+
+            # Tokens of another daemon get the trivial answer
+            self.assertIsNone(FSMonitorResult.parse(
+                fsmonitor.query_daemon(self.repo, "gitelle:other:1")).paths)
+        finally:
+            fsmonitor.send_request(self.repo, b"quit")
+            thread.join(10)
+
+        self.assertFalse(thread.is_alive())
+        self.assertIsNone(fsmonitor.send_request(self.repo, b"ping"))
+
+    def test_polling_backend(self):
+        """Test the daemon with the polling backend."""
+        self.check_backend(PollingBackend)
+
+    def test_inotify_backend(self):
+        """Test the daemon with the inotify backend."""
+        try:
+            InotifyBackend(str(self.repo_path)).close()
+        except (OSError, AttributeError):
+            self.skipTest("inotify is not available")
+        self.check_backend(InotifyBackend)
+
+    def test_index_uses_daemon(self):
+        """Test that status queries the daemon when core.fsmonitor is true."""
+        self.repo.config.set("core", "fsmonitor", "true")
+        daemon = FSMonitorDaemon(self.repo_path, PollingBackend(str(self.repo_path)))
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        try:
+            for _ in range(200):
+                if fsmonitor.send_request(self.repo, b"ping") == b"ok":
+                    break
+                threading.Event().wait(0.01)
+
+            index = Index(self.repo)
+            index.add(["src"])
+            self.assertEqual(index.refresh(), [])
+            index.write()
+
+            (self.repo_path / "src/main.py").write_text("changed")
+            index = Index(self.repo)
+            self.assertEqual(index.refresh(), [("M", "src/main.py")])
+            self.assertTrue(index.fsmonitor_token.startswith("gitelle:"))
+        finally:
+            fsmonitor.send_request(self.repo, b"quit")
+            thread.join(10)
@@ -0,0 +1,157 @@
+"""
+Tests for the ignore rules.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from gitelle.utils.filesystem import walk_files
+from gitelle.utils.ignore import IgnoreMatcher, IgnoreRules, translate_glob
+
+
+class TestIgnoreRules(TestCase):
+    """Tests for the IgnoreRules class."""
+
+    def assertIgnored(self, rules, path, is_dir=False):
+        self.assertTrue(rules.match(path, is_dir), path)
+
+    def assertNotIgnored(self, rules, path, is_dir=False):
+        self.assertFalse(rules.match(path, is_dir), path)
+
+    def test_literal_name_matches_at_any_depth(self):
+        """Test that a pattern without a slash matches basenames."""
+        rules = IgnoreRules(["node_modules"])
+
+        self.assertIgnored(rules, "node_modules", is_dir=True)
+        self.assertIgnored(rules, "web/app/node_modules", is_dir=True)
+        self.assertNotIgnored(rules, "node_modules_old")
+
+    def test_extension(self):
+        """Test that "*.ext" patterns match by extension."""
+        rules = IgnoreRules(["*.pyc", "*.tar.gz"])
+
+        self.assertIgnored(rules, "a/b/c.pyc")
+        self.assertIgnored(rules, ".pyc")
+        self.assertIgnored(rules, "dist/pkg-1.0.tar.gz")
+        self.assertNotIgnored(rules, "c.py")
+        self.assertNotIgnored(rules, "c.pyc.txt")
+
+    def test_anchored_patterns(self):
+        """Test that a leading or inner slash anchors a pattern."""
+        rules = IgnoreRules(["/build", "docs/out", "src/*.o"])
+
+        self.assertIgnored(rules, "build", is_dir=True)
+        self.assertNotIgnored(rules, "lib/build", is_dir=True)
+        self.assertIgnored(rules, "docs/out", is_dir=True)
+        self.assertNotIgnored(rules, "web/docs/out", is_dir=True)
+        self.assertIgnored(rules, "src/main.o")
+        self.assertNotIgnored(rules, "src/sub/main.o")
+
+    def test_directory_only(self):
+        """Test that a trailing slash only matches directories."""
+        rules = IgnoreRules(["cache/"])
+
+        self.assertIgnored(rules, "cache", is_dir=True)
+        self.assertNotIgnored(rules, "cache")
+
+    def test_negation_and_order(self):
+        """Test that the last matching pattern wins."""
+        rules = IgnoreRules(["*.log", "!keep.log", "keep.log", "!*.txt", "notes.txt"])
+
+        self.assertIgnored(rules, "debug.log")
+        self.assertIgnored(rules, "keep.log")
+        self.assertIgnored(rules, "notes.txt")
+        self.assertIsNone(rules.match("readme.md"))
+        self.assertFalse(IgnoreRules(["*.log", "!keep.log"]).match("keep.log"))
+
+    def test_double_star(self):
+        """Test "**" across directories."""
+        rules = IgnoreRules(["**/logs", "a/**/b", "out/**"])
+
+        self.assertIgnored(rules, "x/y/logs", is_dir=True)
+        self.assertIgnored(rules, "a/b")
+        self.assertIgnored(rules, "a/x/y/b")
+        self.assertIgnored(rules, "out/x/y")
+        self.assertNotIgnored(rules, "out", is_dir=True)
+
+    def test_comments_blank_lines_and_escapes(self):
+        """Test comments, trailing spaces and backslash escapes."""
+        rules = IgnoreRules(["# comment", "", r"\#hash", r"\!bang", "spaced   ", r"star\*"])
+
+        self.assertIgnored(rules, "#hash")
+        self.assertIgnored(rules, "!bang")
+        self.assertIgnored(rules, "spaced")
+        self.assertIgnored(rules, "star*")
+        self.assertNotIgnored(rules, "starry")
+        self.assertNotIgnored(rules, "# comment")
+
+    def test_base_directory(self):
+        """Test that the patterns of a nested file only apply below it."""
+        rules = IgnoreRules(["*.tmp", "/local"], base="sub")
+
+        self.assertIgnored(rules, "sub/a.tmp")
+        self.assertIgnored(rules, "sub/local")
+        self.assertIsNone(rules.match("a.tmp"))
+        self.assertIsNone(rules.match("sub/x/local"))
+
+    def test_translate_glob(self):
+        """Test the glob translation."""
+        self.assertEqual(translate_glob("a?[!b]*"), r"a[^/][^b][^/]*\Z")
+
+
+class TestIgnoreMatcher(TestCase):
+    """Tests for the IgnoreMatcher class."""
+
+    def setUp(self):
+        """Set up a temporary working tree."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.root = Path(self.temp_dir)
+
+        for path in ("a.txt", "a.log", "build/out.bin", "src/main.py", "src/gen/x.py",
+                     "src/keep.log", "node_modules/pkg/index.js"):
+            (self.root / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.root / path).write_text(path)
+
+        (self.root / ".gitignore").write_text("*.log\nbuild/\nnode_modules\n")
+        (self.root / "src/.gitignore").write_text("gen/\n!keep.log\n")
+        (self.root / "exclude").write_text("a.txt\n")
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_nested_files_take_precedence(self):
+        """Test that deeper .gitignore files override shallower ones."""
+        matcher = IgnoreMatcher(self.root)
+
+        self.assertTrue(matcher.is_ignored("a.log"))
+        self.assertFalse(matcher.is_ignored("src/keep.log"))
+        self.assertTrue(matcher.is_ignored("src/gen", is_dir=True))
+        self.assertFalse(matcher.is_ignored("src/main.py"))
+
+    def test_exclude_file(self):
+        """Test that the exclude file applies with the lowest precedence."""
+        self.assertFalse(IgnoreMatcher(self.root).is_ignored("a.txt"))
+
+        matcher = IgnoreMatcher(self.root, self.root / "exclude")
+
+        self.assertTrue(matcher.is_ignored("a.txt"))
+        self.assertNotEqual(matcher.exclude_id, "")
+
+    def test_is_path_ignored_checks_parents(self):
+        """Test that files inside ignored directories are ignored."""
+        matcher = IgnoreMatcher(self.root)
+
+        self.assertTrue(matcher.is_path_ignored("build/out.bin"))
+        self.assertFalse(matcher.is_ignored("build/out.bin"))
+        self.assertFalse(matcher.is_path_ignored("src/main.py"))
+
+    def test_walk_files_prunes_ignored_directories(self):
+        """Test that walk_files doesn't list ignored files."""
+        files = walk_files(self.root, ignore=IgnoreMatcher(self.root))
+
+        self.assertEqual(
+            sorted(path.as_posix() for path in files),
+            [".gitignore", "a.txt", "exclude", "src/.gitignore", "src/keep.log", "src/main.py"]
+        )
@@ -4,10 +4,13 @@ Tests for the Index class.
 import os
 import shutil
 import tempfile
+import time
 from pathlib import Path
-from unittest import TestCase
+from unittest import TestCase, mock
 
+from gitelle.core.cache_tree import CacheTree
 from gitelle.core.index import Index, IndexEntry
+from gitelle.core.objects import Blob, Tree
 from gitelle.core.repository import Repository
 
 
@@ -101,6 +104,111 @@ class TestIndex(TestCase):
         self.assertIn("test1.txt", new_index.entries)
         self.assertIn("test2.txt", new_index.entries)
     
+    def test_index_add_skips_unchanged_files(self):
+        """Test that re-adding files only hashes the ones whose stat data changed."""
+        for name in ("a.txt", "b.txt"):
+            file_path = self.repo_path / name
+            file_path.write_text(f"content of {name}")
+            past = time.time() - 60
+            os.utime(file_path, (past, past))
+        
+        index = Index(self.repo)
+        index.add([Path("a.txt"), Path("b.txt")])
+        index.write()
+        
+        self.repo_path.joinpath("b.txt").write_text("changed")
+        
+        index = Index(self.repo)
+        with mock.patch("gitelle.core.index.Blob.from_file", wraps=Blob.from_file) as from_file:
+            index.add([Path("a.txt"), Path("b.txt")])
+        
+        self.assertEqual(from_file.call_count, 1)
+        self.assertEqual(self.repo.get_object(index.entries["b.txt"].object_id).data, b"changed")
+    
+    def test_index_add_parallel_matches_serial(self):
+        """Test that the parallel add pipeline builds the same index as a serial add."""
+        for i in range(40):
+            file_path = self.repo_path / f"dir{i % 3}" / f"file{i:02d}.txt"
+            file_path.parent.mkdir(exist_ok=True)
+            file_path.write_text(f"content {i}\n" * i)
+        
+        serial = Index(self.repo)
+        serial.add([Path(".")], workers=1)
+        parallel = Index(self.repo)
+        parallel.add([Path(".")], workers=4)
+        
+        self.assertEqual(len(serial.entries), 40)
+        self.assertEqual(list(serial.entries), list(parallel.entries))
+        for path, entry in serial.entries.items():
+            self.assertEqual(parallel.entries[path].object_id, entry.object_id)
+        self.assertEqual(serial.get_tree_id(), parallel.get_tree_id())
+    
+    def test_index_add_directory_skips_repository_dir(self):
+        """Test that adding the root directory doesn't add the .gitelle directory."""
+        self.repo_path.joinpath("test.txt").write_text("test content")
+        
+        index = Index(self.repo)
+        index.add([Path(".")])
+        
+        self.assertEqual(list(index.entries), ["test.txt"])
+    
+    def test_index_add_directory_skips_ignored_files(self):
+        """Test that expanding a directory skips untracked ignored files."""
+        for path in ("main.py", "main.pyc", "build/out.bin", "tracked.log"):
+            (self.repo_path / path).parent.mkdir(exist_ok=True)
+            (self.repo_path / path).write_text(path)
+        (self.repo_path / ".gitignore").write_text("*.pyc\nbuild/\n*.log\n")
+        
+        index = Index(self.repo)
+        index.add([Path("tracked.log")])
+        index.add([Path(".")])
+        
+        self.assertEqual(sorted(index.entries), [".gitignore", "main.py", "tracked.log"])
+    
+    def test_index_add_rehashes_racy_entries(self):
+        """Test that entries not older than the index file are re-checked."""
+        file_path = self.repo_path / "test.txt"
+        file_path.write_text("Test content")
+        
+        index = Index(self.repo)
+        index.add([Path("test.txt")])
+        index.write()
+        
+        # Make the entry as new as the index file
+        index = Index(self.repo)
+        index.timestamp_ns = index.entries["test.txt"].mtime_ns
+        
+        with mock.patch("gitelle.core.index.Blob.from_file", wraps=Blob.from_file) as from_file:
+            index.add([Path("test.txt")])
+        
+        self.assertEqual(from_file.call_count, 1)
+    
+    def test_index_write_smudges_racily_clean_entries(self):
+        """Test that a racily clean entry with stale content is smudged."""
+        file_path = self.repo_path / "test.txt"
+        file_path.write_text("Test content")
+        
+        # A modification time after the index is written makes the entry racy
+        future = time.time() + 60
+        os.utime(file_path, (future, future))
+        
+        index = Index(self.repo)
+        index.add([Path("test.txt")])
+        clean_id = index.entries["test.txt"].object_id
+        index.write()
+        self.assertNotEqual(index.entries["test.txt"].size, 0)
+        
+        # Stat data still matches but the recorded content is stale
+        index.entries["test.txt"].object_id = Blob(self.repo, b"Other content").write()
+        index.write()
+        
+        new_index = Index(self.repo)
+        self.assertEqual(new_index.entries["test.txt"].size, 0)
+        self.assertFalse(new_index.entries["test.txt"].matches_stat(file_path.stat()))
+        
+        new_index.add([Path("test.txt")])
+        self.assertEqual(new_index.entries["test.txt"].object_id, clean_id)
+    
     def test_index_get_tree_id(self):
         """Test creating a tree from the index."""
         # Create a file
@@ -125,6 +233,380 @@ class TestIndex(TestCase):
         # Check that the tree contains the file
         self.assertEqual(len(tree.entries), 1)
         self.assertEqual(tree.entries[0].name, "test.txt")
+    
+    def test_index_get_tree_id_reuses_cached_subtrees(self):
+        """Test that only directories along changed paths are rebuilt."""
+        for path in ("a/one.txt", "a/deep/two.txt", "b/three.txt", "top.txt"):
+            (self.repo_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.repo_path / path).write_text(path)
+        
+        index = Index(self.repo)
+        index.add([Path("a"), Path("b"), Path("top.txt")])
+        first_tree_id = index.get_tree_id()
+        index.write()
+        
+        # The cache-tree is persisted in the index
+        index = Index(self.repo)
+        self.assertTrue(index.cache_tree.find("a/deep").is_valid)
+        
+        (self.repo_path / "a/deep/two.txt").write_text("changed")
+        index.add([Path("a/deep/two.txt")])
+        self.assertTrue(index.cache_tree.find("b").is_valid)
+        
+        with mock.patch("gitelle.core.index.Tree.write", autospec=True,
+                        side_effect=Tree.write) as tree_write:
+            second_tree_id = index.get_tree_id()
+        
+        # Only the root, "a" and "a/deep" are rebuilt
+        self.assertEqual(tree_write.call_count, 3)
+        self.assertNotEqual(first_tree_id, second_tree_id)
+        
+        # The result matches a build from scratch
+        index.cache_tree = CacheTree()
+        self.assertEqual(index.get_tree_id(), second_tree_id)
+    
+    def test_index_get_tree_id_after_remove(self):
+        """Test that removed directories drop out of the tree."""
+        for path in ("a/one.txt", "b/two.txt"):
+            (self.repo_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.repo_path / path).write_text(path)
+        
+        index = Index(self.repo)
+        index.add([Path("a"), Path("b")])
+        index.get_tree_id()
+        index.remove([Path("b/two.txt")])
+        
+        tree = self.repo.get_object(index.get_tree_id())
+        
+        self.assertEqual([entry.name for entry in tree.entries], ["a"])
+        self.assertIsNone(index.cache_tree.find("b"))
+
+
+class TestIndexVersion4(TestCase):
+    """Tests for index format version 4."""
+    
+    def setUp(self):
+        """Set up a repository with files under a deep shared prefix."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        
+        deep = self.repo_path / "src/main/java/org/example/project/module"
+        deep.mkdir(parents=True)
+        for i in range(30):
+            (deep / f"Class{i:02d}.java").write_text(f"class {i}")
+        (self.repo_path / "README.md").write_text("readme")
+        
+        self.index = Index(self.repo)
+        self.index.add([Path("src"), Path("README.md")])
+    
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_v4_roundtrip_is_smaller(self):
+        """Test that v4 round-trips every entry in a smaller file."""
+        self.index.write()
+        v2_size = self.repo.index_file.stat().st_size
+        
+        self.repo.config.set("index", "version", "4")
+        self.index.write()
+        
+        self.assertEqual(self.repo.index_file.read_bytes()[4:8], b"\x00\x00\x00\x04")
+        self.assertLess(self.repo.index_file.stat().st_size, v2_size)
+        
+        new_index = Index(self.repo)
+        self.assertEqual(list(new_index.entries), sorted(self.index.entries))
+        for path, entry in new_index.entries.items():
+            self.assertEqual(entry.object_id, self.index.entries[path].object_id)
+            self.assertEqual(entry.mtime_ns, self.index.entries[path].mtime_ns)
+    
+    def test_v2_index_is_read_when_v4_is_configured(self):
+        """Test that an existing v2 index is still read after switching to v4."""
+        self.index.write()
+        self.repo.config.set("index", "version", "4")
+        
+        self.assertEqual(len(Index(self.repo).entries), 31)
+    
+    def test_v4_path_compression(self):
+        """Test the encoding of a path against the previous one."""
+        entry = IndexEntry()
+        entry.object_id = "0123456789abcdef0123456789abcdef01234567"
+        entry.path = "src/lib/beta.py"
+        
+        data = entry.serialize_v4(b"src/lib/alpha.py")
+        
+        self.assertTrue(data.endswith(b"\x08beta.py\x00"))
+        parsed, offset, path = IndexEntry.parse_v4(data, 0, b"src/lib/alpha.py")
+        self.assertEqual(parsed.path, "src/lib/beta.py")
+        self.assertEqual(path, b"src/lib/beta.py")
+        self.assertEqual(offset, len(data))
+    
+    def test_unsupported_version(self):
+        """Test that an unsupported configured version is rejected."""
+        self.repo.config.set("index", "version", "3")
+        
+        with self.assertRaises(ValueError):
+            self.index.write()
+
+
+class TestIndexOffsetTable(TestCase):
+    """Tests for the entry offset table and parallel index loading."""
+    
+    def setUp(self):
+        """Set up a repository with enough entries for several blocks."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        
+        self.index = Index(self.repo)
+        for i in range(50):
+            entry = IndexEntry()
+            entry.mode = 0o100644
+            entry.size = i
+            entry.object_id = f"{i:040x}"
+            entry.path = f"dir{i % 4}/sub/file{i:02d}.txt"
+            entry.flags = len(entry.path)
+            self.index.entries[entry.path] = entry
+        
+        patcher = mock.patch("gitelle.core.index.IEOT_BLOCK_SIZE", 7)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+    
+    def read_entries(self, threads):
+        self.repo.config.set("index", "threads", str(threads))
+        index = Index(self.repo)
+        return [(e.path, e.object_id, e.size) for e in index.entries.values()]
+    
+    def test_offset_table_is_written(self):
+        """Test that the offset table and end-of-entries extensions are written."""
+        self.index.write()
+        data = self.repo.index_file.read_bytes()
+        
+        self.assertIn(b"IEOT", data)
+        self.assertEqual(data[-20 - 32:-20 - 28], b"EOIE")
+    
+    def test_parallel_read_matches_sequential(self):
+        """Test that both index versions decode identically on a thread pool."""
+        for version in ("2", "4"):
+            self.repo.config.set("index", "version", version)
+            self.index.write()
+            
+            with mock.patch.object(Index, "_parse_entries_parallel",
+                                   autospec=True, side_effect=Index._parse_entries_parallel) as parallel:
+                parallel_entries = self.read_entries(4)
+            
+            self.assertEqual(parallel.call_count, 1)
+            self.assertEqual(parallel_entries, self.read_entries(1))
+            self.assertEqual(len(parallel_entries), 50)
+    
+    def test_parallel_read_verifies_checksum(self):
+        """Test that a corrupt index is rejected when decoded in parallel."""
+        self.index.write()
+        data = bytearray(self.repo.index_file.read_bytes())
+        data[100] ^= 0xFF
+        self.repo.index_file.write_bytes(bytes(data))
+        
+        self.repo.config.set("index", "threads", "4")
+        with self.assertRaises(ValueError):
+            Index(self.repo)
+
+
+class TestSplitIndex(TestCase):
+    """Tests for split index mode."""
+    
+    def setUp(self):
+        """Set up a repository with split index enabled and 50 tracked files."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        self.repo.config.set("core", "splitIndex", "true")
+        
+        self.paths = []
+        for i in range(50):
+            path = f"dir{i % 5}/file{i:02d}.txt"
+            (self.repo_path / path).parent.mkdir(exist_ok=True)
+            (self.repo_path / path).write_text(path)
+            self.paths.append(Path(path))
+        
+        index = Index(self.repo)
+        index.add(self.paths)
+        index.write()
+    
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+    
+    def shared_indexes(self):
+        return sorted(self.repo.gitelle_dir.glob("sharedindex.*"))
+    
+    def test_small_change_writes_only_the_delta(self):
+        """Test that the main index only holds changed and deleted entries."""
+        shared_before = self.shared_indexes()
+        full_size = shared_before[0].stat().st_size
+        
+        index = Index(self.repo)
+        (self.repo_path / "dir0/file00.txt").write_text("changed")
+        (self.repo_path / "new.txt").write_text("new")
+        index.add([Path("dir0/file00.txt"), Path("new.txt")])
+        index.remove([Path("dir1/file01.txt")])
+        expected = {path: entry.object_id for path, entry in index.entries.items()}
+        index.write()
+        
+        self.assertEqual(self.shared_indexes(), shared_before)
+        self.assertLess(self.repo.index_file.stat().st_size, full_size)
+        
+        new_index = Index(self.repo)
+        self.assertEqual(
+            {path: entry.object_id for path, entry in new_index.entries.items()}, expected
+        )
+    
+    def test_large_change_consolidates(self):
+        """Test that a delta above the threshold writes a new shared index."""
+        (old_shared,) = self.shared_indexes()
+        
+        index = Index(self.repo)
+        index.remove(self.paths[:20])
+        index.write()
+        
+        self.assertEqual(len(self.shared_indexes()), 2)
+        
+        new_index = Index(self.repo)
+        self.assertEqual(len(new_index.entries), 30)
+        self.assertNotEqual("sharedindex." + new_index._shared_id, old_shared.name)
+        self.assertIn(self.repo.gitelle_dir / ("sharedindex." + new_index._shared_id), self.shared_indexes())
+    
+    def test_disabling_split_index(self):
+        """Test that turning split index off writes a self-contained index."""
+        self.repo.config.set("core", "splitIndex", "false")
+        index = Index(self.repo)
+        index.write()
+        
+        for path in self.shared_indexes():
+            path.unlink()
+        
+        self.assertEqual(len(Index(self.repo).entries), 50)
+
+
+class TestIndexDiff(TestCase):
+    """Tests for comparing the index with a tree and the working tree."""
+    
+    def setUp(self):
+        """Set up a repository with a committed tree."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        
+        for path in ("a.txt", "lib/x.py", "lib/y.py", "src/main.py", "src/util/io.py"):
+            (self.repo_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.repo_path / path).write_text(path)
+        
+        self.index = Index(self.repo)
+        self.index.add([Path(".")])
+        self.tree_id = self.index.get_tree_id()
+    
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_diff_tree_unchanged(self):
+        """Test that an index matching the tree has no changes."""
+        self.assertEqual(self.index.diff_tree(self.tree_id), [])
+        self.assertEqual(self.index.diff_tree(None), [
+            ("A", "a.txt"), ("A", "lib/x.py"), ("A", "lib/y.py"),
+            ("A", "src/main.py"), ("A", "src/util/io.py"),
+        ])
+    
+    def test_diff_tree_changes(self):
+        """Test that added, modified and deleted files are reported."""
+        (self.repo_path / "src/main.py").write_text("changed")
+        (self.repo_path / "lib/z.py").write_text("new")
+        self.index.add([Path("src/main.py"), Path("lib/z.py")])
+        self.index.remove([Path("src/util/io.py")])
+        
+        self.assertEqual(self.index.diff_tree(self.tree_id), [
+            ("A", "lib/z.py"), ("M", "src/main.py"), ("D", "src/util/io.py"),
+        ])
+    
+    def test_diff_tree_file_replaced_by_directory(self):
+        """Test that a file becoming a directory is a deletion and additions."""
+        self.index.remove([Path("a.txt")])
+        (self.repo_path / "a.txt").unlink()
+        (self.repo_path / "a.txt").mkdir()
+        (self.repo_path / "a.txt/inner").write_text("inner")
+        self.index.add([Path("a.txt/inner")])
+        
+        self.assertEqual(self.index.diff_tree(self.tree_id), [
+            ("D", "a.txt"), ("A", "a.txt/inner"),
+        ])
+    
+    def test_diff_tree_skips_unchanged_subtrees(self):
+        """Test that only the trees along changed paths are read."""
+        (self.repo_path / "src/util/io.py").write_text("changed")
+        self.index.add([Path("src/util/io.py")])
+        
+        with mock.patch.object(self.repo, "get_object", wraps=self.repo.get_object) as get_object:
+            changes = self.index.diff_tree(self.tree_id)
+        
+        self.assertEqual(changes, [("M", "src/util/io.py")])
+        self.assertEqual(get_object.call_count, 3)
+    
+    def test_diff_files(self):
+        """Test that modified and deleted working tree files are reported."""
+        past = time.time() - 60
+        for path in self.index.entries:
+            os.utime(self.repo_path / path, (past, past))
+        self.index = Index(self.repo)
+        self.index.add([Path(".")])
+        self.index.write()
+        
+        (self.repo_path / "lib/x.py").write_text("changed")
+        (self.repo_path / "a.txt").unlink()
+        
+        # Touching a file without changing it isn't a modification
+        os.utime(self.repo_path / "lib/y.py")
+        
+        self.assertEqual(self.index.diff_files(), [("D", "a.txt"), ("M", "lib/x.py")])
+    
+    def test_refresh_updates_stat_data_of_unchanged_files(self):
+        """Test that a touched but unchanged file is hashed only once."""
+        past = time.time() - 60
+        for path in self.index.entries:
+            os.utime(self.repo_path / path, (past, past))
+        self.index = Index(self.repo)
+        self.index.add([Path(".")])
+        self.index.write()
+        
+        os.utime(self.repo_path / "lib/y.py", (past + 1, past + 1))
+        index = Index(self.repo)
+        self.assertEqual(index.refresh(), [])
+        self.assertTrue(index.dirty)
+        index.write()
+        
+        index = Index(self.repo)
+        with mock.patch.object(Index, "_matches_content") as matches_content:
+            self.assertEqual(index.refresh(), [])
+        matches_content.assert_not_called()
+        self.assertFalse(index.dirty)
+    
+    def test_refresh_in_parallel(self):
+        """Test that the parallel stat and verify phases give the same result."""
+        (self.repo_path / "lib/x.py").write_text("changed")
+        (self.repo_path / "a.txt").unlink()
+        
+        with mock.patch("gitelle.core.index.REFRESH_CHUNK_SIZE", 2):
+            parallel = self.index.refresh(workers=3)
+        
+        self.assertEqual(parallel, self.index.refresh(workers=1))
+        self.assertEqual(parallel, [("D", "a.txt"), ("M", "lib/x.py")])
 
 
 class TestIndexEntry(TestCase):
@@ -154,6 +636,8 @@ class TestIndexEntry(TestCase):
         # Check the entry fields
         self.assertEqual(entry.path, "test.txt")
         self.assertIsNotNone(entry.object_id)
+        self.assertEqual(entry.mtime_ns, file_path.stat().st_mtime_ns)
+        self.assertTrue(entry.matches_stat(file_path.stat()))
         
         # Get the blob object
         blob = self.repo.get_object(entry.object_id)
@@ -177,4 +661,39 @@ class TestIndexEntry(TestCase):
         
         # Check that the fields were preserved
         self.assertEqual(deserialized.path, "test.txt")
-        self.assertEqual(deserialized.object_id, entry.object_id)
\ No newline at end of file
+        self.assertEqual(deserialized.object_id, entry.object_id)
+    
+    def test_index_entry_padding(self):
+        """Test that every path length round-trips with 1-8 bytes of padding."""
+        index = Index(self.repo)
+        for length in range(1, 20):
+            entry = IndexEntry()
+            entry.mode = 0o100644
+            entry.object_id = "0123456789abcdef0123456789abcdef01234567"
+            entry.path = "p" * length
+            entry.flags = length
+            
+            serialized = entry.serialize()
+            
+            self.assertEqual(len(serialized) % 8, 0)
+            self.assertEqual(serialized[-1:], b"\x00")
+            index.entries[entry.path] = entry
+        
+        index.write()
+        
+        self.assertEqual(list(Index(self.repo).entries), sorted(index.entries))
+    
+    def test_index_entry_long_path(self):
+        """Test paths longer than the 12-bit length stored in the flags."""
+        entry = IndexEntry()
+        entry.object_id = "0123456789abcdef0123456789abcdef01234567"
+        entry.path = "d/" * 3000 + "file.txt"
+        entry.flags = 0xFFF
+        
+        data = b"\xff" * 8 + entry.serialize() + entry.serialize()
+        
+        first, offset = IndexEntry.parse(data, 8)
+        second, end = IndexEntry.parse(data, offset)
+        self.assertEqual(first.path, entry.path)
+        self.assertEqual(second.path, entry.path)
+        self.assertEqual(end, len(data))
@@ -4,6 +4,7 @@ Tests for Git objects (blob, tree, commit).
 import os
 import shutil
 import tempfile
+import tracemalloc
 from pathlib import Path
 from unittest import TestCase
 
@@ -63,6 +64,32 @@ class TestBlob(TestCase):
         # Create a blob from the file
         blob = Blob.from_file(self.repo, file_path)
         self.assertEqual(blob.data, data)
+    
+    def test_blob_from_file_streams_large_file(self):
+        """Test that hashing and writing a file-backed blob uses bounded memory."""
+        # Create a file much larger than the streaming chunk size
+        file_path = self.repo_path / "large.bin"
+        chunk = bytes(range(256)) * 4096
+        with open(file_path, "wb") as f:
+            for _ in range(16):
+                f.write(chunk)
+        size = file_path.stat().st_size
+        
+        tracemalloc.start()
+        try:
+            blob = Blob.from_file(self.repo, file_path)
+            blob_id = blob.write()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        
+        # Memory use stays far below the file size
+        self.assertLess(peak, size // 4)
+        
+        # The result matches the in-memory implementation
+        self.assertEqual(blob_id, Blob(self.repo, chunk * 16).id)
+        self.assertEqual(Blob.read(self.repo, blob_id).data, chunk * 16)
+        self.assertEqual(Blob.from_file(self.repo, file_path).id, blob_id)
 
 
 class TestTree(TestCase):
@@ -115,6 +142,31 @@ class TestTree(TestCase):
         self.assertEqual(deserialized.entries[1].name, "script.sh")
         self.assertEqual(deserialized.entries[1].id, "abcdef0123456789abcdef0123456789abcdef01")
     
+    def test_tree_git_sort_order(self):
+        """Test that directories sort as if their name ended with a slash."""
+        tree = Tree(self.repo)
+        tree.add_entry("40000", "foo", "0123456789abcdef0123456789abcdef01234567")
+        tree.add_entry("100644", "foo.txt", "abcdef0123456789abcdef0123456789abcdef01")
+        tree.add_entry("100644", "foo0", "abcdef0123456789abcdef0123456789abcdef01")
+        
+        deserialized = Tree.deserialize(self.repo, tree.serialize())
+        
+        self.assertEqual([e.name for e in deserialized.entries], ["foo.txt", "foo", "foo0"])
+    
+    def test_tree_large_roundtrip(self):
+        """Test parsing a large tree with raw object IDs."""
+        tree = Tree(self.repo)
+        for i in range(50000):
+            tree.add_entry("100644", f"file{i:06d}.txt", f"{i:040x}")
+        serialized = tree.serialize()
+        
+        deserialized = Tree.deserialize(self.repo, serialized)
+        
+        self.assertEqual(len(deserialized.entries), 50000)
+        self.assertEqual(deserialized.entries[123].raw_id, bytes.fromhex(f"{123:040x}"))
+        self.assertEqual(deserialized.entries[123].id, f"{123:040x}")
+        self.assertEqual(deserialized.serialize(), serialized)
+    
     def test_tree_write_read(self):
         """Test writing and reading a tree."""
         # Create a tree with entries
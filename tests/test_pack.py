@@ -0,0 +1,111 @@
+"""
+Tests for packfile and pack index support.
+"""
+import hashlib
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from gitelle.core.objects import Blob, Tree
+from gitelle.core.pack import Pack, PackIndex, write_pack, write_pack_index
+from gitelle.core.repository import Repository
+
+
+def build_pack(pack_dir, objects):
+    """
+    Write a pack for a list of (type, data) tuples and return their IDs.
+    """
+    object_ids = [
+        hashlib.sha1(f"{t} {len(d)}".encode() + b"\x00" + d).hexdigest()
+        for t, d in objects
+    ]
+    write_pack(pack_dir, [(i, t, d) for i, (t, d) in zip(object_ids, objects)])
+    return object_ids
+
+
+class TestPack(TestCase):
+    """Tests for reading objects from packs."""
+
+    def setUp(self):
+        """Set up a temporary directory for tests."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        self.pack_dir = self.repo.objects_dir / "pack"
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        self.repo.object_store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_pack_index_lookup(self):
+        """Test binary search over the fanout buckets of a pack index."""
+        objects = [("blob", f"content {i}".encode() * (i + 1)) for i in range(50)]
+        object_ids = build_pack(self.pack_dir, objects)
+
+        idx_path = next(self.pack_dir.glob("*.idx"))
+        index = PackIndex(idx_path)
+        try:
+            self.assertEqual(len(index), 50)
+            for object_id in object_ids:
+                self.assertIn(bytes.fromhex(object_id), index)
+            self.assertNotIn(b"\x00" * 20, index)
+            self.assertNotIn(b"\xff" * 20, index)
+        finally:
+            index.close()
+
+    def test_pack_read_object(self):
+        """Test reading objects directly from a pack."""
+        objects = [("blob", b"x" * 1000), ("blob", b"small")]
+        object_ids = build_pack(self.pack_dir, objects)
+
+        pack = Pack(next(self.pack_dir.glob("*.pack")))
+        try:
+            for (obj_type, data), object_id in zip(objects, object_ids):
+                self.assertEqual(pack.read_object(bytes.fromhex(object_id)), (obj_type, data))
+        finally:
+            pack.close()
+
+    def test_repository_reads_packed_objects(self):
+        """Test that get_object resolves packed objects before loose ones."""
+        tree = Tree(self.repo)
+        tree.add_entry("100644", "file.txt", Blob(self.repo, b"packed").id)
+        blob_id, tree_id = build_pack(
+            self.pack_dir, [("blob", b"packed"), ("tree", tree.serialize())]
+        )
+
+        self.assertEqual(self.repo.get_object(blob_id).data, b"packed")
+        self.assertEqual(self.repo.get_object(tree_id).entries[0].name, "file.txt")
+
+        # Packed objects are not rewritten as loose objects
+        Blob(self.repo, b"packed").write()
+        self.assertFalse(self.repo.object_store.loose_path(blob_id).exists())
+
+    def test_loose_fallback(self):
+        """Test that loose objects are still found when packs exist."""
+        build_pack(self.pack_dir, [("blob", b"packed")])
+        loose_id = Blob(self.repo, b"loose").write()
+
+        self.assertEqual(self.repo.get_object(loose_id).data, b"loose")
+
+    def test_new_pack_is_picked_up(self):
+        """Test that packs created after the first lookup are found."""
+        self.assertFalse(self.repo.object_store.contains(Blob(self.repo, b"late").id))
+
+        (blob_id,) = build_pack(self.pack_dir, [("blob", b"late")])
+
+        self.assertEqual(self.repo.get_object(blob_id).data, b"late")
+
+    def test_large_offsets(self):
+        """Test that offsets above 2 GiB round-trip through the index."""
+        object_id = bytes.fromhex(Blob(self.repo, b"far").id)
+        idx_path = self.pack_dir / "pack-large.idx"
+        write_pack_index(idx_path, [(object_id, 0x123456789, 0)], b"\x00" * 20)
+
+        index = PackIndex(idx_path)
+        try:
+            self.assertEqual(index.find_offset(object_id), 0x123456789)
+        finally:
+            index.close()
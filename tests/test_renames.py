@@ -0,0 +1,167 @@
+"""
+Tests for rename and copy detection.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+from gitelle.core.renames import RenameDetector, compute_signature, detect_renames, estimate_similarity
+from gitelle.core.repository import Repository
+from gitelle.core.tree_diff import TreeChange
+
+
+def make_lines(name, count):
+    """Build distinct lines of content."""
+    return "".join(f"{name} line {i} with some text\n" for i in range(count))
+
+
+class TestSimilarity(TestCase):
+    """Tests for content signatures."""
+
+    def test_signature_counts_bytes(self):
+        """Test that chunks end at newlines or after 64 bytes."""
+        data = b"a\n" * 3 + b"x" * 100 + b"\nend"
+
+        signature = compute_signature(data)
+
+        self.assertEqual(sum(signature.values()), len(data))
+        self.assertEqual(signature[hash(b"a\n")], 6)
+        self.assertEqual(signature[hash(b"x" * 64)], 64)
+
+    def test_estimate_similarity(self):
+        """Test similarity estimates for equal, edited and unrelated content."""
+        old = make_lines("old", 10).encode()
+        edited = old.replace(b"old line 3 ", b"new line 3 ").replace(b"old line 7 ", b"new line 7 ")
+        unrelated = make_lines("other", 10).encode()
+
+        def similarity(a, b):
+            return estimate_similarity(compute_signature(a), len(a), compute_signature(b), len(b))
+
+        self.assertEqual(similarity(old, old), 100)
+        self.assertEqual(similarity(old, edited), 80)
+        self.assertEqual(similarity(old, unrelated), 0)
+
+
+class TestRenameDetector(TestCase):
+    """Tests for RenameDetector."""
+
+    def setUp(self):
+        """Set up a temporary repository."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+
+    def deleted(self, path, content):
+        """Build the change of a deleted file."""
+        return TreeChange("D", path, 0o100644, self.repo.create_blob(content.encode()), 0, None)
+
+    def added(self, path, content, mode=0o100644):
+        """Build the change of an added file."""
+        return TreeChange("A", path, 0, None, mode, self.repo.create_blob(content.encode()))
+
+    def modified(self, path, old, new):
+        """Build the change of a modified file."""
+        return TreeChange("M", path, 0o100644, self.repo.create_blob(old.encode()),
+                          0o100644, self.repo.create_blob(new.encode()))
+
+    def summary(self, changes):
+        """Summarize changes as (status, old path, path, similarity) tuples."""
+        return [(change.status, change.old_path, change.path, change.similarity) for change in changes]
+
+    def test_exact_renames(self):
+        """Test that moved files are paired by blob ID, preferring equal names."""
+        content = make_lines("same", 5)
+        changes = [
+            self.deleted("old/a.txt", content),
+            self.deleted("old/b.txt", content),
+            self.added("new/b.txt", content),
+            self.added("new/a.txt", content),
+            self.added("new/c.txt", content),
+        ]
+
+        with mock.patch("gitelle.core.renames.compute_signature") as compute:
+            result = detect_renames(self.repo, changes)
+            compute.assert_not_called()
+
+        self.assertEqual(self.summary(result), [
+            ("R", "old/b.txt", "new/b.txt", 100),
+            ("R", "old/a.txt", "new/a.txt", 100),
+            ("A", "new/c.txt", "new/c.txt", 0),
+        ])
+
+    def test_inexact_renames(self):
+        """Test that edited files are paired with their most similar source."""
+        first, second = make_lines("first", 10), make_lines("second", 10)
+        changes = [
+            self.deleted("first.txt", first),
+            self.deleted("second.txt", second),
+            self.added("renamed.txt", second.replace("second line 1 ", "changed ")),
+            self.added("unrelated.txt", make_lines("third", 10)),
+        ]
+
+        result = detect_renames(self.repo, changes)
+
+        self.assertEqual(self.summary(result), [
+            ("D", "first.txt", "first.txt", 0),
+            ("R", "second.txt", "renamed.txt", 90),
+            ("A", "unrelated.txt", "unrelated.txt", 0),
+        ])
+
+    def test_min_similarity_and_types(self):
+        """Test that dissimilar files and symlinks aren't paired."""
+        content = make_lines("content", 10)
+        changes = [
+            self.deleted("a.txt", content),
+            self.added("half.txt", make_lines("content", 4) + make_lines("other", 6)),
+            self.added("link", content, mode=0o120000),
+        ]
+
+        self.assertEqual([change.status for change in detect_renames(self.repo, changes)],
+                         ["D", "A", "A"])
+
+    def test_copies(self):
+        """Test that copies of modified and renamed files are found."""
+        kept, moved = make_lines("kept", 10), make_lines("moved", 10)
+        changes = [
+            self.modified("kept.txt", kept, kept + "more\n"),
+            self.deleted("moved.txt", moved),
+            self.added("copy-of-kept.txt", kept),
+            self.added("moved-1.txt", moved),
+            self.added("moved-2.txt", moved + "edited\n"),
+        ]
+
+        result = detect_renames(self.repo, changes, find_copies=True)
+        self.assertEqual(self.summary(result), [
+            ("M", "kept.txt", "kept.txt", 0),
+            ("C", "kept.txt", "copy-of-kept.txt", 100),
+            ("R", "moved.txt", "moved-1.txt", 100),
+            ("C", "moved.txt", "moved-2.txt", 97),
+        ])
+
+        result = detect_renames(self.repo, changes)
+        self.assertEqual([change.status for change in result], ["M", "A", "R", "A"])
+
+    def test_rename_limit(self):
+        """Test that inexact detection is skipped above the limit."""
+        changes = [self.deleted(f"old{i}.txt", make_lines(str(i), 10)) for i in range(3)]
+        changes += [self.added(f"new{i}.txt", make_lines(str(i), 10) + "x\n") for i in range(3)]
+        changes.append(self.added("exact.txt", make_lines("0", 10)))
+
+        detector = RenameDetector(self.repo, rename_limit=2)
+        result = detector.detect(changes)
+
+        # The exact rename is still found
+        self.assertEqual(detector.needed_limit, 3)
+        self.assertEqual([change.status for change in result], ["D", "D", "A", "A", "A", "R"])
+
+        # old0 went to exact.txt, so new0.txt stays an addition
+        detector = RenameDetector(self.repo, rename_limit=3)
+        self.assertEqual([change.status for change in detector.detect(changes)],
+                         ["A", "R", "R", "R"])
+        self.assertEqual(detector.needed_limit, 0)
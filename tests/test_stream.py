@@ -0,0 +1,86 @@
+"""
+Tests for streaming object reads.
+"""
+import hashlib
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from gitelle.commands.checkout import checkout_tree
+from gitelle.core.objects import Blob, Tree
+from gitelle.core.pack import write_pack
+from gitelle.core.repository import Repository
+from gitelle.core.stream import ObjectStream
+
+
+class TestObjectStream(TestCase):
+    """Tests for ObjectStore.open_stream."""
+
+    def setUp(self):
+        """Set up a temporary directory for tests."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        self.data = b"".join(b"%08d\n" % i for i in range(100000))
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        self.repo.object_store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def read_in_chunks(self, object_id, chunk_size):
+        """Read an object through a stream in fixed-size chunks."""
+        chunks = []
+        with self.repo.object_store.open_stream(object_id) as stream:
+            self.assertEqual(stream.type, "blob")
+            self.assertEqual(stream.size, len(self.data))
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                self.assertLessEqual(len(chunk), chunk_size)
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+    def test_loose_stream(self):
+        """Test streaming a loose object in small chunks."""
+        blob_id = Blob(self.repo, self.data).write()
+
+        self.assertEqual(self.read_in_chunks(blob_id, 1000), self.data)
+
+    def test_packed_stream(self):
+        """Test streaming whole and deltified packed objects."""
+        edited = self.data.replace(b"00050000", b"changed!")
+        objects = []
+        for data in (self.data, edited):
+            object_id = hashlib.sha1(b"blob %d\x00" % len(data) + data).hexdigest()
+            objects.append((object_id, "blob", data))
+        write_pack(self.repo.objects_dir / "pack", objects, window=10)
+
+        for object_id, _, data in objects:
+            with self.repo.object_store.open_stream(object_id) as stream:
+                self.assertEqual(b"".join(stream), data)
+
+        self.assertEqual(self.read_in_chunks(objects[0][0], 4096), self.data)
+
+    def test_in_memory_stream_small_chunks(self):
+        """Test that reading an in-memory stream in small chunks stays linear."""
+        data = self.data * 40
+        stream = ObjectStream.from_bytes("blob", data)
+
+        start = time.perf_counter()
+        chunks = iter(lambda: stream.read(64), b"")
+        self.assertEqual(b"".join(chunks), data)
+        self.assertLess(time.perf_counter() - start, 10)
+        self.assertEqual(stream.read(64), b"")
+
+    def test_checkout_writes_streamed_blob(self):
+        """Test that checkout_tree materializes blobs from streams."""
+        tree = Tree(self.repo)
+        tree.add_entry("100644", "big.txt", Blob(self.repo, self.data).write())
+        checkout_tree(self.repo, tree.write())
+
+        self.assertEqual((self.repo_path / "big.txt").read_bytes(), self.data)
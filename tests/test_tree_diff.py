@@ -0,0 +1,97 @@
+"""
+Tests for tree-to-tree diffs.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+from gitelle.core.repository import Repository
+from gitelle.core.tree_diff import TreeChange, iter_tree_changes
+
+
+class TestTreeDiff(TestCase):
+    """Tests for iter_tree_changes."""
+
+    def setUp(self):
+        """Set up a repository with a committed tree."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+
+        files = {"a.txt": "a", "lib/util.py": "util", "lib/deep/x.py": "x", "z.txt": "z"}
+        files.update({f"big{i}/file{j}.txt": f"{i} {j}" for i in range(20) for j in range(5)})
+        self.old_tree = self.commit_files(files)
+
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+
+    def commit_files(self, files, removed=()):
+        """Write files, stage them and removals, and return the index's tree ID."""
+        for path, content in files.items():
+            (self.repo_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.repo_path / path).write_text(content)
+        index = self.repo.index
+        index.add(list(files))
+        index.remove(list(removed))
+        return index.get_tree_id()
+
+    def test_equal_trees(self):
+        """Test that equal trees have no changes."""
+        self.assertEqual(list(iter_tree_changes(self.repo, self.old_tree, self.old_tree)), [])
+
+    def test_changes(self):
+        """Test added, deleted and modified files, in tree order."""
+        new_tree = self.commit_files({"lib/deep/x.py": "changed", "lib/new.py": "new"},
+                                     removed=["a.txt"])
+
+        changes = list(iter_tree_changes(self.repo, self.old_tree, new_tree))
+
+        self.assertEqual([(change.status, change.path) for change in changes],
+                         [("D", "a.txt"), ("M", "lib/deep/x.py"), ("A", "lib/new.py")])
+        modified = changes[1]
+        self.assertEqual((modified.old_mode, modified.new_mode), (0o100644, 0o100644))
+        self.assertNotEqual(modified.old_id, modified.new_id)
+        self.assertEqual(changes[2], TreeChange("A", "lib/new.py", 0, None, 0o100644, changes[2].new_id))
+
+    def test_file_replaced_by_directory(self):
+        """Test that a file turned into a directory is a deletion and additions."""
+        (self.repo_path / "z.txt").unlink()
+        new_tree = self.commit_files({"z.txt/inner.txt": "inner"}, removed=["z.txt"])
+
+        changes = iter_tree_changes(self.repo, self.old_tree, new_tree)
+
+        self.assertEqual([(change.status, change.path) for change in changes],
+                         [("D", "z.txt"), ("A", "z.txt/inner.txt")])
+
+    def test_empty_trees(self):
+        """Test comparing with an empty tree."""
+        added = list(iter_tree_changes(self.repo, None, self.old_tree))
+        deleted = list(iter_tree_changes(self.repo, self.old_tree, None))
+
+        self.assertEqual(len(added), 104)
+        self.assertTrue(all(change.status == "A" for change in added))
+        self.assertEqual([change.path for change in deleted], [change.path for change in added])
+
+    def test_paths(self):
+        """Test limiting the comparison to some paths."""
+        new_tree = self.commit_files({"lib/deep/x.py": "changed", "big3/file0.txt": "changed"})
+
+        changes = iter_tree_changes(self.repo, self.old_tree, new_tree, ["lib/deep", "a.txt"])
+
+        self.assertEqual([change.path for change in changes], ["lib/deep/x.py"])
+
+    def test_unchanged_subtrees_are_not_read(self):
+        """Test that only the trees along the changed paths are read."""
+        new_tree = self.commit_files({"lib/deep/x.py": "changed"})
+
+        with mock.patch.object(Repository, "get_object", autospec=True,
+                               side_effect=Repository.get_object) as get_object:
+            changes = iter_tree_changes(self.repo, self.old_tree, new_tree)
+            self.assertEqual(get_object.call_count, 0)
+            self.assertEqual(len(list(changes)), 1)
+
+        # The two roots, the two lib trees and the two lib/deep trees
+        self.assertEqual(get_object.call_count, 6)
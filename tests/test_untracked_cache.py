@@ -0,0 +1,154 @@
+"""
+Tests for the untracked-cache index extension.
+"""
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase, mock
+
+from gitelle.core.index import Index
+from gitelle.core.repository import Repository
+from gitelle.core.untracked_cache import UntrackedCache
+
+
+class TestUntrackedCache(TestCase):
+    """Tests for the UntrackedCache class."""
+    
+    def setUp(self):
+        """Set up a temporary repository with some files."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = Path(self.temp_dir) / "test_repo"
+        self.repo_path.mkdir()
+        self.repo = Repository.init(self.repo_path)
+        
+        for path in ("tracked.txt", "new.txt", "src/main.py", "src/notes.txt", "docs/a/b.md"):
+            (self.repo_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.repo_path / path).write_text(path)
+        
+        index = Index(self.repo)
+        index.add([Path("tracked.txt"), Path("src/main.py")])
+        index.write()
+        self.age_directories()
+    
+    def tearDown(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.temp_dir)
+    
+    def age_directories(self):
+        """Move every directory's mtime out of the racy window."""
+        past = time.time() - 60
+        for directory in ("", "src", "docs", "docs/a"):
+            os.utime(self.repo_path / directory, (past, past))
+    
+    def count_scans(self, index):
+        """Return the untracked files and the number of directories read."""
+        with mock.patch("gitelle.core.untracked_cache.os.scandir", wraps=os.scandir) as scandir:
+            untracked = index.list_untracked()
+        return untracked, scandir.call_count
+    
+    def test_list_untracked(self):
+        """Test that untracked files are found in every directory."""
+        untracked, _ = self.count_scans(Index(self.repo))
+        
+        self.assertEqual(untracked, ["docs/a/b.md", "new.txt", "src/notes.txt"])
+    
+    def test_unchanged_directories_are_not_read(self):
+        """Test that a persisted cache turns the scan into a stat sweep."""
+        index = Index(self.repo)
+        first, scans = self.count_scans(index)
+        self.assertEqual(scans, 4)
+        index.write()
+        
+        second, scans = self.count_scans(Index(self.repo))
+        
+        self.assertEqual(second, first)
+        self.assertEqual(scans, 0)
+    
+    def test_changed_directory_is_read_again(self):
+        """Test that only a directory whose mtime changed is re-read."""
+        index = Index(self.repo)
+        index.list_untracked()
+        
+        (self.repo_path / "src/extra.py").write_text("extra")
+        untracked, scans = self.count_scans(index)
+        
+        self.assertIn("src/extra.py", untracked)
+        self.assertEqual(scans, 1)
+    
+    def test_index_changes_invalidate_directories(self):
+        """Test that adding or removing a path invalidates its directory."""
+        index = Index(self.repo)
+        index.list_untracked()
+        
+        index.add([Path("src/notes.txt")])
+        index.remove([Path("tracked.txt")])
+        untracked, scans = self.count_scans(index)
+        
+        self.assertEqual(untracked, ["docs/a/b.md", "new.txt", "tracked.txt"])
+        self.assertEqual(scans, 2)
+    
+    def test_racy_directories_are_not_cached(self):
+        """Test that recently modified directories are always re-read."""
+        now = time.time()
+        os.utime(self.repo_path / "src", (now, now))
+        
+        index = Index(self.repo)
+        index.list_untracked()
+        
+        self.assertNotIn("src", index.untracked_cache.dirs)
+        self.assertIn("docs", index.untracked_cache.dirs)
+    
+    def test_serialize_deserialize(self):
+        """Test that the cached listings round-trip."""
+        index = Index(self.repo)
+        index.list_untracked()
+        
+        data = index.untracked_cache.serialize()
+        cache = UntrackedCache.deserialize(data)
+        
+        self.assertEqual(cache.dirs["src"].untracked, ["notes.txt"])
+        self.assertEqual(cache.dirs[""].subdirs, ["docs", "src"])
+        self.assertEqual(cache.serialize(), data)
+    
+    def test_ignored_files_are_not_listed(self):
+        """Test that ignored files and directories are left out."""
+        (self.repo_path / ".gitignore").write_text("docs/\n*.txt\n")
+        self.age_directories()
+        
+        untracked, scans = self.count_scans(Index(self.repo))
+        
+        self.assertEqual(untracked, [".gitignore"])
+        self.assertEqual(scans, 2)
+    
+    def test_gitignore_change_rescans_below_it(self):
+        """Test that editing a .gitignore re-reads its directory and everything below."""
+        ignore_file = self.repo_path / ".gitignore"
+        ignore_file.write_text("*.md\n")
+        past = time.time() - 60
+        os.utime(ignore_file, (past, past))
+        self.age_directories()
+        
+        index = Index(self.repo)
+        self.assertEqual(index.list_untracked(), [".gitignore", "new.txt", "src/notes.txt"])
+        
+        # Editing the file in place doesn't change any directory mtime
+        ignore_file.write_text("*.txt\n")
+        os.utime(ignore_file, (past + 1, past + 1))
+        untracked, scans = self.count_scans(index)
+        
+        self.assertEqual(untracked, [".gitignore", "docs/a/b.md"])
+        self.assertEqual(scans, 4)
+    
+    def test_exclude_file_change_drops_the_cache(self):
+        """Test that changing info/exclude invalidates every listing."""
+        index = Index(self.repo)
+        index.list_untracked()
+        
+        self.repo.exclude_file.parent.mkdir(parents=True, exist_ok=True)
+        self.repo.exclude_file.write_text("new.txt\n")
+        untracked, scans = self.count_scans(index)
+        
+        self.assertEqual(untracked, ["docs/a/b.md", "src/notes.txt"])
+        self.assertEqual(scans, 4)